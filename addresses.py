@@ -0,0 +1,338 @@
+"""
+Нормализация адресов клиентов: регион, город, улица и дом.
+
+Адрес клиента — свободный текст ("г. Казань, ул. Ленина, д. 10",
+"Самарская обл., Самара, Мира 5"). `normalize_address` разбирает его на
+части и приводит их к единому виду: тип улицы сокращается ("улица" —
+"ул.", "проспект" — "пр-т"), название города из справочника `CITY_REGIONS`
+пишется как в справочнике, а регион, если он не указан, определяется по
+городу.
+
+Каждый различный адрес разбирается один раз:
+
+* в процессе — кэш `functools.lru_cache` на `ADDRESS_CACHE_SIZE` адресов;
+* в базе — таблица `address_lookup` (адрес → части), которая дополняется
+  в транзакции записи клиента (`store_addresses`) и при инициализации базы
+  (`update_address_lookup`). При изменении правил разбора увеличивается
+  `PARSER_VERSION`, и адреса разбираются заново.
+
+Отчёты только читают таблицу (`client_addresses`): запись внутри
+кэшированного отчёта меняла бы версию данных базы и сбрасывала кэш
+остальных отчётов.
+
+Массовая обработка (`normalize_addresses`) кодирует столбец уникальными
+значениями (`pandas.factorize`) и разбирает только их.
+"""
+
+import re
+import sqlite3
+from collections import namedtuple
+from functools import lru_cache
+
+import pandas as pd
+
+# Сколько разобранных адресов хранится в памяти процесса
+ADDRESS_CACHE_SIZE = 65_536
+# Версия правил разбора: строки `address_lookup` с другой версией разбираются заново
+PARSER_VERSION = 1
+
+Address = namedtuple("Address", "region city street house")
+Address.__doc__ = "Части адреса; отсутствующие части — None."
+EMPTY_ADDRESS = Address(None, None, None, None)
+
+# Регион по городу; для городов федерального значения регион совпадает с городом
+CITY_REGIONS = {
+    "Москва": "Москва",
+    "Санкт-Петербург": "Санкт-Петербург",
+    "Севастополь": "Севастополь",
+    "Казань": "Республика Татарстан",
+    "Йошкар-Ола": "Республика Марий Эл",
+    "Уфа": "Республика Башкортостан",
+    "Самара": "Самарская область",
+    "Пермь": "Пермский край",
+    "Тверь": "Тверская область",
+    "Омск": "Омская область",
+    "Новосибирск": "Новосибирская область",
+    "Екатеринбург": "Свердловская область",
+    "Нижний Новгород": "Нижегородская область",
+    "Челябинск": "Челябинская область",
+    "Красноярск": "Красноярский край",
+    "Ростов-на-Дону": "Ростовская область",
+    "Воронеж": "Воронежская область",
+    "Волгоград": "Волгоградская область",
+    "Краснодар": "Краснодарский край",
+}
+
+# Сокращённые и разговорные названия городов
+CITY_ALIASES = {"мск": "Москва", "спб": "Санкт-Петербург", "питер": "Санкт-Петербург", "екб": "Екатеринбург"}
+
+# Типы улиц и их сокращения
+STREET_TYPES = {
+    "ул": "ул.", "улица": "ул.",
+    "пр": "пр-т", "пр-т": "пр-т", "просп": "пр-т", "проспект": "пр-т",
+    "пер": "пер.", "переулок": "пер.",
+    "б-р": "б-р", "бул": "б-р", "бульвар": "б-р",
+    "ш": "ш.", "шоссе": "ш.",
+    "пл": "пл.", "площадь": "пл.",
+    "наб": "наб.", "набережная": "наб.",
+    "проезд": "проезд", "тупик": "тупик",
+    "мкр": "мкр", "микрорайон": "мкр",
+}
+# Типы населённых пунктов
+CITY_TYPES = {"г", "город", "пгт", "пос", "поселок", "с", "село", "дер", "деревня"}
+# Типы регионов: (полное название, стоит ли тип перед названием)
+REGION_TYPES = {
+    "обл": ("область", False), "область": ("область", False),
+    "край": ("край", False),
+    "респ": ("Республика", True), "республика": ("Республика", True),
+    "ао": ("автономный округ", False),
+}
+HOUSE_TYPES = {"д", "дом"}
+# Части адреса, не нужные для аналитики: квартира, корпус, строение, офис
+SKIPPED_TYPES = {"кв", "квартира", "корп", "корпус", "к", "стр", "строение", "оф", "офис"}
+
+_WORD = re.compile(r"[\w/-]+")
+_POSTCODE = re.compile(r"\d{6}")
+_HOUSE = re.compile(r"\d+[а-яa-z]?(?:/\d+[а-яa-z]?)?", re.IGNORECASE)
+
+
+def _key(text):
+    return text.lower().replace("ё", "е")
+
+
+_CITY_NAMES = {_key(city): city for city in CITY_REGIONS}
+_CITY_NAMES.update(CITY_ALIASES)
+
+
+def _title(words):
+    """Название с заглавной буквы, если оно целиком написано строчными или прописными."""
+    return " ".join(word.title() if word.islower() or word.isupper() else word for word in words)
+
+
+def _split_house(words):
+    """Отделяет номер дома в конце части ("Ленина 10") от названия."""
+    if len(words) > 1 and _HOUSE.fullmatch(words[-1]):
+        return words[:-1], words[-1].lower()
+    return words, None
+
+
+def _region(name, region_type):
+    title, before = REGION_TYPES[region_type]
+    return f"{title} {name}" if before else f"{name} {title}"
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _parse(text):
+    """Разбирает очищенный адрес (пробелы схлопнуты); результат кэшируется."""
+    region = city = street = house = None
+    for part in text.split(","):
+        words = _WORD.findall(part)
+        if not words or _POSTCODE.fullmatch(words[0]) and len(words) == 1:
+            continue
+        first, last = _key(words[0]), _key(words[-1])
+        if first in SKIPPED_TYPES:
+            continue
+        if first in HOUSE_TYPES or _HOUSE.fullmatch(words[0]):
+            number = words[1] if first in HOUSE_TYPES and len(words) > 1 else words[0]
+            house = house or number.lower()
+        elif len(words) > 1 and (first in REGION_TYPES or last in REGION_TYPES):
+            region_type, name = (first, words[1:]) if first in REGION_TYPES else (last, words[:-1])
+            region = _region(_title(name), region_type)
+        elif len(words) > 1 and first in CITY_TYPES:
+            city = _CITY_NAMES.get(_key(" ".join(words[1:])), _title(words[1:]))
+        elif len(words) > 1 and (first in STREET_TYPES or last in STREET_TYPES):
+            street_type, name = (first, words[1:]) if first in STREET_TYPES else (last, words[:-1])
+            name, number = _split_house(name)
+            street = f"{STREET_TYPES[street_type]} {_title(name)}"
+            house = house or number
+        elif _key(" ".join(words)) in _CITY_NAMES:
+            city = _CITY_NAMES[_key(" ".join(words))]
+        elif city is None:
+            city = _title(words)
+        elif street is None:
+            # Улица без указания типа: "Мира 5"
+            name, number = _split_house(words)
+            street = _title(name)
+            house = house or number
+    if region is None and city is not None:
+        region = CITY_REGIONS.get(city)
+    return Address(region, city, street, house)
+
+
+def normalize_address(text):
+    """
+    Разбирает адрес на регион, город, улицу и дом.
+
+    Parameters
+    ----------
+    text : str or None
+        Адрес в свободной форме, части разделены запятыми.
+
+    Returns
+    -------
+    Address
+        Части адреса; не найденные части — None.
+    """
+    if not isinstance(text, str):
+        return EMPTY_ADDRESS
+    return _parse(" ".join(text.split()))
+
+
+def normalize_addresses(addresses):
+    """
+    Разбирает столбец адресов; каждое различное значение — один раз.
+
+    Parameters
+    ----------
+    addresses : pandas.Series or iterable of str
+
+    Returns
+    -------
+    pandas.DataFrame
+        Колонки region, city, street, house с индексом исходного столбца.
+    """
+    series = addresses if isinstance(addresses, pd.Series) else pd.Series(list(addresses), dtype=object)
+    # Разбиение на коды уникальных значений векторное; очищаются и разбираются только уникальные
+    codes, uniques = pd.factorize(series.astype(object).where(series.notna(), None), use_na_sentinel=False)
+    parsed = pd.DataFrame([normalize_address(value) for value in uniques], columns=list(Address._fields),
+                          dtype=object)
+    if parsed.empty:
+        return pd.DataFrame(index=series.index, columns=list(Address._fields), dtype=object)
+    return parsed.take(codes).set_axis(series.index)
+
+
+def create_address_tables(cursor):
+    """
+    Создаёт таблицу разобранных адресов.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
+    cursor.execute("""CREATE TABLE IF NOT EXISTS address_lookup (
+        address TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        region TEXT,
+        city TEXT,
+        street TEXT,
+        house TEXT
+    )""")
+
+
+def _write_lookup(cursor, addresses, parsed):
+    rows = [(address, PARSER_VERSION, *parts) for address, parts in zip(addresses, parsed.itertuples(index=False))]
+    cursor.executemany("""INSERT INTO address_lookup (address, version, region, city, street, house)
+        VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (address) DO UPDATE SET version = excluded.version,
+            region = excluded.region, city = excluded.city, street = excluded.street, house = excluded.house
+        WHERE address_lookup.version <> excluded.version""", rows)
+
+
+def store_addresses(cursor, addresses):
+    """
+    Разбирает адреса и сохраняет их в `address_lookup` в текущей транзакции.
+
+    Адреса, уже разобранные текущей версией правил, не перезаписываются.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор подключения с открытой транзакцией записи.
+    addresses : iterable of str
+        Адреса; пустые значения пропускаются.
+    """
+    addresses = list(dict.fromkeys(a for a in addresses if isinstance(a, str)))
+    if addresses:
+        _write_lookup(cursor, addresses, normalize_addresses(addresses))
+
+
+def update_address_lookup(cursor):
+    """
+    Разбирает адреса клиентов, которых ещё нет в `address_lookup` или
+    которые разобраны прежней версией правил, в текущей транзакции.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор подключения с открытой транзакцией записи.
+
+    Returns
+    -------
+    int
+        Количество разобранных адресов.
+    """
+    missing = [row[0] for row in cursor.execute(
+        """SELECT DISTINCT c.address FROM clients c LEFT JOIN address_lookup l ON l.address = c.address
+        WHERE c.address IS NOT NULL AND (l.address IS NULL OR l.version <> ?)""", (PARSER_VERSION,))]
+    if missing:
+        _write_lookup(cursor, missing, normalize_addresses(missing))
+    return len(missing)
+
+
+def sync_address_lookup(conn):
+    """
+    Разбирает адреса клиентов, которых ещё нет в `address_lookup`.
+
+    Подключение не должно находиться внутри транзакции; изменения фиксируются.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе данных.
+
+    Returns
+    -------
+    int
+        Количество разобранных адресов.
+    """
+    with conn:
+        return update_address_lookup(conn.cursor())
+
+
+def client_addresses(conn=None):
+    """
+    Возвращает разобранные адреса всех клиентов.
+
+    Для базы SQLite части адресов читаются из `address_lookup`; адреса,
+    которых там нет (или разобранные прежней версией правил), разбираются
+    в памяти. База не изменяется. Для хранилища без SQL все адреса
+    разбираются в памяти.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Подключение к базе. Если не задано, открывается
+        `backup.analytics_connect()`: адреса читаются из того же снимка, что
+        и заказы аналитических отчётов.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Индекс — ID клиента, колонки region, city, street, house.
+    """
+    import db
+    import storage
+    from backup import analytics_connect
+
+    backend = storage.get_backend()
+    if conn is None and not backend.sql:
+        clients = db.load_clients()
+        return normalize_addresses(pd.Series([c.address for c in clients], index=[c.id for c in clients],
+                                             dtype=object)).rename_axis("id")
+    own_conn = conn is None
+    if own_conn:
+        conn = analytics_connect()
+    try:
+        frame = pd.read_sql_query("""SELECT c.id, c.address, l.version, l.region, l.city, l.street, l.house
+            FROM clients c LEFT JOIN address_lookup l ON l.address = c.address""", conn, index_col="id")
+    except sqlite3.OperationalError:
+        # Таблицы клиентов ещё нет
+        return pd.DataFrame(columns=list(Address._fields), dtype=object).rename_axis("id")
+    finally:
+        if own_conn:
+            conn.close()
+    stale = frame["address"].notna() & (frame["version"] != PARSER_VERSION)
+    places = frame[list(Address._fields)].astype(object)
+    if stale.any():
+        places.loc[stale] = normalize_addresses(frame.loc[stale, "address"]).to_numpy()
+    return places
@@ -1,13 +1,27 @@
 import ast
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 import tkinter as tk
-import matplotlib.pyplot as plt
+from tkinter import filedialog, messagebox, ttk
+import numpy as np
 import pandas as pd
 import seaborn as sns
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 
-from db import load_orders
+from addresses import client_addresses
+from archive import date_filter, iter_order_schemas, partition_files, partitions_for_range
+from backup import analytics_connect, analytics_path, connect_snapshot
+from cache import cached
+from db import connect, load_orders
+from leaderboard import top_clients, top_products
+from lifecycle import attach_figure
+import storage
+from tasks import Cancelled, check, interruptible
+
+# Размер пакета строк при потоковом чтении таблицы заказов
+CHUNK_SIZE = 200_000
 
 
 def safe_parse(x):
@@ -37,9 +51,15 @@ def show_client_stats():
     """
     Отображает статистику клиентов в новом окне Tkinter.
 
-    Загружает данные заказов, вычисляет статистику по клиентам и выводит её в текстовом поле.
+    Статистика вычисляется в фоне с индикатором прогресса (см.
+    `gui.run_with_progress`) и выводится в текстовом поле.
     """
-    stats = client_stats(load_orders())
+    from gui import run_with_progress
+    run_with_progress("client_stats_task", "Статистика клиентов",
+                      lambda token: client_stats_from_db(token=token), _show_client_stats)
+
+
+def _show_client_stats(stats):
     from gui import open_unique_window
     window = open_unique_window("client_stats", "Статистика")
     if window is None:
@@ -54,17 +74,10 @@ def top_clients_from_db():
     """
     Строит график ТОП-5 клиентов по количеству заказов.
 
-    Загружает данные заказов, вычисляет статистику, выбирает 5 лучших клиентов и отображает график в окне.
+    Данные берутся из инкрементальных счётчиков `client_totals`: запрос
+    читает пять строк индекса, не пересчитывая заказы всех клиентов.
     """
-    stats = client_stats(load_orders())  # ← DataFrame с колонками: Клиент, Количество заказов, Общая сумма
-    from gui import open_unique_window
-
-    window = open_unique_window("client_stats", "Статистика клиентов", width=700, height=500)
-    if window is None:
-        return
-
-    # Отбор ТОП-5 клиентов
-    top_stats = stats.sort_values(by="Количество заказов", ascending=False).head(5)
+    top_stats = top_clients_frame(5)
 
     # Построение графика
     fig = Figure(figsize=(6, 4), dpi=100)
@@ -76,65 +89,114 @@ def top_clients_from_db():
     ax.set_xlabel("Клиенты")
     ax.tick_params(axis='x', rotation=45, labelsize=6)
 
-    # Вставка графика в окно
+    show_figure_window("top_clients", "Статистика клиентов", fig, width=700, height=500)
+
+
+def show_figure_window(key, title, fig, width=700, height=500):
+    """
+    Отображает график matplotlib в окне Tkinter.
+
+    График закрывается вместе с окном (см. `lifecycle.attach_figure`).
+
+    Параметры
+    ----------
+    key : str
+        Уникальный идентификатор окна.
+    title : str
+        Заголовок окна.
+    fig : matplotlib.figure.Figure
+        График.
+    """
+    from gui import open_unique_window
+    window = open_unique_window(key, title, width=width, height=height)
+    if window is None:
+        fig.clear()
+        return
+
     canvas = FigureCanvasTkAgg(fig, master=window)
     canvas.draw()
     canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+    attach_figure(window, fig)
 
 
+def top_clients_frame(limit=5, by="orders"):
+    """
+    Возвращает лучших клиентов из счётчиков `client_totals`.
 
-def order_trend_from_db():
+    Параметры
+    ----------
+    limit : int, optional
+        Количество клиентов.
+    by : str, optional
+        "orders" — по количеству заказов, "revenue" — по сумме.
+
+    Возвращает
+    ----------
+    pandas.DataFrame
+        Колонки: Клиент, Количество заказов, Общая сумма, Последний заказ.
     """
-    Строит график количества заказов по дням за август 2025 года.
+    conn = connect()
+    try:
+        rows = top_clients(conn, limit, by)
+    finally:
+        conn.close()
+    return pd.DataFrame(
+        [(name if name is not None else client_id, count, round(revenue, 2), last)
+         for client_id, name, count, revenue, last in rows],
+        columns=["Клиент", "Количество заказов", "Общая сумма", "Последний заказ"])
 
-    Подключается к базе данных, извлекает даты заказов, фильтрует по августу 2025 и отображает график.
+
+def show_top_products(limit=20):
+    """
+    Отображает самые продаваемые товары по счётчикам `product_totals`.
     """
+    conn = connect()
     try:
-        # Подключение к базе данных
-        conn = sqlite3.connect("ecom.db")
-        query = "SELECT date FROM orders"
-        df = pd.read_sql_query(query, conn)
+        rows = top_products(conn, limit)
+    finally:
         conn.close()
-    except Exception as e:
-        print(f"Ошибка при загрузке данных из базы: {e}")
+    if not rows:
+        messagebox.showinfo("Топ товаров", "Нет данных для анализа")
         return
+    df = pd.DataFrame(rows, columns=["Товар", "Продано единиц", "Заказов"])
+    show_dataframe_window("top_products", "Топ товаров", df, width=500)
 
-    if df.empty:
-        print("Нет данных — таблица заказов пуста.")
-        return
 
-    # Обработка дат
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df = df.dropna(subset=['date'])
+def order_trend_from_db():
+    """
+    Строит график количества заказов по дням за август 2025 года.
+
+    Количество заказов по дням считается пакетно функцией `daily_order_counts`
+    (включая архивные разделы, если период заархивирован) в фоне с
+    индикатором прогресса.
+    """
+    from gui import run_with_progress
+    run_with_progress("order_trend_task", "Динамика заказов",
+                      lambda token: daily_order_counts(2025, 8, token=token), _plot_order_trend)
 
-    # Фильтрация на август 2025
-    august_df = df[
-        (df['date'].dt.year == 2025) &
-        (df['date'].dt.month == 8)
-    ]
 
-    if august_df.empty:
-        print("Нет заказов за август 2025.")
+def _plot_order_trend(daily_orders):
+    if daily_orders is None:
+        print("Нет данных — таблица заказов пуста.")
         return
 
-    # Извлечение дня месяца
-    august_df['day'] = august_df['date'].dt.day
-
-    # Подсчёт заказов по дням
-    daily_orders = august_df.groupby('day').size().reindex(range(1, 32), fill_value=0).reset_index(name='order_count')
+    if daily_orders.sum() == 0:
+        print("Нет заказов за август 2025.")
+        return
 
     # Построение графика
-    plt.figure(figsize=(12, 6))
-    plt.plot(daily_orders['day'], daily_orders['order_count'], marker='o')
+    fig = Figure(figsize=(12, 6), dpi=100)
+    ax = fig.add_subplot(111)
+    ax.plot(daily_orders.index, daily_orders.values, marker='o')
 
-    plt.title("Количество заказов по дням — Август 2025")
-    plt.xlabel("День месяца")
-    plt.ylabel("Количество заказов")
-    plt.xticks(ticks=range(1, 32))
-    plt.ylim(bottom=0)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+    ax.set_title("Количество заказов по дням — Август 2025")
+    ax.set_xlabel("День месяца")
+    ax.set_ylabel("Количество заказов")
+    ax.set_xticks(range(1, 32))
+    ax.set_ylim(bottom=0)
+    ax.grid(True)
+    fig.tight_layout()
+    show_figure_window("order_trend", "Динамика заказов", fig, width=1000, height=550)
 
 
 def client_stats(orders):
@@ -145,6 +207,8 @@ def client_stats(orders):
     ----------
     orders : list of dict
         Список заказов, где каждый элемент содержит поля 'client' и 'total'.
+        Если есть поле 'client_id', группировка идёт по нему, а 'client'
+        используется как подпись.
 
     Возвращает
     ----------
@@ -152,50 +216,653 @@ def client_stats(orders):
         Таблица с колонками: 'Клиент', 'Количество заказов', 'Общая сумма'.
     """
     df = pd.DataFrame(orders)
-    stats = df.groupby('client').agg({"total": ["count", "sum"]}).reset_index()
-    stats.columns = ["Клиент", "Количество заказов", "Общая сумма"]
-    return stats
+    if df.empty:
+        return _client_result(None)
+    names = dict(zip(df["client_id"], df["client"])) if "client_id" in df else None
+    return _client_result(_client_partial(df), names)
+
+
+@cached(source=analytics_path)
+def client_stats_from_db(chunksize=CHUNK_SIZE, processes=None, token=None):
+    """
+    Вычисляет статистику по клиентам по всем заказам из базы данных.
+
+    Заказы читаются пакетами (см. `aggregate_orders`), результат совпадает
+    с `client_stats(load_orders())`. Результат кэшируется до следующей
+    записи в базу или до нового снимка, если аналитика читает снимок.
+
+    Параметры
+    ----------
+    chunksize : int or None, optional
+        Размер пакета; None — вся таблица одним запросом.
+    processes : int, optional
+        Количество процессов для параллельной обработки пакетов.
+    token : tasks.CancelToken, optional
+        Токен отмены и прогресса; в ключ кэша не входит.
+
+    Возвращает
+    ----------
+    pandas.DataFrame
+        Таблица с колонками: 'Клиент', 'Количество заказов', 'Общая сумма'.
+    """
+    merged = aggregate_orders(_client_partial, "client_id, total", chunksize, processes, token=token)
+    return _client_result(merged, client_names())
 
 
 def sales_trend_monthly_change():
     """
     Строит график общей суммы продаж по месяцам.
 
-    Загружает данные из базы, агрегирует суммы по месяцам и отображает график с использованием seaborn.
+    Суммы по месяцам считаются пакетно функцией `monthly_sales` в фоне с
+    индикатором прогресса, график строится с использованием seaborn.
+    """
+    from gui import run_with_progress
+    run_with_progress("monthly_sales_task", "Продажи по месяцам",
+                      lambda token: monthly_sales(token=token), _plot_monthly_sales)
+
+
+def _plot_monthly_sales(monthly):
+    if monthly is None:
+        print("Нет данных — таблица заказов пуста.")
+        return
+
+    fig = Figure(figsize=(10, 6), dpi=100)
+    ax = fig.add_subplot(111)
+    sns.lineplot(x=monthly.index, y=monthly.values, marker='o', ax=ax)
+
+    ax.set_title("Общая сумма продаж по месяцам, руб.")
+    ax.set_xlabel("Месяц")
+    ax.set_ylabel("Сумма продаж, руб")
+    ax.set_xticks(range(1, 13), labels=[
+        "Янв", "Фев", "Мар", "Апр", "Май", "Июн",
+        "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"
+    ])
+    ax.set_ylim(bottom=0)
+    ax.grid(True)
+    fig.tight_layout()
+    show_figure_window("monthly_sales", "Продажи по месяцам", fig, width=900, height=550)
+
+
+# ========== Когортный анализ и RFM ==========
+def iter_order_chunks(columns="client_id, date, total", chunksize=CHUNK_SIZE, conn=None,
+                      date_from=None, date_to=None, token=None):
+    """
+    Читает таблицу заказов пакетами фиксированного размера.
+
+    Параметры
+    ----------
+    columns : str, optional
+        Список колонок для выборки.
+    chunksize : int or None, optional
+        Количество строк в одном пакете; None — каждая таблица одним пакетом.
+    conn : sqlite3.Connection, optional
+        Подключение к базе. Если не задано, открывается через `analytics_connect()`;
+        для хранилища без SQL (`storage.PythonBackend`) заказы берутся из него.
+    date_from, date_to : str, optional
+        Диапазон дат "ГГГГ-ММ-ДД" включительно. Если задан, читаются также
+        архивные разделы, пересекающиеся с диапазоном.
+    token : tasks.CancelToken, optional
+        Токен отмены: выполняющийся запрос прерывается, а между пакетами
+        проверяется отмена (`tasks.Cancelled`). Прогресс сообщается по доле
+        прочитанных строк.
+
+    Возвращает
+    ----------
+    iterator of pandas.DataFrame
+        Пакеты строк таблицы заказов.
+    """
+    backend = storage.get_backend()
+    if conn is None and not backend.sql:
+        frame = backend.order_frame(columns, date_from, date_to)
+        step = chunksize or max(len(frame), 1)
+        for start in range(0, len(frame), step):
+            check(token)
+            yield frame.iloc[start:start + step]
+            if token is not None:
+                token.report(min(start + step, len(frame)), len(frame), "Чтение заказов")
+        return
+    own_conn = conn is None
+    if own_conn:
+        conn = analytics_connect()
+    try:
+        with interruptible(conn, token):
+            if date_from is None and date_to is None:
+                queries = [(f"SELECT {columns} FROM orders", None)]
+                parts = 1
+            else:
+                where, args = date_filter(date_from, date_to)
+                queries = ((f"SELECT {columns} FROM {schema}.orders{where}", args)
+                           for schema in iter_order_schemas(conn, date_from, date_to))
+                parts = len(partitions_for_range(conn, date_from, date_to)) + 1 if token else 1
+            for part, (query, args) in enumerate(queries):
+                # Архивный раздел подключён только на время своего запроса, поэтому
+                # строки считаются по каждой схеме (только для отчёта о прогрессе)
+                if token is not None:
+                    rows = conn.execute(f"SELECT COUNT(*) FROM ({query})", args or ()).fetchone()[0]
+                    done = 0
+                if chunksize is None:
+                    chunks = [pd.read_sql_query(query, conn, params=args)]
+                else:
+                    chunks = pd.read_sql_query(query, conn, params=args, chunksize=chunksize)
+                for chunk in chunks:
+                    yield chunk
+                    if token is not None:
+                        done += len(chunk)
+                        token.report(part + done / rows if rows else part + 1, parts, "Чтение заказов")
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _parse_dates(series):
+    """Векторно преобразует строки дат ISO в datetime64, некорректные значения — в NaT."""
+    return pd.to_datetime(series, errors="coerce", format="ISO8601")
+
+
+def _quintile(values):
+    """Возвращает квинтильный балл 1..5 по рангу значений (устойчив к повторам)."""
+    ranks = pd.Series(values).rank(method="first", pct=True).to_numpy()
+    return np.ceil(ranks * 5).astype("int8")
+
+
+def cohort_retention(conn=None, chunksize=CHUNK_SIZE, date_from=None, date_to=None, token=None):
+    """
+    Строит матрицу удержания клиентов по когортам месяца первого заказа.
+
+    Заказы читаются пакетами; из каждого пакета остаются только уникальные пары
+    (клиент, месяц), поэтому потребление памяти зависит от размера пакета и
+    числа таких пар, а не от количества заказов.
+
+    Параметры
+    ----------
+    conn : sqlite3.Connection, optional
+        Подключение к базе данных.
+    chunksize : int, optional
+        Количество строк в одном пакете.
+    date_from, date_to : str, optional
+        Диапазон дат заказов, включая архивные разделы.
+    token : tasks.CancelToken, optional
+        Токен отмены и прогресса (см. `iter_order_chunks`).
+
+    Возвращает
+    ----------
+    pandas.DataFrame
+        Индекс — когорта ("ГГГГ-ММ"), колонка 'Размер когорты' и колонки 0..N
+        с долей клиентов когорты, сделавших заказ через N месяцев.
+    """
+    pairs = []
+    for chunk in iter_order_chunks("client_id, date", chunksize, conn, date_from, date_to, token):
+        dates = _parse_dates(chunk["date"])
+        mask = dates.notna().to_numpy()
+        month = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()[mask]
+        part = pd.DataFrame({
+            "client": chunk["client_id"].to_numpy()[mask],
+            "month": month.astype("int32"),
+        })
+        pairs.append(part.drop_duplicates())
+        # Периодически схлопываем накопленные пары, чтобы ограничить память
+        if len(pairs) >= 8:
+            pairs = [pd.concat(pairs, ignore_index=True).drop_duplicates()]
+
+    if not pairs:
+        return pd.DataFrame()
+    activity = pd.concat(pairs, ignore_index=True).drop_duplicates()
+    if activity.empty:
+        return pd.DataFrame()
+
+    cohort = activity.groupby("client")["month"].transform("min").to_numpy()
+    offset = activity["month"].to_numpy() - cohort
+    counts = pd.crosstab(cohort, offset)
+    sizes = counts[0]
+    retention = counts.div(sizes, axis=0).round(4)
+    retention.columns = [int(c) for c in retention.columns]
+    retention.insert(0, "Размер когорты", sizes.astype(int))
+    retention.index = [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in retention.index]
+    retention.index.name = "Когорта"
+    return retention
+
+
+def rfm_scores(conn=None, as_of=None, chunksize=CHUNK_SIZE, date_from=None, date_to=None, token=None):
+    """
+    Вычисляет RFM-оценки клиентов (давность, частота, денежная сумма).
+
+    Частичные агрегаты считаются по каждому пакету заказов и затем
+    объединяются, поэтому таблица заказов целиком в память не загружается.
+
+    Параметры
+    ----------
+    conn : sqlite3.Connection, optional
+        Подключение к базе данных.
+    as_of : str или datetime, optional
+        Дата, относительно которой считается давность. По умолчанию —
+        день, следующий за последним заказом.
+    chunksize : int, optional
+        Количество строк в одном пакете.
+    date_from, date_to : str, optional
+        Диапазон дат заказов, включая архивные разделы.
+    token : tasks.CancelToken, optional
+        Токен отмены и прогресса (см. `iter_order_chunks`).
+
+    Возвращает
+    ----------
+    pandas.DataFrame
+        Колонки: 'Клиент', 'Давность, дн.', 'Частота', 'Сумма', 'R', 'F', 'M', 'RFM'.
+        Баллы R, F, M — квинтили от 1 до 5 (5 — лучший).
+    """
+    def combine(frames):
+        merged = pd.concat(frames)
+        return merged.groupby(level=0).agg({"last": "max", "frequency": "sum", "monetary": "sum"})
+
+    parts = []
+    for chunk in iter_order_chunks("client_id, date, total", chunksize, conn, date_from, date_to, token):
+        dates = _parse_dates(chunk["date"])
+        mask = dates.notna().to_numpy()
+        days = dates.to_numpy()[mask].astype("datetime64[D]").astype(np.int64)
+        part = pd.DataFrame({
+            "client": chunk["client_id"].to_numpy()[mask],
+            "last": days,
+            "frequency": 1,
+            "monetary": chunk["total"].to_numpy()[mask],
+        })
+        parts.append(part.groupby("client").agg({"last": "max", "frequency": "sum", "monetary": "sum"}))
+        if len(parts) >= 8:
+            parts = [combine(parts)]
+
+    columns = ["Клиент", "Давность, дн.", "Частота", "Сумма", "R", "F", "M", "RFM"]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    agg = combine(parts)
+    if agg.empty:
+        return pd.DataFrame(columns=columns)
+
+    if as_of is None:
+        as_of_day = int(agg["last"].max()) + 1
+    else:
+        as_of_day = int(np.datetime64(pd.Timestamp(as_of).date(), "D").astype(np.int64))
+    recency = as_of_day - agg["last"].to_numpy()
+
+    r = _quintile(-recency)
+    f = _quintile(agg["frequency"].to_numpy())
+    m = _quintile(agg["monetary"].to_numpy())
+    result = pd.DataFrame({
+        "Клиент": _client_labels(agg.index, client_names(conn)),
+        "Давность, дн.": recency,
+        "Частота": agg["frequency"].to_numpy(),
+        "Сумма": agg["monetary"].round(2).to_numpy(),
+        "R": r,
+        "F": f,
+        "M": m,
+    })
+    result["RFM"] = result["R"].astype(str) + result["F"].astype(str) + result["M"].astype(str)
+    return result.sort_values(["RFM", "Сумма"], ascending=False).reset_index(drop=True)
+
+
+# ========== Продажи по регионам ==========
+# Уровни группировки отчёта по регионам: колонки адреса и их подписи
+REGION_LEVELS = {
+    "region": {"region": "Регион"},
+    "city": {"region": "Регион", "city": "Город"},
+    "street": {"region": "Регион", "city": "Город", "street": "Улица"},
+}
+# Подпись для клиентов без адреса (или удалённых) и нераспознанных частей адреса
+UNKNOWN_PLACE = "Не указан"
+
+
+@cached(source=analytics_path)
+def regional_sales(level="city", chunksize=CHUNK_SIZE, processes=None, date_from=None, date_to=None,
+                   token=None):
     """
+    Считает заказы и выручку по регионам, городам или улицам клиентов.
+
+    Заказы агрегируются по клиентам пакетами (см. `aggregate_orders`), затем
+    клиенты соединяются с разобранными адресами (`addresses.client_addresses`:
+    каждый различный адрес разбирается один раз при записи клиента и хранится
+    в базе). Адреса читаются из того же снимка, что и заказы; отчёт базу не
+    изменяет. Результат кэшируется до следующей записи в базу или до нового
+    снимка, если аналитика читает снимок.
+
+    Параметры
+    ----------
+    level : str, optional
+        Уровень группировки: "region", "city" или "street".
+    chunksize : int or None, optional
+        Размер пакета; None — вся таблица одним запросом.
+    processes : int, optional
+        Количество процессов для параллельной обработки пакетов.
+    date_from, date_to : str, optional
+        Диапазон дат заказов, включая архивные разделы.
+    token : tasks.CancelToken, optional
+        Токен отмены и прогресса; в ключ кэша не входит.
+
+    Возвращает
+    ----------
+    pandas.DataFrame
+        Колонки уровня ('Регион', 'Город', 'Улица'), 'Клиентов',
+        'Количество заказов', 'Общая сумма', 'Доля выручки, %' в порядке
+        убывания выручки.
+    """
+    if level not in REGION_LEVELS:
+        raise ValueError(f"Неизвестный уровень группировки: {level}")
+    merged = aggregate_orders(_client_partial, "client_id, total", chunksize, processes,
+                              date_from=date_from, date_to=date_to, token=token)
+    return _regional_result(merged, client_addresses(), REGION_LEVELS[level])
+
+
+def _regional_result(merged, places, labels):
+    columns = list(labels.values()) + ["Клиентов", "Количество заказов", "Общая сумма", "Доля выручки, %"]
+    if merged is None:
+        return pd.DataFrame(columns=columns)
+    keys = list(labels)
+    frame = places.reindex(merged.index)[keys].astype(object).fillna(UNKNOWN_PLACE)
+    frame["clients"] = 1
+    frame["count"] = merged["count"].to_numpy()
+    frame["kopecks"] = merged["kopecks"].to_numpy()
+    grouped = frame.groupby(keys).sum().sort_values("kopecks", ascending=False, kind="stable")
+    total = grouped["kopecks"].sum()
+    result = grouped.index.to_frame(index=False).rename(columns=labels)
+    result["Клиентов"] = grouped["clients"].to_numpy()
+    result["Количество заказов"] = grouped["count"].to_numpy()
+    result["Общая сумма"] = grouped["kopecks"].to_numpy() / 100
+    result["Доля выручки, %"] = (grouped["kopecks"].to_numpy() * 100 / total).round(1) if total else 0.0
+    return result
+
+
+# ========== Пакетная (out-of-core) агрегация ==========
+def _kopecks(totals):
+    """Переводит суммы в целые копейки: сумма целых не зависит от разбиения на пакеты."""
+    values = pd.to_numeric(pd.Series(totals), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    return np.round(values * 100).astype(np.int64)
+
+
+def client_names(conn=None):
+    """
+    Возвращает имена клиентов по их ID.
+
+    Параметры
+    ----------
+    conn : sqlite3.Connection, optional
+        Подключение к базе. Если не задано, открывается через `analytics_connect()`.
+
+    Возвращает
+    ----------
+    dict
+        Словарь {ID клиента: имя}; пустой, если таблицы клиентов нет.
+    """
+    backend = storage.get_backend()
+    if conn is None and not backend.sql:
+        return backend.client_names()
+    own_conn = conn is None
+    if own_conn:
+        conn = analytics_connect()
     try:
-        conn = sqlite3.connect("ecom.db")
-        query = "SELECT date, total FROM orders"
-        df = pd.read_sql_query(query, conn)
+        return dict(conn.execute("SELECT id, name FROM clients").fetchall())
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _client_labels(keys, names):
+    """Подписи клиентов по ключам группировки; ключи без имени остаются как есть."""
+    if not names:
+        return np.asarray(keys, dtype=object)
+    return np.array([names.get(key, key) for key in keys], dtype=object)
+
+
+def _client_partial(chunk):
+    key = "client_id" if "client_id" in chunk else "client"
+    frame = pd.DataFrame({"client": chunk[key].to_numpy(), "kopecks": _kopecks(chunk["total"])})
+    return frame.groupby("client").agg(count=("kopecks", "size"), kopecks=("kopecks", "sum"))
+
+
+def _client_result(merged, names=None):
+    if merged is None:
+        return pd.DataFrame(columns=["Клиент", "Количество заказов", "Общая сумма"])
+    return pd.DataFrame({
+        "Клиент": _client_labels(merged.index, names),
+        "Количество заказов": merged["count"].to_numpy(),
+        "Общая сумма": merged["kopecks"].to_numpy() / 100,
+    })
+
+
+def _daily_partial(chunk, year, month):
+    dates = _parse_dates(chunk["date"])
+    days = dates[(dates.dt.year == year) & (dates.dt.month == month)].dt.day
+    return days.value_counts().reindex(range(1, 32), fill_value=0)
+
+
+def _monthly_partial(chunk):
+    dates = _parse_dates(chunk["date"])
+    valid = dates.notna().to_numpy()
+    kopecks = pd.Series(_kopecks(chunk["total"])[valid], index=dates[valid].dt.month.to_numpy())
+    return kopecks.groupby(level=0).sum()
+
+
+def _merge_partials(parts):
+    """Складывает частичные агрегаты по ключу индекса; None, если данных не было."""
+    parts = [part for part in parts if part is not None and len(part)]
+    if not parts:
+        return None
+    return pd.concat(parts).groupby(level=0).sum()
+
+
+def _partial_from_file(path, columns, where, args, func):
+    """Вычисляет частичный агрегат одного диапазона строк (выполняется в процессе пула)."""
+    conn = connect_snapshot(path)
+    try:
+        chunk = pd.read_sql_query(f"SELECT {columns} FROM orders{where}", conn, params=args)
+    finally:
+        conn.close()
+    return func(chunk) if not chunk.empty else None
+
+
+def _partials_in_processes(func, columns, chunksize, processes, date_from, date_to, token=None):
+    path = analytics_path()
+    conn = connect_snapshot(path)
+    try:
+        files = partition_files(conn, date_from, date_to) if date_from or date_to else []
+    finally:
+        conn.close()
+    files.append(path)
+
+    where, args = date_filter(date_from, date_to)
+    range_where = (where + " AND" if where else " WHERE") + " id >= ? AND id < ?"
+    tasks = []
+    for file_path in files:
+        conn = connect_snapshot(file_path)
         try:
+            low, high = conn.execute("SELECT MIN(id), MAX(id) FROM orders").fetchone()
+        finally:
             conn.close()
-        except:
-            pass  # игнорируем ошибку при закрытии мок-объекта
-    except Exception as e:
-        print(f"Ошибка при загрузке данных: {e}")
+        if low is None:
+            continue
+        for start in range(low, high + 1, chunksize):
+            tasks.append((file_path, columns, range_where, args + [start, start + chunksize]))
+
+    # Каждый процесс сам читает свой диапазон id: между процессами передаются только агрегаты
+    pool = ProcessPoolExecutor(max_workers=processes)
+    cancelled = False
+    try:
+        futures = [pool.submit(_partial_from_file, *task, func) for task in tasks]
+        parts = []
+        for future in as_completed(futures):
+            parts.append(future.result())
+            if token is not None:
+                token.report(len(parts), len(futures), "Обработка пакетов")
+        return parts
+    except Cancelled:
+        cancelled = True
+        raise
+    finally:
+        # При отмене не начатые пакеты снимаются, а выполняемые не ожидаются
+        pool.shutdown(wait=not cancelled, cancel_futures=True)
+
+
+def aggregate_orders(func, columns, chunksize=CHUNK_SIZE, processes=None, conn=None,
+                     date_from=None, date_to=None, token=None):
+    """
+    Вычисляет агрегат по заказам пакетами ограниченного размера.
+
+    Функция `func` получает пакет строк и возвращает частичный агрегат —
+    Series или DataFrame, проиндексированный ключом группировки. Частичные
+    агрегаты складываются по ключу, поэтому в памяти одновременно находятся
+    только один пакет и накопленные агрегаты. Суммы денег считаются в целых
+    копейках, и результат не зависит от размера пакета и числа процессов.
+
+    Параметры
+    ----------
+    func : callable
+        Функция частичного агрегата. Для режима процессов должна быть
+        определена на уровне модуля (или быть `functools.partial` от такой).
+    columns : str
+        Список колонок для выборки.
+    chunksize : int or None, optional
+        Количество строк в пакете; None — вся таблица одним пакетом.
+    processes : int, optional
+        Если задано, пакеты (диапазоны id) читаются и агрегируются в пуле
+        из указанного числа процессов (только для хранилища в файле SQLite).
+    conn : sqlite3.Connection, optional
+        Подключение к базе (не используется в режиме процессов).
+    date_from, date_to : str, optional
+        Диапазон дат, включая архивные разделы.
+    token : tasks.CancelToken, optional
+        Токен отмены: проверяется между пакетами, прерывает выполняющийся
+        запрос и получает прогресс обработки.
+
+    Возвращает
+    ----------
+    pandas.Series, pandas.DataFrame or None
+        Объединённый агрегат, либо None, если заказов не найдено.
+    """
+    # Хранилища в памяти недоступны другим процессам
+    if processes and storage.get_backend().kind == storage.SQLiteBackend.kind:
+        return _merge_partials(_partials_in_processes(
+            func, columns, chunksize or CHUNK_SIZE, processes, date_from, date_to, token))
+    chunks = iter_order_chunks(columns, chunksize, conn, date_from, date_to, token)
+    return _merge_partials(func(chunk) for chunk in chunks if not chunk.empty)
+
+
+def daily_order_counts(year, month, chunksize=CHUNK_SIZE, processes=None, conn=None, token=None):
+    """
+    Считает количество заказов по дням месяца.
+
+    Возвращает
+    ----------
+    pandas.Series or None
+        Индекс — день месяца 1..31, значения — количество заказов; None,
+        если за период нет ни одной строки.
+    """
+    date_from, date_to = f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-31"
+    return aggregate_orders(partial(_daily_partial, year=year, month=month), "date",
+                            chunksize, processes, conn, date_from, date_to, token)
+
+
+def monthly_sales(chunksize=CHUNK_SIZE, processes=None, conn=None, token=None):
+    """
+    Считает общую сумму продаж по месяцам года по рабочей таблице заказов.
+
+    Возвращает
+    ----------
+    pandas.Series or None
+        Индекс — номер месяца, значения — сумма продаж в рублях; None, если
+        заказов нет.
+    """
+    kopecks = aggregate_orders(_monthly_partial, "date, total", chunksize, processes, conn, token=token)
+    if kopecks is None:
+        return None
+    return (kopecks / 100).rename("total")
+
+
+def show_dataframe_window(key, title, df, width=800, height=450):
+    """
+    Отображает таблицу DataFrame в окне с возможностью экспорта в CSV.
+
+    Параметры
+    ----------
+    key : str
+        Уникальный идентификатор окна.
+    title : str
+        Заголовок окна.
+    df : pandas.DataFrame
+        Отображаемые данные.
+    """
+    from gui import open_unique_window
+    window = open_unique_window(key, title, width=width, height=height)
+    if window is None:
         return
 
-    if df.empty:
-        print("Нет данных — таблица заказов пуста.")
+    table = df.reset_index() if df.index.name else df
+    columns = [str(c) for c in table.columns]
+    tree = ttk.Treeview(window, columns=columns, show="headings")
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=max(60, min(160, 9 * len(col))), anchor="center")
+    for row in table.itertuples(index=False):
+        tree.insert("", "end", values=list(row))
+
+    scrollbar = ttk.Scrollbar(window, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+
+    def export_csv():
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        if path:
+            table.to_csv(path, index=False, encoding="utf-8-sig")
+            messagebox.showinfo("Экспорт", f"Таблица сохранена в {path}")
+
+    ttk.Button(window, text="Экспорт CSV", command=export_csv).pack(side="bottom", pady=5)
+    scrollbar.pack(side="right", fill="y")
+    tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+
+def show_cohort_retention():
+    """
+    Отображает матрицу удержания клиентов по когортам.
+    """
+    from gui import run_with_progress
+    run_with_progress("cohort_retention_task", "Когорты клиентов",
+                      lambda token: cohort_retention(token=token), _show_cohort_retention)
+
+
+def _show_cohort_retention(retention):
+    if retention.empty:
+        messagebox.showinfo("Когорты", "Нет данных для анализа")
         return
+    show_dataframe_window("cohort_retention", "Удержание клиентов по когортам", retention)
 
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df = df.dropna(subset=['date'])
 
-    df['month'] = df['date'].dt.month
-    monthly_sales = df.groupby('month')['total'].sum().reset_index()
+def show_rfm_segments():
+    """
+    Отображает RFM-сегментацию клиентов.
+    """
+    from gui import run_with_progress
+    run_with_progress("rfm_segments_task", "RFM-сегментация",
+                      lambda token: rfm_scores(token=token), _show_rfm_segments)
 
-    plt.figure(figsize=(10, 6))
-    sns.lineplot(x=monthly_sales['month'], y=monthly_sales['total'], marker='o')
 
-    plt.title("Общая сумма продаж по месяцам, руб.")
-    plt.xlabel("Месяц")
-    plt.ylabel("Сумма продаж, руб")
-    plt.xticks(ticks=range(1, 13), labels=[
-        "Янв", "Фев", "Мар", "Апр", "Май", "Июн",
-        "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"
-    ])
-    plt.ylim(bottom=0)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+def _show_rfm_segments(rfm):
+    if rfm.empty:
+        messagebox.showinfo("RFM", "Нет данных для анализа")
+        return
+    show_dataframe_window("rfm_segments", "RFM-сегментация клиентов", rfm)
+
+
+def show_regional_sales(level="city"):
+    """
+    Отображает заказы и выручку по регионам и городам клиентов.
+
+    Параметры
+    ----------
+    level : str, optional
+        Уровень группировки (см. `regional_sales`).
+    """
+    from gui import run_with_progress
+    run_with_progress("regional_sales_task", "Продажи по регионам",
+                      lambda token: regional_sales(level, token=token), _show_regional_sales)
+
+
+def _show_regional_sales(sales):
+    if sales.empty:
+        messagebox.showinfo("Регионы", "Нет данных для анализа")
+        return
+    show_dataframe_window("regional_sales", "Продажи по регионам и городам", sales)
@@ -0,0 +1,314 @@
+"""
+Локальный HTTP/JSON API к базе заказов.
+
+Сервер построен на `http.server` из стандартной библиотеки: каждый запрос
+обрабатывается в отдельном потоке, а подключения к базе берутся из общего пула
+и открыты только для чтения.
+
+Запуск: python api.py [--host 127.0.0.1] [--port 8080] [--db ecom.db]
+"""
+
+import argparse
+import json
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from urllib.request import pathname2url
+
+import db
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+POOL_SIZE = 8
+
+
+class ConnectionPool:
+    """Пул подключений SQLite только для чтения, общий для потоков сервера.
+
+    Parameters
+    ----------
+    db_path : str
+        Путь к базе данных.
+    size : int, optional
+        Количество подключений в пуле.
+    """
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self._pool = queue.Queue()
+        uri = "file:" + pathname2url(os.path.abspath(db_path)) + "?mode=ro"
+        for _ in range(size):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._pool.put(conn)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        """Выдаёт подключение из пула и возвращает его обратно после использования."""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._pool.get().close()
+
+
+class BadRequest(Exception):
+    """Некорректные параметры запроса."""
+
+
+def _int_param(params, name, default, minimum=0, maximum=None):
+    value = params.get(name, [None])[0]
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"Параметр {name} должен быть целым числом")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise BadRequest(f"Параметр {name} вне допустимого диапазона")
+    return value
+
+
+def _float_param(params, name):
+    value = params.get(name, [None])[0]
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise BadRequest(f"Параметр {name} должен быть числом")
+
+
+def _str_param(params, name):
+    value = params.get(name, [None])[0]
+    return value or None
+
+
+def _page(params):
+    return _int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT), _int_param(params, "offset", 0)
+
+
+def _paginated(conn, sql, args, params):
+    limit, offset = _page(params)
+    rows = conn.execute(f"{sql} LIMIT ? OFFSET ?", (*args, limit + 1, offset)).fetchall()
+    items = [dict(row) for row in rows[:limit]]
+    return {
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(rows) > limit else None,
+    }
+
+
+def list_clients(conn, params):
+    """GET /clients?name=&limit=&offset= — клиенты, фильтр по подстроке имени."""
+    sql, args = "SELECT id, name, email, phone, address FROM clients", []
+    name = _str_param(params, "name")
+    if name:
+        sql += " WHERE name LIKE ?"
+        args.append(f"%{name}%")
+    return _paginated(conn, sql + " ORDER BY id", args, params)
+
+
+def list_products(conn, params):
+    """GET /products?category=&limit=&offset= — товары, фильтр по категории."""
+    sql, args = "SELECT id, name, price, category FROM products", []
+    category = _str_param(params, "category")
+    if category:
+        sql += " WHERE category = ?"
+        args.append(category)
+    return _paginated(conn, sql + " ORDER BY id", args, params)
+
+
+def list_orders(conn, params):
+    """
+    GET /orders — заказы с фильтрами client (имя), client_id, date_from,
+    date_to, min_total, max_total и пагинацией limit/offset.
+    """
+    conditions, args = [], []
+    client = _str_param(params, "client")
+    if client:
+        conditions.append("c.name = ?")
+        args.append(client)
+    client_id = _int_param(params, "client_id", None, minimum=1)
+    if client_id is not None:
+        conditions.append("o.client_id = ?")
+        args.append(client_id)
+    date_from, date_to = _str_param(params, "date_from"), _str_param(params, "date_to")
+    if date_from:
+        conditions.append("o.date >= ?")
+        args.append(date_from)
+    if date_to:
+        # Даты могут содержать время: граница включает весь последний день (как в `db.load_orders_page`)
+        conditions.append("o.date < ?")
+        args.append(date_to + db.DATE_END)
+    for name, op in (("min_total", ">="), ("max_total", "<=")):
+        value = _float_param(params, name)
+        if value is not None:
+            conditions.append(f"o.total {op} ?")
+            args.append(value)
+    sql = """SELECT o.id, c.name AS client, o.client_id, o.products, o.date, o.total
+             FROM orders o LEFT JOIN clients c ON c.id = o.client_id"""
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return _paginated(conn, sql + " ORDER BY o.id", args, params)
+
+
+def client_stats(conn, params):
+    """GET /stats/clients — количество заказов и общая сумма по клиентам (как в `analysis.client_stats`)."""
+    # Группировка по числовому ключу, имя клиента подставляется после агрегации
+    sql = """SELECT c.name AS client, s.client_id, s.order_count, s.total
+             FROM (SELECT client_id, COUNT(*) AS order_count, ROUND(SUM(total), 2) AS total
+                   FROM orders GROUP BY client_id) s
+             LEFT JOIN clients c ON c.id = s.client_id
+             ORDER BY s.order_count DESC, s.client_id"""
+    return _paginated(conn, sql, [], params)
+
+
+def monthly_sales(conn, params):
+    """GET /stats/monthly — сумма продаж по месяцам ("ГГГГ-ММ")."""
+    sql = """SELECT substr(date, 1, 7) AS month, COUNT(*) AS order_count, ROUND(SUM(total), 2) AS total
+             FROM orders GROUP BY month ORDER BY month"""
+    return _paginated(conn, sql, [], params)
+
+
+def daily_orders(conn, params):
+    """GET /stats/daily?month=ГГГГ-ММ — количество заказов по дням месяца."""
+    month = _str_param(params, "month")
+    if not month:
+        raise BadRequest("Не задан параметр month (ГГГГ-ММ)")
+    sql = """SELECT date AS day, COUNT(*) AS order_count FROM orders
+             WHERE date >= ? AND date < ? GROUP BY date ORDER BY date"""
+    return _paginated(conn, sql, [month + "-01", month + "-32"], params)
+
+
+def rfm(conn, params):
+    """GET /stats/rfm — RFM-сегментация клиентов (`analysis.rfm_scores`)."""
+    from analysis import rfm_scores
+    table = rfm_scores(conn)
+    limit, offset = _page(params)
+    page = table.iloc[offset:offset + limit]
+    return {
+        "items": json.loads(page.to_json(orient="records", force_ascii=False)),
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < len(table) else None,
+    }
+
+
+def cohorts(conn, params):
+    """GET /stats/cohorts — матрица удержания по когортам (`analysis.cohort_retention`)."""
+    from analysis import cohort_retention
+    table = cohort_retention(conn)
+    return {"items": json.loads(table.reset_index().to_json(orient="records", force_ascii=False))}
+
+
+ROUTES = {
+    "/clients": list_clients,
+    "/products": list_products,
+    "/orders": list_orders,
+    "/stats/clients": client_stats,
+    "/stats/monthly": monthly_sales,
+    "/stats/daily": daily_orders,
+    "/stats/rfm": rfm,
+    "/stats/cohorts": cohorts,
+}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Обработчик GET-запросов API. Пул подключений берётся из `self.server.pool`."""
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят отдельными пакетами; без этого keep-alive
+    # соединения ждут отложенного ACK (~40 мс) на каждом ответе
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        handler = ROUTES.get(url.path.rstrip("/") or "/")
+        if handler is None:
+            self._send(404, {"error": "Неизвестный адрес", "routes": sorted(ROUTES)})
+            return
+        try:
+            with self.server.pool.connection() as conn:
+                body = handler(conn, parse_qs(url.query))
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+        except sqlite3.Error as e:
+            self._send(500, {"error": f"Ошибка базы данных: {e}"})
+        except Exception as e:
+            # Без ответа клиент получил бы обрыв соединения
+            self.log_error("Ошибка обработки %s: %r", url.path, e)
+            self._send(500, {"error": f"Внутренняя ошибка: {type(e).__name__}"})
+        else:
+            self._send(200, body)
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def create_server(host="127.0.0.1", port=8080, db_path=None, pool_size=POOL_SIZE, quiet=False):
+    """
+    Создаёт HTTP-сервер API.
+
+    Parameters
+    ----------
+    host : str, optional
+        Адрес для прослушивания.
+    port : int, optional
+        Порт; 0 — выбрать свободный порт.
+    db_path : str, optional
+        Путь к базе данных. По умолчанию `db.DB_NAME`.
+    pool_size : int, optional
+        Размер пула подключений.
+    quiet : bool, optional
+        Не выводить журнал запросов.
+
+    Returns
+    -------
+    http.server.ThreadingHTTPServer
+        Сервер; запускается вызовом `serve_forever()`.
+    """
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.pool = ConnectionPool(db_path or db.DB_NAME, pool_size)
+    server.quiet = quiet
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API к базе заказов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.db, args.pool_size)
+    print(f"API запущен: http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Архивирование старых заказов по периодам.
+
+Заказы старше заданной даты переносятся из рабочей таблицы в отдельные файлы
+базы данных — по одному на год или месяц (`archive/orders_2024.db`). Реестр
+архивов хранится в рабочей базе в таблице `archive_partitions`. Давно не
+использовавшиеся архивы можно сжать gzip; при чтении они распаковываются во
+временный файл.
+
+Чтение с учётом архивов выполняется по одному разделу за раз (`ATTACH` —
+запрос — `DETACH`), поэтому число архивов не ограничено лимитом
+одновременно подключённых баз SQLite.
+"""
+
+import atexit
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+import db
+from db import connect
+import changelog
+import leaderboard
+
+ARCHIVE_DIR = "archive"
+PERIODS = ("year", "month")
+# Допустимые ключи разделов: год или месяц
+_PERIOD_KEY = re.compile(r"\d{4}(-(0[1-9]|1[0-2]))?")
+OP_ARCHIVE = "archive"
+
+_decompressed = {}
+
+
+def create_archive_registry(cursor):
+    """Создаёт таблицу реестра архивных разделов."""
+    cursor.execute("""CREATE TABLE IF NOT EXISTS archive_partitions (
+        period TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        min_date TEXT,
+        max_date TEXT,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        compressed INTEGER NOT NULL DEFAULT 0
+    )""")
+
+
+def period_bounds(period_key):
+    """
+    Возвращает границы периода в виде строк для сравнения с датами ISO.
+
+    Parameters
+    ----------
+    period_key : str
+        Год ("2024") или месяц ("2024-05").
+
+    Returns
+    -------
+    tuple of str
+        (начало включительно, конец не включительно).
+
+    Raises
+    ------
+    ValueError
+        Если ключ не является годом или месяцем.
+    """
+    if not _PERIOD_KEY.fullmatch(period_key or ""):
+        raise ValueError(f"Некорректный ключ периода: {period_key!r}")
+    if len(period_key) == 4:
+        return period_key, f"{int(period_key) + 1:04d}"
+    year, month = int(period_key[:4]), int(period_key[5:7])
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return period_key, f"{year:04d}-{month:02d}"
+
+
+def _order_columns(conn, schema="main"):
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info(orders)")]
+
+
+def _partition_file(path, compressed):
+    """Возвращает путь к файлу раздела, распаковывая сжатый архив при необходимости."""
+    if not compressed:
+        return path
+    cached = _decompressed.get(path)
+    if cached and os.path.exists(cached):
+        return cached
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", prefix="ecom_archive_")
+    with os.fdopen(fd, "wb") as out, gzip.open(path + ".gz", "rb") as src:
+        shutil.copyfileobj(src, out)
+    _decompressed[path] = tmp_path
+    return tmp_path
+
+
+@atexit.register
+def _remove_decompressed():
+    for tmp_path in _decompressed.values():
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    _decompressed.clear()
+
+
+def _decompress_in_place(cursor, key, path):
+    with gzip.open(path + ".gz", "rb") as src, open(path, "wb") as out:
+        shutil.copyfileobj(src, out)
+    os.remove(path + ".gz")
+    _decompressed.pop(path, None)
+    cursor.execute("UPDATE archive_partitions SET compressed = 0 WHERE period = ?", (key,))
+
+
+def archive_orders(cutoff, period="year", archive_dir=ARCHIVE_DIR):
+    """
+    Переносит заказы с датой раньше `cutoff` в архивные файлы по периодам.
+
+    Перенос каждого периода выполняется одной транзакцией по рабочей и
+    архивной базам. Удаления в журнале изменений помечаются операцией
+    "archive", чтобы потребители не считали их удалёнными заказами.
+    Заказы с пустой или нераспознанной датой остаются в рабочей базе.
+
+    Parameters
+    ----------
+    cutoff : str
+        Граничная дата в формате "ГГГГ-ММ-ДД".
+    period : str, optional
+        Размер раздела: "year" или "month".
+    archive_dir : str, optional
+        Каталог архивных файлов.
+
+    Returns
+    -------
+    dict
+        Количество перенесённых заказов по периодам.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Неизвестный период: {period}")
+    os.makedirs(archive_dir, exist_ok=True)
+    key_len = 4 if period == "year" else 7
+
+    conn = connect()
+    conn.isolation_level = None  # транзакциями управляем явно: ATTACH внутри транзакции запрещён
+    cursor = conn.cursor()
+    create_archive_registry(cursor)
+    changelog.install_change_log(cursor)
+    leaderboard.create_leaderboards(cursor)
+    columns = _order_columns(conn)
+    names = ", ".join(name for name, _ in columns)
+    periods = [row[0] for row in cursor.execute(
+        f"SELECT DISTINCT substr(date, 1, {key_len}) FROM orders WHERE date < ? ORDER BY 1", (cutoff,)
+    ).fetchall() if _PERIOD_KEY.fullmatch(row[0]) and len(row[0]) == key_len]
+
+    moved = {}
+    for key in periods:
+        start, end = period_bounds(key)
+        existing = cursor.execute(
+            "SELECT path, compressed FROM archive_partitions WHERE period = ?", (key,)
+        ).fetchone()
+        if existing and existing[1]:
+            # Дописываем в сжатый архив: распаковываем обратно на место
+            _decompress_in_place(cursor, key, existing[0])
+        path = existing[0] if existing else os.path.join(archive_dir, f"orders_{key.replace('-', '_')}.db")
+
+        cursor.execute("ATTACH DATABASE ? AS arch", (path,))
+        try:
+            column_defs = ", ".join(
+                f"{name} INTEGER PRIMARY KEY" if name == "id" else f"{name} {col_type}"
+                for name, col_type in columns
+            )
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS arch.orders ({column_defs})")
+            cursor.execute("CREATE INDEX IF NOT EXISTS arch.idx_orders_date ON orders (date)")
+            with db.transaction_on(conn):
+                seq_before = changelog.current_seq(conn)
+                where = "date >= ? AND date < ? AND date < ?"
+                args = (start, end, cutoff)
+                cursor.execute(f"INSERT INTO arch.orders ({names}) SELECT {names} FROM main.orders WHERE {where}", args)
+                moved[key] = leaderboard.forget_orders(cursor, where, args)
+                cursor.execute(
+                    "UPDATE change_log SET op = ? WHERE seq > ? AND table_name = 'orders' AND op = ?",
+                    (OP_ARCHIVE, seq_before, changelog.OP_DELETE)
+                )
+                min_date, max_date, count = cursor.execute(
+                    "SELECT MIN(date), MAX(date), COUNT(*) FROM arch.orders").fetchone()
+                cursor.execute(
+                    """INSERT INTO archive_partitions (period, path, min_date, max_date, row_count, compressed)
+                       VALUES (?, ?, ?, ?, ?, 0)
+                       ON CONFLICT(period) DO UPDATE SET
+                           path = excluded.path, min_date = excluded.min_date,
+                           max_date = excluded.max_date, row_count = excluded.row_count""",
+                    (key, path, min_date, max_date, count)
+                )
+        finally:
+            cursor.execute("DETACH DATABASE arch")
+    conn.close()
+    return moved
+
+
+def migrate_archive_client_keys():
+    """
+    Переводит `client_id` архивных разделов с имён клиентов на ID (см.
+    `db.migrate_client_keys`).
+
+    Сжатые разделы старого формата распаковываются на место и остаются
+    несжатыми до следующего вызова `compress_cold_archives`.
+
+    Returns
+    -------
+    int
+        Количество перенесённых заказов.
+    """
+    conn = connect()
+    conn.isolation_level = None  # ATTACH внутри транзакции запрещён
+    cursor = conn.cursor()
+    migrated = 0
+    for key, path, compressed in partitions_for_range(conn):
+        with _attached(conn, path, compressed):
+            column_type = next((row[2] for row in conn.execute("PRAGMA arch.table_info(orders)")
+                                if row[1] == "client_id"), "INTEGER")
+        if column_type.upper() == "INTEGER":
+            continue
+        if compressed:
+            _decompress_in_place(cursor, key, path)
+        cursor.execute("ATTACH DATABASE ? AS arch", (path,))
+        try:
+            with db.transaction_on(conn):
+                migrated += db.migrate_client_keys(cursor, schema="arch")
+                cursor.execute("CREATE INDEX IF NOT EXISTS arch.idx_orders_date ON orders (date)")
+        finally:
+            cursor.execute("DETACH DATABASE arch")
+    conn.close()
+    return migrated
+
+
+def compress_cold_archives(older_than_days=90):
+    """
+    Сжимает архивные файлы, к которым не обращались дольше указанного срока.
+
+    Parameters
+    ----------
+    older_than_days : float, optional
+        Порог давности последнего изменения файла в днях.
+
+    Returns
+    -------
+    list of str
+        Периоды, архивы которых были сжаты.
+    """
+    threshold = time.time() - older_than_days * 86400
+    compressed = []
+    with db.transaction() as tx:
+        create_archive_registry(tx.cursor)
+        for key, path in tx.cursor.execute(
+                "SELECT period, path FROM archive_partitions WHERE compressed = 0").fetchall():
+            if not os.path.exists(path) or os.path.getmtime(path) > threshold:
+                continue
+            with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as out:
+                shutil.copyfileobj(src, out)
+            os.remove(path)
+            tx.cursor.execute("UPDATE archive_partitions SET compressed = 1 WHERE period = ?", (key,))
+            compressed.append(key)
+    return compressed
+
+
+def partitions_for_range(conn, date_from=None, date_to=None):
+    """
+    Возвращает архивные разделы, пересекающиеся с диапазоном дат.
+
+    Returns
+    -------
+    list of tuple
+        Кортежи (period, path, compressed) в порядке возрастания периода.
+    """
+    sql = "SELECT period, path, compressed FROM archive_partitions WHERE 1 = 1"
+    args = []
+    if date_from:
+        sql += " AND max_date >= ?"
+        args.append(date_from)
+    if date_to:
+        sql += " AND min_date < ?"
+        args.append(date_to + db.DATE_END)
+    try:
+        return list(conn.execute(sql + " ORDER BY period", args).fetchall())
+    except sqlite3.OperationalError:
+        # Архивов ещё не было — реестр не создан
+        return []
+
+
+def partition_files(conn, date_from=None, date_to=None):
+    """
+    Возвращает пути к файлам архивных разделов, пересекающихся с диапазоном дат.
+
+    Сжатые архивы распаковываются во временные файлы, поэтому пути можно
+    открывать отдельными подключениями (например, из других процессов).
+
+    Returns
+    -------
+    list of str
+    """
+    return [_partition_file(path, compressed) for _, path, compressed in partitions_for_range(conn, date_from, date_to)]
+
+
+@contextmanager
+def _attached(conn, path, compressed):
+    conn.execute("ATTACH DATABASE ? AS arch", (_partition_file(path, compressed),))
+    try:
+        yield "arch"
+    finally:
+        conn.execute("DETACH DATABASE arch")
+
+
+def iter_order_schemas(conn, date_from=None, date_to=None):
+    """
+    Перебирает схемы, содержащие заказы из диапазона дат: сначала по очереди
+    подключаемые архивные разделы ("arch") от старых к новым, затем рабочую
+    таблицу ("main").
+
+    Запрос к очередной схеме нужно полностью выполнить до перехода к
+    следующей: после этого раздел отключается.
+
+    Yields
+    ------
+    str
+        Имя схемы для запросов вида `SELECT ... FROM {schema}.orders`.
+    """
+    for _, path, compressed in partitions_for_range(conn, date_from, date_to):
+        with _attached(conn, path, compressed) as schema:
+            yield schema
+    yield "main"
+
+
+def date_filter(date_from=None, date_to=None):
+    """
+    Возвращает условие WHERE и параметры для диапазона дат заказов.
+
+    Обе границы включительно; даты со временем попадают в последний день
+    диапазона (как в `db.load_orders_page`).
+
+    Returns
+    -------
+    tuple of (str, list)
+        Условие (пустая строка, если диапазон не задан) и параметры.
+    """
+    conditions, args = [], []
+    if date_from:
+        conditions.append("date >= ?")
+        args.append(date_from)
+    if date_to:
+        conditions.append("date < ?")
+        args.append(date_to + db.DATE_END)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
@@ -0,0 +1,310 @@
+"""
+Асинхронный слой доступа к данным, повторяющий функции модуля `db`.
+
+Вся работа с SQLite выполняется в отдельном пуле потоков ограниченного размера,
+поэтому вызовы не блокируют цикл событий asyncio. У каждого рабочего потока
+своё подключение; запись сериализуется блокировкой, чтение идёт параллельно.
+Отмена задачи asyncio прерывает выполняемый SQL-запрос.
+
+Пример
+------
+>>> async with AsyncDatabase("ecom.db") as adb:
+...     orders = await adb.load_orders()
+"""
+
+import asyncio
+import csv
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import leaderboard
+from models import Client, Product
+
+# Количество рабочих потоков (одновременно выполняемых запросов)
+MAX_WORKERS = 4
+# Время ожидания блокировки записи другим процессом, сек.
+BUSY_TIMEOUT = 5.0
+# Через сколько инструкций виртуальной машины SQLite проверяется отмена
+CANCEL_CHECK_STEPS = 1000
+
+_default = None
+
+
+def enable_wal(db_path=None):
+    """
+    Переводит базу в режим журнала WAL.
+
+    Режим сохраняется в файле базы и действует для всех программ и
+    процессов, которые с ней работают, поэтому включается явно, один раз
+    при настройке, а не при каждом подключении.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Путь к базе данных. По умолчанию `db.DB_NAME`.
+
+    Returns
+    -------
+    str
+        Установленный режим журнала ("wal").
+    """
+    conn = sqlite3.connect(db_path or db.DB_NAME, uri=True, timeout=BUSY_TIMEOUT)
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class AsyncDatabase:
+    """Асинхронный доступ к базе заказов через пул потоков.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Путь к базе данных. По умолчанию `db.DB_NAME`.
+    max_workers : int, optional
+        Максимальное количество одновременно выполняемых запросов.
+
+    Notes
+    -----
+    Режим журнала базы не меняется. В режиме по умолчанию открытый курсор
+    `iter_orders` удерживает блокировку чтения между обращениями, и запись
+    ждёт его завершения; чтобы чтение и запись шли одновременно, базу один
+    раз переводят в режим WAL функцией `enable_wal`.
+    """
+    def __init__(self, db_path=None, max_workers=MAX_WORKERS):
+        self.db_path = db_path or db.DB_NAME
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ecom-async-db")
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Дожидается завершения запросов и закрывает все подключения."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    async def run(self, func, *args, write=False, conn=None, executor=None):
+        """
+        Выполняет `func(conn, *args)` в пуле потоков.
+
+        Parameters
+        ----------
+        func : callable
+            Функция, получающая подключение рабочего потока первым аргументом.
+        conn : sqlite3.Connection, optional
+            Использовать указанное подключение вместо подключения рабочего потока.
+        executor : concurrent.futures.Executor, optional
+            Выполнить в указанном пуле вместо общего.
+        write : bool, optional
+            Операция изменяет данные: выполняется под блокировкой записи и
+            фиксируется по завершении (или откатывается при ошибке).
+
+        Returns
+        -------
+        object
+            Результат `func`.
+
+        Raises
+        ------
+        asyncio.CancelledError
+            Если задача отменена; выполняемый запрос при этом прерывается.
+        """
+        cancelled = threading.Event()
+
+        def job():
+            if cancelled.is_set():
+                raise asyncio.CancelledError()
+            job_conn = conn or self._connection()
+            job_conn.set_progress_handler(cancelled.is_set, CANCEL_CHECK_STEPS)
+            try:
+                if not write:
+                    return func(job_conn, *args)
+                with self._write_lock, db.transaction_on(job_conn):
+                    return func(job_conn, *args)
+            finally:
+                job_conn.set_progress_handler(None, 0)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor or self._executor, job)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    # ---------- Чтение ----------
+    async def load_clients(self):
+        """Асинхронная версия `db.load_clients`."""
+        rows = await self.run(lambda conn: conn.execute("SELECT name, email, phone, address, id FROM clients").fetchall())
+        return [Client(*row) for row in rows]
+
+    async def load_products(self):
+        """Асинхронная версия `db.load_products`."""
+        rows = await self.run(lambda conn: conn.execute("SELECT name, price, category, id FROM products").fetchall())
+        return [Product(*row) for row in rows]
+
+    async def load_orders(self):
+        """Асинхронная версия `db.load_orders`."""
+        return [order async for order in self.iter_orders()]
+
+    async def iter_orders(self, batch_size=1000):
+        """
+        Асинхронно перебирает заказы, подгружая их пакетами.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Количество строк, читаемых за одно обращение к пулу потоков.
+
+        Yields
+        ------
+        dict
+            Заказ с ключами как у `db.load_orders`.
+        """
+        # Отдельное подключение держит открытый курсор (и блокировку чтения) между
+        # обращениями. Пакеты читаются в собственном потоке: если общий пул занят
+        # записью, ждущей эту блокировку, чтение всё равно дойдёт до конца и освободит её
+        iter_conn = self._open()
+        iter_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ecom-async-iter")
+        try:
+            cursor = await self.run(lambda conn: conn.execute(
+                db.ORDER_SELECT.format(schema="main") + " ORDER BY o.id"), conn=iter_conn, executor=iter_executor)
+            while True:
+                rows = await self.run(lambda conn: cursor.fetchmany(batch_size), conn=iter_conn,
+                                      executor=iter_executor)
+                if not rows:
+                    break
+                for r in rows:
+                    yield db.order_from_row(r)
+        finally:
+            iter_executor.shutdown()
+            with self._connections_lock:
+                if iter_conn in self._connections:
+                    self._connections.remove(iter_conn)
+            iter_conn.close()
+
+    # ---------- Запись ----------
+    async def save_client(self, client):
+        """Асинхронная версия `db.save_client`."""
+        await self.run(lambda conn: db.Transaction(conn).save_client(client), write=True)
+
+    async def save_order(self, order):
+        """
+        Асинхронная версия `db.save_order`.
+
+        Returns
+        -------
+        int
+            ID сохранённого заказа.
+        """
+        return await self.run(lambda conn: db.insert_order(conn.cursor(), order), write=True)
+
+    async def delete_order(self, order_id):
+        """Удаляет заказ по ID."""
+        await self.run(lambda conn: leaderboard.forget_orders(conn.cursor(), "id = ?", (order_id,)), write=True)
+
+    async def delete_order_by_index(self, index):
+        """Асинхронная версия `db.delete_order_by_index`."""
+        def delete(conn):
+            row = conn.execute("SELECT id FROM orders ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+            if row:
+                leaderboard.forget_orders(conn.cursor(), "id = ?", (row[0],))
+        await self.run(delete, write=True)
+
+    async def delete_client_by_name(self, name, with_orders=False):
+        """Асинхронная версия `db.delete_client_by_name`."""
+        await self.run(lambda conn: db.Transaction(conn).delete_client_by_name(name, with_orders), write=True)
+
+    async def delete_client_by_id(self, client_id, with_orders=False):
+        """Асинхронная версия `db.delete_client_by_id`."""
+        return await self.run(lambda conn: db.Transaction(conn).delete_client_by_id(client_id, with_orders),
+                              write=True)
+
+    # ---------- Экспорт ----------
+    async def export_orders_to_csv(self, filename="orders_export.csv", batch_size=5000):
+        """
+        Асинхронная версия `db.export_orders_to_csv`.
+
+        Заказы читаются пакетами, поэтому весь список в памяти не держится.
+        """
+        loop = asyncio.get_running_loop()
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["client", "products", "date", "total"], extrasaction="ignore")
+            writer.writeheader()
+            batch = []
+            async for order in self.iter_orders(batch_size):
+                batch.append(order)
+                if len(batch) >= batch_size:
+                    await loop.run_in_executor(None, writer.writerows, batch)
+                    batch = []
+            writer.writerows(batch)
+
+
+def get_default():
+    """Возвращает общий экземпляр `AsyncDatabase` для `db.DB_NAME`."""
+    global _default
+    if _default is None or _default.db_path != db.DB_NAME:
+        _default = AsyncDatabase()
+    return _default
+
+
+async def load_clients():
+    return await get_default().load_clients()
+
+
+async def load_products():
+    return await get_default().load_products()
+
+
+async def load_orders():
+    return await get_default().load_orders()
+
+
+async def save_client(client):
+    await get_default().save_client(client)
+
+
+async def save_order(order):
+    return await get_default().save_order(order)
+
+
+async def delete_order_by_index(index):
+    await get_default().delete_order_by_index(index)
+
+
+async def delete_client_by_name(name, with_orders=False):
+    await get_default().delete_client_by_name(name, with_orders)
+
+
+async def delete_client_by_id(client_id, with_orders=False):
+    return await get_default().delete_client_by_id(client_id, with_orders)
+
+
+async def export_orders_to_csv(filename="orders_export.csv"):
+    await get_default().export_orders_to_csv(filename)
@@ -0,0 +1,257 @@
+"""
+Резервное копирование и снимки базы данных.
+
+Копирование выполняется через инкрементальный backup API SQLite: за один шаг
+переносится ограниченное число страниц, после чего блокировка источника
+освобождается, поэтому приложение продолжает работать во время копирования.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+import cache
+import db
+from db import connect
+
+# Количество страниц, копируемых за один шаг, и пауза между шагами (сек.)
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+# Файл снимка для тяжёлой аналитики и период его обновления (сек.) из
+# переменной окружения ECOM_SNAPSHOT_INTERVAL.
+# 0 — расписание снимков отключено, аналитика читает рабочую базу.
+SNAPSHOT_NAME = "ecom_snapshot.db"
+SNAPSHOT_INTERVAL = float(os.environ.get("ECOM_SNAPSHOT_INTERVAL", "0"))
+# Сколько последних версий снимка хранится: предыдущую ещё могут читать
+# аналитические запросы, открытые до переключения
+SNAPSHOT_KEEP = 2
+
+_scheduler = None
+
+
+def backup_database(dest_path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, progress=None):
+    """
+    Создаёт согласованную копию рабочей базы данных без остановки приложения.
+
+    Копия сначала пишется во временный файл и затем атомарно заменяет
+    `dest_path`, поэтому по пути назначения никогда не лежит недописанный файл.
+
+    Parameters
+    ----------
+    dest_path : str
+        Путь к файлу копии.
+    pages : int, optional
+        Количество страниц, копируемых за один шаг.
+    sleep : float, optional
+        Пауза между шагами в секундах.
+    progress : callable, optional
+        Функция `progress(status, remaining, total)`, вызываемая после каждого шага.
+    """
+    tmp_path = dest_path + ".part"
+    src = connect()
+    dst = sqlite3.connect(tmp_path)
+    try:
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, dest_path)
+
+
+def start_backup(dest_path, on_done=None, progress=None):
+    """
+    Запускает резервное копирование в фоновом потоке.
+
+    Parameters
+    ----------
+    dest_path : str
+        Путь к файлу копии.
+    on_done : callable, optional
+        Функция `on_done(error)`, вызываемая по завершении; `error` — None
+        при успехе или возникшее исключение.
+    progress : callable, optional
+        Функция прогресса, см. `backup_database`.
+
+    Returns
+    -------
+    threading.Thread
+        Запущенный поток копирования.
+    """
+    def run():
+        error = None
+        try:
+            backup_database(dest_path, progress=progress)
+        except Exception as e:
+            error = e
+        if on_done:
+            on_done(error)
+
+    thread = threading.Thread(target=run, name="ecom-backup", daemon=True)
+    thread.start()
+    return thread
+
+
+def create_snapshot(path=SNAPSHOT_NAME):
+    """
+    Обновляет снимок базы данных для аналитики.
+
+    Parameters
+    ----------
+    path : str, optional
+        Путь к файлу снимка.
+    """
+    backup_database(path)
+
+
+def connect_snapshot(path=SNAPSHOT_NAME):
+    """
+    Открывает снимок базы данных только для чтения.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Подключение к снимку в режиме `mode=ro`.
+    """
+    uri = "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+class SnapshotScheduler:
+    """Периодически обновляет снимок базы данных в фоновом потоке.
+
+    Каждое обновление пишется в новый файл версии ("ecom_snapshot.3.db"),
+    после чего `current` переключается на него. Файл, который могут читать
+    открытые подключения, не перезаписывается (в Windows это невозможно);
+    устаревшие версии удаляются, когда их больше никто не держит открытыми.
+
+    Parameters
+    ----------
+    interval : float
+        Период обновления снимка в секундах.
+    path : str, optional
+        Путь к файлу снимка.
+    """
+    def __init__(self, interval, path=SNAPSHOT_NAME):
+        self.interval = interval
+        self.path = path
+        self.current = None
+        self.last_snapshot = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._version = 0
+        self._versions = []
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ecom-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _next_path(self):
+        root, ext = os.path.splitext(self.path)
+        self._version += 1
+        return f"{root}.{self._version}{ext}"
+
+    def _remove_old_versions(self):
+        """Удаляет устаревшие версии; занятые файлы остаются до следующей попытки."""
+        keep = self._versions[-SNAPSHOT_KEEP:]
+        for path in self._versions[:-SNAPSHOT_KEEP]:
+            cache.close_monitors(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Файл ещё открыт читателем (Windows)
+                keep.insert(0, path)
+        self._versions = keep
+
+    def refresh(self):
+        """Создаёт новую версию снимка и переключает на неё аналитику."""
+        path = self._next_path()
+        create_snapshot(path)
+        self._versions.append(path)
+        self.current = path
+        self.last_snapshot = time.time()
+        self._remove_old_versions()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                print(f"Ошибка при создании снимка базы: {e}")
+            self._stop.wait(self.interval)
+
+
+def start_snapshot_schedule(interval=SNAPSHOT_INTERVAL, path=SNAPSHOT_NAME):
+    """
+    Запускает расписание снимков, используемых аналитикой.
+
+    Returns
+    -------
+    SnapshotScheduler or None
+        Запущенный планировщик, либо None, если интервал не задан.
+    """
+    global _scheduler
+    if not interval:
+        return None
+    stop_snapshot_schedule()
+    _scheduler = SnapshotScheduler(interval, path)
+    _scheduler.start()
+    return _scheduler
+
+
+def stop_snapshot_schedule():
+    """Останавливает расписание снимков."""
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def analytics_path():
+    """
+    Возвращает путь к базе для тяжёлых аналитических запросов.
+
+    Returns
+    -------
+    str
+        Путь к последней версии снимка, если расписание снимков запущено
+        и снимок создан, иначе путь к рабочей базе.
+    """
+    if _scheduler is not None and _scheduler.current is not None and os.path.exists(_scheduler.current):
+        return _scheduler.current
+    return db.DB_NAME
+
+
+def analytics_connect():
+    """
+    Возвращает подключение для тяжёлых аналитических запросов.
+
+    Если расписание снимков запущено и снимок уже создан, запросы идут к
+    снимку только для чтения и не конкурируют с записью в рабочую базу.
+    Иначе используется обычное подключение `connect()`.
+
+    Returns
+    -------
+    sqlite3.Connection
+    """
+    path = analytics_path()
+    if path != db.DB_NAME:
+        return connect_snapshot(path)
+    return connect()
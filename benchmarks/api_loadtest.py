@@ -0,0 +1,110 @@
+"""
+Нагрузочный тест HTTP API: генерирует базу, поднимает сервер и в несколько
+потоков отправляет запросы к разным адресам, после чего выводит число
+запросов в секунду и перцентили задержки.
+
+Запуск из корня проекта:
+python benchmarks/api_loadtest.py [--orders 200000] [--threads 16] [--duration 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.client import HTTPConnection
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import create_server
+from datagen import client_name, generate_database
+
+PATHS = [
+    "/clients?limit=50",
+    "/products",
+    "/orders?limit=100",
+    "/orders?date_from=2024-03-01&date_to=2024-03-31&limit=100",
+    "/orders?min_total=500&limit=50",
+    "/stats/monthly",
+    "/stats/daily?month=2024-02",
+]
+
+
+def worker(port, stop_at, latencies, errors, seed, clients):
+    rng = random.Random(seed)
+    conn = HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.perf_counter() < stop_at:
+        if rng.random() < 0.2:
+            path = f"/orders?client={quote(client_name(rng.randrange(clients)))}&limit=20"
+        else:
+            path = rng.choice(PATHS)
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except Exception as e:
+            errors.append(repr(e))
+            conn.close()
+            conn = HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=2_000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "loadtest.db")
+        print(f"Генерация базы: {args.orders} заказов...")
+        generate_database(path, orders=args.orders, clients=args.clients)
+
+        server = create_server(port=0, db_path=path, pool_size=args.pool_size, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        latencies, errors = [], []
+        stop_at = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=worker, args=(server.server_port, stop_at, latencies, errors, i, args.clients))
+            for i in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        server.server_close()
+        server.pool.close()
+
+    if not latencies:
+        print("Нет успешных запросов")
+        return
+    print(f"Потоков: {args.threads}, пул подключений: {args.pool_size}")
+    print(f"Запросов: {len(latencies)}, ошибок: {len(errors)}")
+    print(f"Запросов/с: {len(latencies) / elapsed:.0f}")
+    print(f"p50: {percentile(latencies, 0.50) * 1000:.1f} мс, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
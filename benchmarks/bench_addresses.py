@@ -0,0 +1,56 @@
+"""
+Сравнение способов нормализации адресов клиентов.
+
+Адреса генерируются так же, как в `datagen` (несколько тысяч различных
+значений на сотни тысяч клиентов), и разбираются:
+
+* построчно без кэша — каждый адрес заново;
+* построчно через `addresses.normalize_address` с кэшем `lru_cache`;
+* столбцом через `addresses.normalize_addresses` (разбор только уникальных
+  значений столбца).
+
+Запуск из корня проекта:
+python benchmarks/bench_addresses.py [количество адресов]
+"""
+
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import addresses
+from datagen import CITIES, STREETS
+
+
+def uncached(column):
+    return [addresses._parse.__wrapped__(" ".join(text.split())) for text in column]
+
+
+def cached(column):
+    return [addresses.normalize_address(text) for text in column]
+
+
+def bulk(column):
+    return addresses.normalize_addresses(column)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    rng = random.Random(0)
+    column = pd.Series([f"г. {rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 120)}"
+                        for _ in range(count)])
+    print(f"Адресов: {count}, различных: {column.nunique()}")
+    for name, func in (("без кэша", uncached), ("lru_cache", cached), ("столбцом (pandas.factorize)", bulk)):
+        addresses._parse.cache_clear()
+        start = time.perf_counter()
+        func(column)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {elapsed:.2f} с, {count / elapsed:,.0f} адресов/с")
+
+
+if __name__ == "__main__":
+    main()
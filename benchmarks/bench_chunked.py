@@ -0,0 +1,63 @@
+"""
+Сравнение режимов агрегации заказов: вся таблица в памяти, пакетное чтение
+и пакеты в пуле процессов. Для каждого режима выводится время и пик памяти
+главного процесса (по tracemalloc).
+
+Запуск из корня проекта: python benchmarks/bench_chunked.py [количество заказов] [процессов]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import db
+from analysis import client_stats_from_db, monthly_sales
+from datagen import generate_database
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    modes = (
+        ("в памяти", {"chunksize": None}),
+        ("пакетами", {"chunksize": 100_000}),
+        (f"{processes} процесса(ов)", {"chunksize": 100_000, "processes": processes}),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "bench.db")
+        print(f"Генерация базы: {count} заказов...")
+        generate_database(db.DB_NAME, orders=count, clients=10_000)
+
+        print(f"{'Отчёт':25s} {'режим':18s} {'время, с':>9s} {'пик, МБ':>9s}")
+        for name, func in (("Статистика по клиентам", client_stats_from_db.uncached),
+                           ("Продажи по месяцам", monthly_sales)):
+            expected = None
+            for mode, kwargs in modes:
+                result, elapsed, peak = measure(lambda: func(**kwargs))
+                if expected is None:
+                    expected = result
+                elif isinstance(result, pd.DataFrame):
+                    pd.testing.assert_frame_equal(result, expected)
+                else:
+                    pd.testing.assert_series_equal(result, expected)
+                print(f"{name:25s} {mode:18s} {elapsed:9.2f} {peak:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Сравнение группировки и соединения заказов с клиентами по числовому ключу
+(`orders.client_id` → `clients.id`) и по имени клиента (прежний текстовый ключ).
+
+Запуск из корня проекта: python benchmarks/bench_client_key.py [количество заказов]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from datagen import generate_database
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        print(f"Генерация базы: {count} заказов...")
+        generate_database(path, orders=count, clients=10_000)
+        conn = sqlite3.connect(path)
+        # Копия заказов в прежнем формате: имя клиента вместо ID
+        conn.execute("""CREATE TABLE orders_text AS
+            SELECT o.id, c.name AS client_id, o.products, o.date, o.total
+            FROM orders o JOIN clients c ON c.id = o.client_id""")
+        conn.execute("CREATE INDEX idx_orders_text_client ON orders_text (client_id)")
+        conn.commit()
+
+        def query(sql):
+            return lambda: conn.execute(sql).fetchall()
+
+        cases = [
+            ("SQL GROUP BY клиент",
+             query("SELECT client_id, COUNT(*), SUM(total) FROM orders GROUP BY client_id"),
+             query("SELECT client_id, COUNT(*), SUM(total) FROM orders_text GROUP BY client_id")),
+            ("JOIN с клиентами",
+             query("""SELECT c.name, c.phone, o.total FROM orders o
+                      JOIN clients c ON c.id = o.client_id"""),
+             query("""SELECT c.name, c.phone, o.total FROM orders_text o
+                      JOIN clients c ON c.name = o.client_id""")),
+        ]
+        int_frame = pd.read_sql_query("SELECT client_id, total FROM orders", conn)
+        text_frame = pd.read_sql_query("SELECT client_id, total FROM orders_text", conn)
+        cases.append(("pandas groupby",
+                      lambda: int_frame.groupby("client_id")["total"].agg(["count", "sum"]),
+                      lambda: text_frame.groupby("client_id")["total"].agg(["count", "sum"])))
+        memory = (int_frame["client_id"].memory_usage(deep=True) / 2**20,
+                  text_frame["client_id"].memory_usage(deep=True) / 2**20)
+
+        print(f"{'Операция':22s} {'INTEGER, с':>11s} {'TEXT, с':>9s} {'ускорение':>10s}")
+        for name, int_case, text_case in cases:
+            int_time, text_time = timed(int_case), timed(text_case)
+            print(f"{name:22s} {int_time:11.3f} {text_time:9.3f} {text_time / int_time:9.1f}x")
+        print(f"Память колонки client_id в pandas: {memory[0]:.1f} МБ против {memory[1]:.1f} МБ")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Сравнение статистики по клиентам и продаж по месяцам: путь через SQL/pandas
+(`load_orders` и `read_sql_query`) против колоночного снимка с отображением в память.
+
+Запуск из корня проекта: python benchmarks/bench_columnar.py [количество заказов]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import db
+from analysis import client_stats
+from columnar import client_stats_columnar, monthly_sales_columnar, open_columnar_snapshot, write_columnar_snapshot
+from datagen import generate_database
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "bench.db")
+        print(f"Генерация базы: {count} заказов...")
+        generate_database(db.DB_NAME, orders=count, clients=10_000)
+        snapshot_dir = os.path.join(tmp, "snapshot")
+        _, write_time = timed(lambda: write_columnar_snapshot(snapshot_dir))
+
+        def sql_client_stats():
+            return client_stats(db.load_orders.uncached())
+
+        def sql_monthly():
+            conn = db.connect()
+            df = pd.read_sql_query("SELECT date, total FROM orders", conn)
+            conn.close()
+            df["month"] = pd.to_datetime(df["date"]).dt.month
+            return df.groupby("month")["total"].sum()
+
+        def columnar_client_stats():
+            return client_stats_columnar(open_columnar_snapshot(snapshot_dir))
+
+        def columnar_monthly():
+            return monthly_sales_columnar(open_columnar_snapshot(snapshot_dir))
+
+        expected, sql_stats_time = timed(sql_client_stats)
+        actual, col_stats_time = timed(columnar_client_stats)
+        assert expected["Количество заказов"].sum() == actual["Количество заказов"].sum()
+        _, sql_month_time = timed(sql_monthly)
+        _, col_month_time = timed(columnar_monthly)
+
+    print(f"Запись снимка: {write_time:.2f} с")
+    print(f"{'Отчёт':25s} {'SQL/pandas, с':>14s} {'снимок, с':>12s} {'ускорение':>10s}")
+    for name, sql_time, col_time in (
+        ("Статистика по клиентам", sql_stats_time, col_stats_time),
+        ("Продажи по месяцам", sql_month_time, col_month_time),
+    ):
+        print(f"{name:25s} {sql_time:14.3f} {col_time:12.3f} {sql_time / col_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Сравнение пропускной способности записи заказов: `save_order` с фиксацией
+каждого заказа против очереди групповой фиксации `GroupCommitWriter`.
+
+Запуск из корня проекта: python benchmarks/bench_group_commit.py [количество заказов]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from models import Order, Product
+from writer import GroupCommitWriter
+
+PRODUCTS = [Product("Чай", 120.0), Product("Квас", 80.5), Product("Сэндвич", 210.0)]
+
+
+def make_orders(count):
+    return [Order(f"Клиент {i % 500}", PRODUCTS[: 1 + i % 3]) for i in range(count)]
+
+
+def bench_per_order_commit(path, orders):
+    db.DB_NAME = path
+    start = time.perf_counter()
+    for order in orders:
+        db.save_order(order)
+    return time.perf_counter() - start
+
+
+def bench_group_commit(path, orders, producers=4, **options):
+    with GroupCommitWriter(path, **options) as writer:
+        start = time.perf_counter()
+        futures = []
+        lock = threading.Lock()
+
+        def produce(part):
+            local = [writer.submit(order) for order in part]
+            with lock:
+                futures.extend(local)
+
+        threads = [threading.Thread(target=produce, args=(orders[i::producers],)) for i in range(producers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    orders = make_orders(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [("save_order (fsync на каждый заказ)", bench_per_order_commit(os.path.join(tmp, "a.db"), orders))]
+        for sync in ("FULL", "NORMAL"):
+            path = os.path.join(tmp, f"group_{sync}.db")
+            results.append((f"GroupCommitWriter synchronous={sync}", bench_group_commit(path, orders, synchronous=sync)))
+        path = os.path.join(tmp, "group_wal.db")
+        results.append(("GroupCommitWriter WAL + NORMAL", bench_group_commit(path, orders, synchronous="NORMAL", wal=True)))
+
+    print(f"Заказов: {count}")
+    for name, elapsed in results:
+        print(f"{name:45s} {elapsed:8.3f} с  {count / elapsed:10.0f} заказов/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Скорость массового импорта заказов из CSV (`order_import`) в сравнении с
+сохранением по одному заказу через `db.save_order`.
+
+Генерирует CSV-файлы в формате заказов и позиций, импортирует их в базу с
+клиентами и товарами и выводит число строк в секунду.
+
+Запуск из корня проекта:
+python benchmarks/bench_order_import.py [количество заказов]
+"""
+
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from datagen import PRODUCTS, client_name, generate_database
+from models import Order, Product
+from order_import import import_orders_from_csv
+
+CLIENTS = 10_000
+# Сколько заказов сохраняется по одному для сравнения
+SINGLE_ORDERS = 2_000
+
+
+def write_files(tmp, count, seed=0):
+    rng = random.Random(seed)
+    orders_path = os.path.join(tmp, "orders.csv")
+    items_path = os.path.join(tmp, "line_items.csv")
+    with open(orders_path, "w", newline="", encoding="utf-8") as f_orders, \
+            open(items_path, "w", newline="", encoding="utf-8") as f_items:
+        orders_writer, items_writer = csv.writer(f_orders), csv.writer(f_items)
+        orders_writer.writerow(["client", "products", "date", "total"])
+        items_writer.writerow(["order", "client", "product", "quantity", "price", "date"])
+        items = 0
+        for i in range(count):
+            client = client_name(rng.randrange(CLIENTS))
+            products = rng.sample(PRODUCTS, rng.randint(1, 4))
+            day = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            total = round(sum(p[1] for p in products), 2)
+            orders_writer.writerow([client, ",".join(p[0] for p in products), day, total])
+            for name, price, _ in products:
+                items_writer.writerow([i, client, name, 1, price, day])
+                items += 1
+    return orders_path, items_path, items
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        empty = os.path.join(tmp, "empty.db")
+        generate_database(empty, orders=0, clients=CLIENTS)
+        print(f"Генерация CSV: {count} заказов...")
+        orders_path, items_path, items = write_files(tmp, count)
+        print(f"Строк: {count} (заказы), {items} (позиции)")
+
+        for name, path in (("Формат заказов", orders_path), ("Формат позиций", items_path)):
+            target = os.path.join(tmp, "target.db")
+            shutil.copy(empty, target)
+            with patch("db.DB_NAME", target):
+                report = import_orders_from_csv(path)
+            print(f"{name}: {report['imported']} заказов за {report['elapsed']:.1f} с, "
+                  f"{report['rows_per_sec']:,.0f} строк/с, отклонено {report['rejected']}")
+
+        target = os.path.join(tmp, "target.db")
+        shutil.copy(empty, target)
+        rng = random.Random(1)
+        with patch("db.DB_NAME", target):
+            start = time.perf_counter()
+            for _ in range(SINGLE_ORDERS):
+                products = [Product(*p) for p in rng.sample(PRODUCTS, 2)]
+                db.save_order(Order(rng.randrange(CLIENTS) + 1, products))
+            elapsed = time.perf_counter() - start
+        print(f"db.save_order по одному: {SINGLE_ORDERS / elapsed:,.0f} заказов/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Масштабирование отчётов по нескольким магазинам (`shards.ShardCoordinator`):
+последовательный обход шардов в сравнении с пулом потоков и процессов.
+
+Запуск из корня проекта:
+python benchmarks/bench_shards.py [количество магазинов] [заказов в магазине]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import generate_database
+from shards import EXECUTOR_PROCESS, EXECUTOR_THREAD, ShardCoordinator
+
+REPORTS = {
+    "Продажи по месяцам": lambda c: c.monthly_sales(),
+    "Статистика клиентов": lambda c: c.client_stats(),
+    "Заказы по дням": lambda c: c.daily_order_counts(2024, 8),
+    "Топ товаров": lambda c: c.top_products(20),
+    "Сводка": lambda c: c.summary(),
+}
+
+
+def measure(coordinator, report, repeat=3):
+    report(coordinator)  # прогрев пула и кэша страниц
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        report(coordinator)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    stores = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 4
+    orders = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = {}
+        for i in range(stores):
+            path = os.path.join(tmp, f"store_{i}.db")
+            generate_database(path, orders=orders, clients=10_000, start=date(2024, 1, 1), days=365, seed=i)
+            shards[f"Магазин {i + 1}"] = path
+        print(f"Магазинов: {stores}, заказов в магазине: {orders}, ядер: {os.cpu_count()}")
+
+        modes = (("последовательно", 1, EXECUTOR_THREAD),
+                 ("потоки", None, EXECUTOR_THREAD),
+                 ("процессы", None, EXECUTOR_PROCESS))
+        for name, report in REPORTS.items():
+            timings = []
+            for mode, workers, executor in modes:
+                with ShardCoordinator(shards, workers, executor) as coordinator:
+                    timings.append(f"{mode} {measure(coordinator, report):.3f} с")
+            print(f"{name}: " + ", ".join(timings))
+
+
+if __name__ == "__main__":
+    main()
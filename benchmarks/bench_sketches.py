@@ -0,0 +1,76 @@
+"""
+Сравнение приближённой сводки по скетчам дней с точным расчётом по заказам.
+
+Для нескольких диапазонов дат считаются число заказов, различных клиентов и
+квантили сумм заказов: точно (COUNT DISTINCT и квантили pandas по всем
+заказам диапазона) и по скетчам `sketches.range_sketch`. Скетчи собираются
+заранее одним вызовом `sketches.refresh_stale`, как после обычной работы
+приложения, когда они обновляются при каждой вставке.
+
+Запуск из корня проекта:
+python benchmarks/bench_sketches.py [количество заказов]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import date
+from unittest.mock import patch
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import db
+import sketches
+from datagen import generate_database
+
+RANGES = (("2023-06-01", "2023-06-30"), ("2023-01-01", "2023-12-31"), ("2023-01-01", "2024-12-31"))
+
+
+def exact(conn, date_from, date_to):
+    bounds = (date_from, date_to + "~")
+    orders, clients = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT client_id) FROM orders WHERE date >= ? AND date < ?", bounds).fetchone()
+    totals = pd.read_sql_query("SELECT total FROM orders WHERE date >= ? AND date < ?", conn, params=bounds)
+    return orders, clients, totals["total"].quantile(list(sketches.QUANTILES)).tolist()
+
+
+def approximate(conn, date_from, date_to):
+    summary = sketches.range_sketch(conn, date_from, date_to).summary()
+    return summary["orders"], summary["clients"], list(summary["totals"].values())
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ecom.db")
+        generate_database(path, orders=orders, clients=20_000, start=date(2023, 1, 1), days=730)
+        with patch("db.DB_NAME", path), closing(db.connect()) as conn:
+            _, elapsed = timed(sketches.refresh_stale, conn)
+            size = conn.execute("SELECT SUM(LENGTH(clients) + LENGTH(totals) + LENGTH(items)) "
+                                "FROM order_sketches").fetchone()[0]
+            print(f"Заказов: {orders}, сборка скетчей: {elapsed:.2f} с, размер: {size / 1024:.0f} КБ")
+            for date_from, date_to in RANGES:
+                (count, clients, quantiles), exact_time = timed(exact, conn, date_from, date_to)
+                (_, estimate, approx), approx_time = timed(approximate, conn, date_from, date_to)
+                print(f"{date_from} — {date_to}: заказов {count}")
+                print(f"  клиентов: точно {clients}, оценка {estimate} "
+                      f"(ошибка {abs(estimate - clients) / clients:.2%})")
+                print("  квантили сумм: " + ", ".join(
+                    f"p{round(q * 100)} {a:.0f}/{b:.0f}" for q, a, b in zip(sketches.QUANTILES, quantiles, approx)))
+                print(f"  время: точно {exact_time * 1000:.1f} мс, по скетчам {approx_time * 1000:.1f} мс")
+            cache.close_monitors()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Сравнение хранилищ `storage`: файл SQLite, общая база SQLite в памяти и
+хранилище на словарях Python.
+
+Для каждого хранилища замеряется сохранение заказов по одному через
+`db.save_order`, постраничный просмотр `db.load_orders_page` и агрегат
+`analysis.monthly_sales`.
+
+Запуск из корня проекта:
+python benchmarks/bench_storage.py [количество заказов]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis
+import cache
+import db
+import storage
+from datagen import PRODUCTS
+from models import Order, Product
+
+CLIENTS = 1_000
+PAGES = 50
+
+
+def run(backend, count, seed=0):
+    rng = random.Random(seed)
+    timings = {}
+    with storage.using(backend):
+        db.initialize_db()
+        for i in range(CLIENTS):
+            db.add_client(f"Клиент {i}", "", "", "")
+
+        start = time.perf_counter()
+        for _ in range(count):
+            products = [Product(*p) for p in rng.sample(PRODUCTS, 2)]
+            day = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            db.save_order(Order(rng.randrange(CLIENTS) + 1, products, date=day))
+        timings["save_order, заказов/с"] = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        after = None
+        for _ in range(PAGES):
+            _, after = db.load_orders_page("total", descending=True, after=after, limit=100)
+            if after is None:
+                break
+        timings["load_orders_page, мс/стр."] = (time.perf_counter() - start) * 1000 / PAGES
+
+        start = time.perf_counter()
+        analysis.monthly_sales()
+        timings["monthly_sales, мс"] = (time.perf_counter() - start) * 1000
+    cache.close_monitors()
+    return timings
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "sqlite (файл)": storage.SQLiteBackend(os.path.join(tmp, "ecom.db")),
+            "sqlite-memory": storage.SharedMemoryBackend("bench"),
+            "python": storage.PythonBackend(),
+        }
+        print(f"Заказов: {count}")
+        for name, backend in backends.items():
+            timings = run(backend, count)
+            backend.close()
+            print(f"{name}: " + ", ".join(f"{key} {value:,.1f}" for key, value in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Сравнение записи отдельными транзакциями и единицей работы `db.transaction`.
+
+Создаются клиенты, у каждого — несколько заказов: сначала вызовами
+`db.add_client` и `db.save_order` (подключение и фиксация на каждую запись),
+затем одним блоком ``with db.transaction() as tx`` с `tx.save_orders`.
+
+Запуск из корня проекта:
+python benchmarks/bench_transaction.py [количество клиентов]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import db
+from datagen import PRODUCTS
+from models import Order, Product
+
+ORDERS_PER_CLIENT = 5
+
+
+def make_orders(rng, client_id):
+    return [Order(client_id, [Product(*p) for p in rng.sample(PRODUCTS, 2)],
+                  date=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            for _ in range(ORDERS_PER_CLIENT)]
+
+
+def separate(count, rng):
+    for i in range(count):
+        db.add_client(f"Клиент {i}", "", "", "")
+        for order in make_orders(rng, i + 1):
+            db.save_order(order)
+
+
+def unit_of_work(count, rng):
+    with db.transaction() as tx:
+        for i in range(count):
+            client_id = tx.add_client(f"Клиент {i}", "", "", "")
+            tx.save_orders(make_orders(rng, client_id))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    print(f"Клиентов: {count}, заказов: {count * ORDERS_PER_CLIENT}")
+    for name, func in (("отдельные транзакции", separate), ("db.transaction", unit_of_work)):
+        with tempfile.TemporaryDirectory() as tmp, patch("db.DB_NAME", os.path.join(tmp, "ecom.db")):
+            db.initialize_db()
+            start = time.perf_counter()
+            func(count, random.Random(0))
+            elapsed = time.perf_counter() - start
+            cache.close_monitors()
+        print(f"{name}: {elapsed:.2f} с, {count * (ORDERS_PER_CLIENT + 1) / elapsed:,.0f} записей/с")
+
+
+if __name__ == "__main__":
+    main()
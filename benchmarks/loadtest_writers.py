@@ -0,0 +1,138 @@
+"""
+Нагрузочный тест конкурентной записи в общую базу: N процессов-писателей
+сохраняют заказы через `db.save_order`, M процессов-читателей листают
+заказы через `db.load_orders_page`. Для каждой конфигурации (режим журнала,
+таймаут ожидания блокировки, число повторов записи) выводятся пропускная
+способность, время ожидания блокировок и доля ошибок.
+
+Время ожидания блокировок оценивается как превышение средней задержки
+записи над задержкой единственного писателя без конкурентов в том же
+режиме журнала.
+
+Запуск из корня проекта:
+python benchmarks/loadtest_writers.py [--writers 4] [--readers 2] [--duration 3]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from datagen import PRODUCTS, generate_database
+from models import Order, Product
+
+# (название, таймаут ожидания блокировки в секундах, число повторов записи)
+POLICIES = [
+    ("без ожидания", 0.0, 0),
+    ("только повторы", 0.0, 5),
+    ("только таймаут", 5.0, 0),
+    ("таймаут + повторы", 5.0, 5),
+]
+JOURNAL_MODES = ("delete", "wal")
+
+
+def worker(role, path, timeout, retries, stop_at, seed, clients, results):
+    db.DB_NAME = path
+    db.BUSY_TIMEOUT = timeout
+    db.WRITE_RETRIES = retries
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            if role == "writer":
+                items = rng.sample(PRODUCTS, rng.randint(1, 3))
+                db.save_order(Order(rng.randrange(clients) + 1, [Product(*p) for p in items]))
+            else:
+                db.load_orders_page(sort="date", descending=True, limit=50)
+        except sqlite3.OperationalError as e:
+            if not db.is_busy_error(e):
+                raise
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    results.put((role, latencies, errors, dict(db.write_stats)))
+
+
+def run(path, timeout, retries, writers, readers, duration, clients):
+    results = multiprocessing.Queue()
+    stop_at = time.perf_counter() + duration
+    roles = ["writer"] * writers + ["reader"] * readers
+    processes = [
+        multiprocessing.Process(target=worker, args=(role, path, timeout, retries, stop_at, i, clients, results))
+        for i, role in enumerate(roles)
+    ]
+    for p in processes:
+        p.start()
+    collected = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    summary = {role: {"ops": 0, "errors": 0, "latency": 0.0} for role in ("writer", "reader")}
+    retried = 0
+    for role, latencies, errors, stats in collected:
+        summary[role]["ops"] += len(latencies)
+        summary[role]["errors"] += errors
+        summary[role]["latency"] += sum(latencies)
+        retried += stats["retries"]
+    summary["retries"] = retried
+    return summary
+
+
+def mean_latency(stats):
+    return stats["latency"] / stats["ops"] if stats["ops"] else float("nan")
+
+
+def error_rate(stats):
+    total = stats["ops"] + stats["errors"]
+    return stats["errors"] / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--clients", type=int, default=1_000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.db")
+        print(f"Генерация базы: {args.orders} заказов...")
+        generate_database(source, orders=args.orders, clients=args.clients)
+        print(f"Писателей: {args.writers}, читателей: {args.readers}, {args.duration:g} с на конфигурацию")
+        print(f"{'Журнал':7s} {'Политика':19s} {'записей/с':>10s} {'чтений/с':>9s} "
+              f"{'ожидание, мс':>13s} {'повторов':>9s} {'ошибок записи':>14s} {'ошибок чтения':>14s}")
+
+        for mode in JOURNAL_MODES:
+            def fresh_copy(name):
+                path = os.path.join(tmp, f"{name}.db")
+                shutil.copy(source, path)
+                conn = sqlite3.connect(path)
+                conn.execute(f"PRAGMA journal_mode={mode}")
+                conn.close()
+                return path
+
+            baseline = run(fresh_copy(f"{mode}_baseline"), 5.0, 0, 1, 0, args.duration / 2, args.clients)
+            base_latency = mean_latency(baseline["writer"])
+            for policy, timeout, retries in POLICIES:
+                result = run(fresh_copy(f"{mode}_{timeout}_{retries}"), timeout, retries,
+                             args.writers, args.readers, args.duration, args.clients)
+                writes, reads = result["writer"], result["reader"]
+                wait = max(0.0, mean_latency(writes) - base_latency) * 1000
+                print(f"{mode:7s} {policy:19s} {writes['ops'] / args.duration:10.0f} "
+                      f"{reads['ops'] / args.duration:9.0f} {wait:13.1f} {result['retries']:9d} "
+                      f"{error_rate(writes):13.1%} {error_rate(reads):14.1%}")
+
+
+if __name__ == "__main__":
+    main()
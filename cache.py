@@ -0,0 +1,288 @@
+"""
+Кэш результатов функций чтения, проверяемый по версии данных базы.
+
+Результат запоминается вместе с версией данных: значением `PRAGMA data_version`
+отдельного контрольного подключения (меняется после фиксации записи любым
+другим подключением, в том числе из других процессов) и счётчиком записей
+этого процесса. Если с момента вычисления версия изменилась, результат
+вычисляется заново. Кэш вытесняет давно неиспользованные записи (LRU), когда
+их суммарный размер превышает `MAX_BYTES`.
+"""
+
+import functools
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import storage
+
+# Предельный суммарный размер кэшированных результатов, байт
+MAX_BYTES = 64 * 1024 * 1024
+
+_write_counter = 0
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def _db_name():
+    # Импорт внутри функции: модуль db сам импортирует cache
+    import db
+    return db.DB_NAME
+
+
+def bump_version():
+    """Отмечает запись в базу из текущего процесса; все кэшированные результаты устаревают."""
+    global _write_counter
+    _write_counter += 1
+
+
+def data_version(path=None):
+    """
+    Возвращает версию данных базы.
+
+    Parameters
+    ----------
+    path : str, optional
+        Путь к базе данных. По умолчанию `db.DB_NAME`.
+
+    Returns
+    -------
+    tuple
+        Пара (`PRAGMA data_version`, счётчик записей процесса). Для хранилища
+        без SQL (`storage.PythonBackend`) файла базы нет, и версия задаётся
+        только счётчиком: (None, счётчик).
+    """
+    if not storage.get_backend().sql:
+        # Данные живут только в этом процессе; подключение создало бы пустой файл базы
+        return None, _write_counter
+    path = path or _db_name()
+    with _monitors_lock:
+        conn = _monitors.get(path)
+        if conn is None:
+            conn = _monitors[path] = sqlite3.connect(path, uri=True, check_same_thread=False)
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+    return version, _write_counter
+
+
+def close_monitors(path=None):
+    """
+    Закрывает контрольные подключения (например, перед удалением файла базы).
+
+    Parameters
+    ----------
+    path : str, optional
+        Закрыть только подключение к этой базе. По умолчанию — все.
+    """
+    with _monitors_lock:
+        paths = list(_monitors) if path is None else [path]
+        for name in paths:
+            conn = _monitors.pop(name, None)
+            if conn is not None:
+                conn.close()
+
+
+def estimate_size(value):
+    """
+    Приблизительно оценивает объём памяти, занимаемый результатом.
+
+    Для длинных списков размер оценивается по выборке первых элементов.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (list, tuple)):
+        sample = value[:100]
+        if not sample:
+            return sys.getsizeof(value)
+        per_item = sum(estimate_size(item) for item in sample) / len(sample)
+        return sys.getsizeof(value) + int(per_item * len(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # Вызывающий код может изменять результат (например, удалять из списка)
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+class ResultCache:
+    """LRU-кэш результатов с ограничением суммарного размера и статистикой.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Предельный суммарный размер записей.
+    """
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Возвращает (True, значение) для актуальной записи, иначе (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def purge(self, is_current):
+        """
+        Удаляет записи, для которых `is_current(key, version)` ложно.
+
+        Returns
+        -------
+        int
+            Количество удалённых записей.
+        """
+        with self._lock:
+            stale = [key for key, (version, _, _) in self._entries.items() if not is_current(key, version)]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def stats(self):
+        """
+        Возвращает статистику кэша.
+
+        Returns
+        -------
+        dict
+            Ключи: hits, misses, evictions, invalidations, entries, size, hit_rate.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "size": self.size,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+result_cache = ResultCache()
+
+
+def cached(func=None, *, source=None):
+    """
+    Декоратор: кэширует результат функции чтения по её аргументам и версии данных.
+
+    Вызовы с нехешируемыми аргументами или с явно переданным подключением
+    к базе выполняются без кэша. Аргумент ``token`` (`tasks.CancelToken`)
+    передаётся функции, но не входит в ключ: отменённое вычисление
+    завершается исключением и в кэш не попадает.
+
+    Parameters
+    ----------
+    source : callable, optional
+        Возвращает путь к базе, которую на самом деле читает функция
+        (например, `backup.analytics_path` для снимка). Ключ и версия
+        берутся по этой базе. По умолчанию `db.DB_NAME`.
+    """
+    if func is None:
+        return functools.partial(cached, source=source)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        path = source() if source is not None else _db_name()
+        key = (func.__module__, func.__qualname__, path, args,
+               tuple(sorted(item for item in kwargs.items() if item[0] != "token")))
+        if any(isinstance(a, sqlite3.Connection) for a in (*args, *kwargs.values())):
+            return func(*args, **kwargs)
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+
+        # Версия читается до вычисления: запись во время вычисления сделает результат устаревшим
+        version = data_version(path)
+        found, value = result_cache.get(key, version)
+        if not found:
+            value = func(*args, **kwargs)
+            result_cache.put(key, version, value)
+        return _copy(value)
+
+    wrapper.uncached = func
+    return wrapper
+
+
+def purge_stale():
+    """
+    Удаляет из общего кэша результаты, вычисленные по устаревшей версии данных.
+
+    Устаревшие записи иначе освобождаются только при следующем обращении
+    с тем же ключом или при вытеснении.
+
+    Returns
+    -------
+    int
+        Количество удалённых записей.
+    """
+    versions = {}
+
+    def is_current(key, version):
+        path = key[2]
+        if path not in versions:
+            versions[path] = None
+            # Подключение к удалённому файлу создало бы пустую базу
+            if not storage.get_backend().sql or path.startswith("file:") or os.path.exists(path):
+                try:
+                    versions[path] = data_version(path)
+                except sqlite3.Error:
+                    pass
+        return versions[path] == version
+
+    return result_cache.purge(is_current)
+
+
+def cache_stats():
+    """Возвращает статистику общего кэша результатов (см. `ResultCache.stats`)."""
+    return result_cache.stats()
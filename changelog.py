@@ -0,0 +1,154 @@
+"""
+Журнал изменений (change data capture) таблиц clients, products и orders.
+
+Триггеры SQLite записывают в таблицу `change_log` каждую вставку, изменение и
+удаление строки. Потребители читают изменения начиная со своего водяного знака
+(номера последней обработанной записи журнала), поэтому синхронизация стоит
+O(изменений), а не O(таблицы).
+"""
+
+# Таблицы, изменения которых попадают в журнал
+TRACKED_TABLES = ("clients", "products", "orders")
+
+# Операции журнала
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+
+def install_change_log(cursor):
+    """
+    Создаёт таблицу журнала, таблицу водяных знаков и триггеры.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
+    cursor.execute("""CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log (table_name, seq)")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS sync_watermarks (
+        name TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL
+    )""")
+    for table in TRACKED_TABLES:
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.id, '{OP_INSERT}');
+            END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_update AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.id, '{OP_UPDATE}');
+            END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', OLD.id, '{OP_DELETE}');
+            END""")
+
+
+def current_seq(conn):
+    """Возвращает номер последней записи журнала (0, если журнал пуст)."""
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+
+def changes_since(conn, watermark=0, table=None, limit=None):
+    """
+    Возвращает изменения после водяного знака.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе данных.
+    watermark : int, optional
+        Номер последней уже обработанной записи журнала.
+    table : str, optional
+        Вернуть изменения только этой таблицы.
+    limit : int, optional
+        Максимальное количество записей.
+
+    Returns
+    -------
+    tuple of (list of dict, int)
+        Изменения с ключами seq, table, row_id, op, changed_at в порядке
+        возрастания seq, и новый водяной знак.
+    """
+    sql = "SELECT seq, table_name, row_id, op, changed_at FROM change_log WHERE seq > ?"
+    args = [watermark]
+    if table:
+        sql += " AND table_name = ?"
+        args.append(table)
+    sql += " ORDER BY seq"
+    if limit:
+        sql += " LIMIT ?"
+        args.append(limit)
+    rows = conn.execute(sql, args).fetchall()
+    changes = [
+        {"seq": r[0], "table": r[1], "row_id": r[2], "op": r[3], "changed_at": r[4]}
+        for r in rows
+    ]
+    return changes, (rows[-1][0] if rows else watermark)
+
+
+def latest_changes(conn, table, watermark=0):
+    """
+    Сворачивает изменения таблицы после водяного знака до последней операции по каждой строке.
+
+    Returns
+    -------
+    tuple of (dict, int)
+        Словарь {row_id: op} и новый водяной знак.
+    """
+    rows = conn.execute(
+        """SELECT row_id, op, seq FROM change_log
+           WHERE table_name = ? AND seq > ? ORDER BY seq""",
+        (table, watermark)
+    ).fetchall()
+    latest = {}
+    for row_id, op, _ in rows:
+        latest[row_id] = op
+    return latest, (rows[-1][2] if rows else watermark)
+
+
+def get_watermark(conn, name):
+    """Возвращает сохранённый водяной знак потребителя или None, если его ещё нет."""
+    row = conn.execute("SELECT seq FROM sync_watermarks WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(conn, name, seq):
+    """Сохраняет водяной знак потребителя (без фиксации транзакции)."""
+    conn.execute(
+        "INSERT INTO sync_watermarks (name, seq) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET seq = excluded.seq",
+        (name, seq)
+    )
+
+
+def purge_changes(conn, up_to_seq=None):
+    """
+    Удаляет из журнала записи, уже обработанные всеми потребителями.
+
+    Потребитель без водяного знака начинает с полной выгрузки и журнал до
+    своего появления не читает, поэтому без потребителей удаляются все записи.
+
+    Parameters
+    ----------
+    up_to_seq : int, optional
+        Удалить записи с номером не больше указанного. По умолчанию —
+        минимальный водяной знак среди потребителей.
+
+    Returns
+    -------
+    int
+        Количество удалённых записей.
+    """
+    if up_to_seq is None:
+        up_to_seq = conn.execute("SELECT MIN(seq) FROM sync_watermarks").fetchone()[0]
+        if up_to_seq is None:
+            up_to_seq = current_seq(conn)
+    return conn.execute("DELETE FROM change_log WHERE seq <= ?", (up_to_seq,)).rowcount
@@ -0,0 +1,246 @@
+"""
+Колоночный снимок таблицы заказов в формате NumPy для аналитики без разбора строк.
+
+Снимок — каталог с файлами фиксированной ширины:
+
+- `dates.npy` — дата заказа, int32, дни от 1970-01-01 (`MISSING_DATE` для некорректных);
+- `totals.npy` — сумма заказа, float64;
+- `clients.npy` — код клиента, int32 (индекс в словаре, `MISSING_CLIENT` для заказов без клиента);
+- `clients.json` — словарь кодов: список значений `client_id` по кодам;
+- `names.json` — имена клиентов по тем же кодам;
+- `meta.json` — количество строк и время создания.
+
+Файлы открываются через `np.load(mmap_mode='r')`: данные не копируются в память
+процесса, а агрегаты считаются векторно прямо по отображённым страницам.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from db import connect
+
+SNAPSHOT_DIR = "columnar_snapshot"
+CHUNK_SIZE = 200_000
+MISSING_DATE = np.iinfo(np.int32).min
+MISSING_CLIENT = -1
+
+
+class ColumnarSnapshot:
+    """Открытый колоночный снимок заказов.
+
+    Parameters
+    ----------
+    directory : str
+        Каталог снимка.
+
+    Attributes
+    ----------
+    dates, totals, clients : numpy.memmap
+        Колонки заказов, отображённые в память только для чтения.
+    dictionary : list
+        Значения `client_id` по кодам клиентов.
+    names : list
+        Имена клиентов по кодам (для снимков без имён — значения `dictionary`).
+    meta : dict
+        Метаданные снимка.
+    """
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self.dates = np.load(os.path.join(directory, "dates.npy"), mmap_mode="r")
+        self.totals = np.load(os.path.join(directory, "totals.npy"), mmap_mode="r")
+        self.clients = np.load(os.path.join(directory, "clients.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "clients.json"), encoding="utf-8") as f:
+            self.dictionary = json.load(f)
+        names_path = os.path.join(directory, "names.json")
+        if os.path.exists(names_path):
+            with open(names_path, encoding="utf-8") as f:
+                self.names = json.load(f)
+        else:
+            self.names = self.dictionary
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.totals)
+
+
+def write_columnar_snapshot(directory=SNAPSHOT_DIR, conn=None, chunksize=CHUNK_SIZE):
+    """
+    Записывает таблицу заказов в колоночный снимок.
+
+    Строки читаются пакетами в одной транзакции чтения (согласованный срез) и
+    пишутся сразу в отображённые в память файлы. Снимок собирается во
+    временном каталоге и затем заменяет прежний; при ошибке временный
+    каталог удаляется, прежний снимок остаётся нетронутым.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Каталог снимка.
+    conn : sqlite3.Connection, optional
+        Подключение к базе. По умолчанию открывается через `connect()`.
+    chunksize : int, optional
+        Количество строк в одном пакете.
+
+    Returns
+    -------
+    int
+        Количество записанных заказов.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        count = _write_columns(tmp_dir, conn, chunksize)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+    if os.path.exists(directory):
+        old_dir = directory + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, directory)
+    return count
+
+
+def _write_columns(tmp_dir, conn, chunksize):
+    """Записывает файлы снимка в `tmp_dir` и возвращает количество заказов."""
+    in_transaction = conn.in_transaction
+    if not in_transaction:
+        conn.execute("BEGIN")
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        dates = open_memmap(os.path.join(tmp_dir, "dates.npy"), mode="w+", dtype=np.int32, shape=(count,))
+        totals = open_memmap(os.path.join(tmp_dir, "totals.npy"), mode="w+", dtype=np.float64, shape=(count,))
+        clients = open_memmap(os.path.join(tmp_dir, "clients.npy"), mode="w+", dtype=np.int32, shape=(count,))
+
+        codes = {}
+        offset = 0
+        cursor = conn.execute("SELECT client_id, date, total FROM orders ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            chunk = pd.DataFrame(rows, columns=["client", "date", "total"])
+            end = offset + len(chunk)
+
+            # Заказы без клиента (NULL) получают отдельный код и в словарь не попадают
+            known = chunk["client"].notna()
+            for value in pd.unique(chunk["client"][known]):
+                if value not in codes:
+                    codes[value] = len(codes)
+            clients[offset:end] = chunk["client"].map(codes).fillna(MISSING_CLIENT).to_numpy(dtype=np.int32)
+
+            parsed = pd.to_datetime(chunk["date"], errors="coerce", format="ISO8601")
+            days = parsed.to_numpy().astype("datetime64[D]").astype(np.int64)
+            days[parsed.isna().to_numpy()] = MISSING_DATE
+            dates[offset:end] = days
+            totals[offset:end] = chunk["total"].to_numpy(dtype=np.float64)
+            offset = end
+        try:
+            client_names = dict(conn.execute("SELECT id, name FROM clients").fetchall())
+        except sqlite3.OperationalError:
+            client_names = {}
+    finally:
+        if not in_transaction:
+            conn.commit()
+
+    for column in (dates, totals, clients):
+        column.flush()
+    del dates, totals, clients
+
+    # Ключи из pandas приходят как numpy-скаляры, в JSON пишем обычные значения
+    keys = [key.item() if isinstance(key, np.generic) else key for key in codes]
+    with open(os.path.join(tmp_dir, "clients.json"), "w", encoding="utf-8") as f:
+        json.dump(keys, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "names.json"), "w", encoding="utf-8") as f:
+        json.dump([client_names.get(key, key) for key in keys], f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"rows": offset, "created_at": time.time()}, f)
+    return offset
+
+
+def open_columnar_snapshot(directory=SNAPSHOT_DIR):
+    """
+    Открывает колоночный снимок только для чтения.
+
+    Returns
+    -------
+    ColumnarSnapshot
+    """
+    return ColumnarSnapshot(directory)
+
+
+def client_stats_columnar(snapshot):
+    """
+    Статистика по клиентам по колоночному снимку (аналог `analysis.client_stats`).
+
+    Заказы без клиента не учитываются, как и при группировке в pandas.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Колонки: 'Клиент', 'Количество заказов', 'Общая сумма'.
+    """
+    size = len(snapshot.dictionary)
+    known = snapshot.clients != MISSING_CLIENT
+    clients = snapshot.clients[known]
+    counts = np.bincount(clients, minlength=size)
+    sums = np.bincount(clients, weights=snapshot.totals[known], minlength=size)
+    present = counts > 0
+    return pd.DataFrame({
+        "Клиент": np.asarray(snapshot.names, dtype=object)[present],
+        "Количество заказов": counts[present],
+        "Общая сумма": sums[present],
+    })
+
+
+def daily_order_counts_columnar(snapshot, year, month):
+    """
+    Количество заказов по дням месяца.
+
+    Returns
+    -------
+    pandas.Series
+        Индекс — день месяца (1..31), значения — количество заказов.
+    """
+    start = np.datetime64(f"{year:04d}-{month:02d}", "M")
+    first_day = start.astype("datetime64[D]").astype(np.int64)
+    last_day = (start + 1).astype("datetime64[D]").astype(np.int64)
+    dates = snapshot.dates
+    selected = dates[(dates >= first_day) & (dates < last_day)]
+    counts = np.bincount(selected - first_day, minlength=31)
+    return pd.Series(counts[:31], index=range(1, 32), name="order_count")
+
+
+def monthly_sales_columnar(snapshot):
+    """
+    Сумма продаж по месяцам года (аналог `analysis.sales_trend_monthly_change`).
+
+    Returns
+    -------
+    pandas.Series
+        Индекс — номер месяца (1..12), значения — сумма продаж.
+    """
+    valid = snapshot.dates != MISSING_DATE
+    months = snapshot.dates[valid].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+    sums = np.bincount(months, weights=snapshot.totals[valid], minlength=12)
+    series = pd.Series(sums, index=range(1, 13), name="total")
+    return series[np.bincount(months, minlength=12) > 0]
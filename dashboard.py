@@ -0,0 +1,219 @@
+"""
+Панель ключевых показателей на главном окне.
+
+Показатели за сегодня, текущую неделю (с понедельника) и текущий месяц —
+количество заказов, выручка и средний чек — а также лучший клиент месяца
+вычисляются одним агрегатным запросом `KPI_SQL`. Запрос читает только
+заказы с начала самого длинного периода по индексу `idx_orders_date_id`,
+поэтому его стоимость не зависит от длины всей истории заказов.
+
+Панель проверяет `PRAGMA data_version` по таймеру и выполняет запрос,
+только если данные изменились (или наступил новый день).
+"""
+
+import os
+import sqlite3
+import tkinter as tk
+from contextlib import closing
+from datetime import date, timedelta
+
+import cache
+import db
+import storage
+
+# Период проверки изменений данных, мс
+REFRESH_MS = int(os.environ.get("ECOM_DASHBOARD_REFRESH", "2000"))
+
+PERIODS = ("today", "week", "month")
+PERIOD_TITLES = {"today": "Сегодня", "week": "Неделя", "month": "Месяц"}
+
+KPI_SQL = """
+WITH recent AS (
+    SELECT client_id, date, CAST(ROUND(COALESCE(total, 0) * 100) AS INTEGER) AS kopecks
+    FROM orders WHERE date >= :since AND date < :until
+),
+top AS (
+    SELECT client_id, COUNT(*) AS order_count, SUM(kopecks) AS kopecks
+    FROM recent WHERE date >= :month
+    GROUP BY client_id ORDER BY order_count DESC, kopecks DESC, client_id LIMIT 1
+)
+SELECT
+    COUNT(CASE WHEN date >= :today THEN 1 END), COALESCE(SUM(CASE WHEN date >= :today THEN kopecks END), 0),
+    COUNT(CASE WHEN date >= :week THEN 1 END), COALESCE(SUM(CASE WHEN date >= :week THEN kopecks END), 0),
+    COUNT(CASE WHEN date >= :month THEN 1 END), COALESCE(SUM(CASE WHEN date >= :month THEN kopecks END), 0),
+    (SELECT COALESCE(c.name, top.client_id) FROM top LEFT JOIN clients c ON c.id = top.client_id),
+    (SELECT order_count FROM top),
+    (SELECT kopecks FROM top)
+FROM recent
+"""
+
+
+def period_bounds(today=None):
+    """
+    Возвращает границы периодов для `KPI_SQL`.
+
+    Parameters
+    ----------
+    today : datetime.date, optional
+        Текущая дата; по умолчанию `date.today()`.
+
+    Returns
+    -------
+    dict
+        Начала периодов "today", "week", "month" и "since" (самое раннее из
+        них) в формате "ГГГГ-ММ-ДД" и "until" — верхняя граница, включающая
+        весь текущий день.
+    """
+    today = today or date.today()
+    bounds = {
+        "today": today.isoformat(),
+        "week": (today - timedelta(days=today.weekday())).isoformat(),
+        "month": today.replace(day=1).isoformat(),
+    }
+    bounds["since"] = min(bounds.values())
+    # Даты могут содержать время: граница включает весь текущий день
+    bounds["until"] = bounds["today"] + db.DATE_END
+    return bounds
+
+
+def load_kpis(conn, today=None):
+    """
+    Вычисляет показатели панели одним запросом.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе данных.
+    today : datetime.date, optional
+        Текущая дата; по умолчанию `date.today()`.
+
+    Returns
+    -------
+    dict
+        Для каждого периода из `PERIODS` — словарь orders (заказов), revenue
+        и average (выручка и средний чек в рублях); "top_client" — кортеж
+        (имя, заказов, сумма в рублях) лучшего клиента месяца или None.
+    """
+    row = conn.execute(KPI_SQL, period_bounds(today)).fetchone()
+    kpis = {}
+    for i, period in enumerate(PERIODS):
+        orders, kopecks = row[2 * i], row[2 * i + 1]
+        kpis[period] = {
+            "orders": orders,
+            "revenue": kopecks / 100,
+            "average": round(kopecks / orders / 100, 2) if orders else 0.0,
+        }
+    name, orders, kopecks = row[6:]
+    kpis["top_client"] = (name, orders, kopecks / 100) if orders else None
+    return kpis
+
+
+class KpiSource:
+    """Загружает показатели, только если данные или дата изменились.
+
+    Parameters
+    ----------
+    clock : callable, optional
+        Функция текущей даты; по умолчанию `date.today`.
+    """
+    def __init__(self, clock=date.today):
+        self.clock = clock
+        self.version = None
+        self.day = None
+        self.kpis = None
+
+    def poll(self, force=False):
+        """
+        Проверяет `PRAGMA data_version` и текущую дату.
+
+        Returns
+        -------
+        dict or None
+            Новые показатели (см. `load_kpis`), либо None, если ничего не
+            изменилось.
+        """
+        version, day = cache.data_version(), self.clock()
+        if not force and (version, day) == (self.version, self.day):
+            return None
+        with closing(db.connect()) as conn:
+            self.kpis = load_kpis(conn, day)
+        self.version, self.day = version, day
+        return self.kpis
+
+
+def _money(value):
+    return f"{value:,.2f}".replace(",", " ") + " руб."
+
+
+class Dashboard:
+    """Панель показателей с плитками по периодам.
+
+    Parameters
+    ----------
+    parent : tk.Widget
+        Родительский виджет.
+    interval : int, optional
+        Период проверки изменений, мс.
+    """
+    def __init__(self, parent, interval=REFRESH_MS):
+        self.interval = interval
+        self.source = KpiSource()
+        self.frame = tk.Frame(parent)
+        self._after_id = None
+        self._labels = {}
+
+        for column, period in enumerate(PERIODS):
+            tile = tk.LabelFrame(self.frame, text=PERIOD_TITLES[period], padx=6, pady=4)
+            tile.grid(row=0, column=column, sticky="nsew", padx=3, pady=3)
+            for row, field in enumerate(("orders", "revenue", "average")):
+                label = tk.Label(tile, anchor="w")
+                label.grid(row=row, column=0, sticky="w")
+                self._labels[period, field] = label
+            self.frame.columnconfigure(column, weight=1)
+
+        tile = tk.LabelFrame(self.frame, text="Лучший клиент месяца", padx=6, pady=4)
+        tile.grid(row=1, column=0, columnspan=len(PERIODS), sticky="nsew", padx=3, pady=3)
+        self._top_label = tk.Label(tile, anchor="w")
+        self._top_label.pack(fill="x")
+        self.frame.bind("<Destroy>", lambda event: self.stop() if event.widget is self.frame else None)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def refresh(self, force=False):
+        """Обновляет плитки, если данные изменились; возвращает True при обновлении."""
+        try:
+            kpis = self.source.poll(force)
+        except (sqlite3.Error, storage.UnsupportedOperation) as e:
+            # Показатели считаются SQL-запросом: в хранилище без SQL их нет
+            self._top_label.config(text=f"Нет данных: {e}")
+            return False
+        if kpis is None:
+            return False
+        for period in PERIODS:
+            values = kpis[period]
+            self._labels[period, "orders"].config(text=f"Заказов: {values['orders']}")
+            self._labels[period, "revenue"].config(text=f"Выручка: {_money(values['revenue'])}")
+            self._labels[period, "average"].config(text=f"Средний чек: {_money(values['average'])}")
+        top = kpis["top_client"]
+        self._top_label.config(
+            text=f"{top[0]}: {top[1]} заказов на {_money(top[2])}" if top else "Заказов в этом месяце нет")
+        return True
+
+    def start(self):
+        """Показывает текущие показатели и запускает периодическую проверку."""
+        self.refresh(force=True)
+        self._schedule()
+
+    def _schedule(self):
+        self._after_id = self.frame.after(self.interval, self._tick)
+
+    def _tick(self):
+        self.refresh()
+        self._schedule()
+
+    def stop(self):
+        """Останавливает периодическую проверку."""
+        if self._after_id is not None:
+            self.frame.after_cancel(self._after_id)
+            self._after_id = None
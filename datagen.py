@@ -0,0 +1,108 @@
+"""
+Генерация тестовой базы данных заданного объёма.
+
+Используется бенчмарками и нагрузочными тестами. Запуск из командной строки:
+python datagen.py путь.db [количество заказов]
+"""
+
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from addresses import update_address_lookup
+from db import create_schema
+from leaderboard import rebuild_leaderboards
+from sketches import mark_stale
+
+FIRST_NAMES = ["Иван", "Мария", "Пётр", "Анна", "Дмитрий", "Наталья", "Сергей", "Ольга", "Алексей", "Елена"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Морозов", "Федоров", "Волков", "Петров", "Соколов", "Лебедев"]
+CITIES = ["Москва", "Казань", "Йошкар-Ола", "Самара", "Пермь", "Уфа", "Тверь", "Омск"]
+STREETS = ["Ленина", "Мира", "Гагарина", "Советская", "Садовая", "Лесная", "Школьная"]
+PRODUCTS = [
+    ("Чай", 150.0, "Напитки"), ("Квас", 90.0, "Напитки"), ("Кофе", 320.0, "Напитки"),
+    ("Сэндвич", 250.0, "Еда"), ("Кукуруза", 60.0, "Овощи"), ("Яблоки", 110.0, "Фрукты"),
+    ("Хлеб", 55.0, "Выпечка"), ("Сыр", 480.0, "Молочные"), ("Молоко", 85.0, "Молочные"),
+    ("Шоколад", 130.0, "Сладости"),
+]
+
+BATCH_SIZE = 50_000
+
+
+def client_name(i):
+    """Возвращает детерминированное уникальное имя клиента по номеру."""
+    return f"{LAST_NAMES[i % len(LAST_NAMES)]} {FIRST_NAMES[(i // len(LAST_NAMES)) % len(FIRST_NAMES)]} №{i}"
+
+
+def generate_database(path, orders=100_000, clients=1_000, start=date(2023, 1, 1), days=730, seed=0):
+    """
+    Создаёт базу данных со случайными клиентами, товарами и заказами.
+
+    Parameters
+    ----------
+    path : str
+        Путь к создаваемой базе данных.
+    orders : int, optional
+        Количество заказов.
+    clients : int, optional
+        Количество клиентов.
+    start : datetime.date, optional
+        Дата самого раннего заказа.
+    days : int, optional
+        Длина периода заказов в днях.
+    seed : int, optional
+        Зерно генератора случайных чисел.
+
+    Returns
+    -------
+    str
+        Путь к базе данных.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    cursor = conn.cursor()
+    create_schema(cursor)
+
+    cursor.executemany(
+        "INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)",
+        ((client_name(i), f"client{i}@example.com", f"+7912{i:07d}",
+          f"г. {rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 120)}")
+         for i in range(clients))
+    )
+    cursor.executemany("INSERT INTO products (name, price, category) VALUES (?, ?, ?)", PRODUCTS)
+
+    def order_rows():
+        for _ in range(orders):
+            items = rng.sample(PRODUCTS, rng.randint(1, 4))
+            day = start + timedelta(days=rng.randrange(days))
+            yield (
+                rng.randrange(clients) + 1,  # ID клиентов идут подряд с 1
+                ",".join(p[0] for p in items),
+                day.isoformat(),
+                round(sum(p[1] for p in items), 2),
+            )
+
+    rows = order_rows()
+    while True:
+        batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+        if not batch:
+            break
+        cursor.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (?, ?, ?, ?)", batch)
+    # Заказы вставлены напрямую, счётчики заполняются одним пересчётом
+    rebuild_leaderboards(cursor)
+    mark_stale(cursor)
+    update_address_lookup(cursor)
+    # Сгенерированные данные считаются исходным состоянием, а не изменениями
+    cursor.execute("DELETE FROM change_log")
+    conn.commit()
+    conn.close()
+    return path
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "ecom_generated.db"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    generate_database(target, orders=count)
+    print(f"Создана база {target}: {count} заказов")
@@ -1,22 +1,282 @@
+import functools
+import os
+import random
 import sqlite3
+import time
+from contextlib import closing, contextmanager
+import addresses
+import cache
+import changelog
+import leaderboard
+import sketches
+import storage
+import tasks
 from models import Client, Product, Order
 from tkinter import filedialog, messagebox
 import csv
 
 
-DB_NAME = "ecom.db"
+# Путь (или URI) базы SQLite; переменная окружения ECOM_STORAGE выбирает хранилище (см. `storage`)
+DB_NAME = storage.location_from_env("ecom.db")
+
+# Сколько секунд подключение ждёт снятия блокировки другим процессом
+BUSY_TIMEOUT = float(os.environ.get("ECOM_BUSY_TIMEOUT", "5"))
+# Сколько раз повторяется запись, не дождавшаяся блокировки
+WRITE_RETRIES = int(os.environ.get("ECOM_WRITE_RETRIES", "5"))
+# Начальная и максимальная пауза между повторами, сек.
+RETRY_BACKOFF = 0.05
+RETRY_BACKOFF_MAX = 2.0
+# Размер пакета заказов при выгрузке в CSV
+EXPORT_BATCH = 5000
+# Добавляется к конечной дате диапазона: даты заказов могут содержать время,
+# и условие date < date_to + DATE_END включает весь последний день
+DATE_END = "\U0010ffff"
+
+# Статистика повторов записи в текущем процессе
+write_stats = {"retries": 0, "backoff": 0.0, "failures": 0}
 
 def connect():
-    return sqlite3.connect(DB_NAME)
     """
     Устанавливает соединение с базой данных.
 
+    Подключение выдаёт текущее хранилище (`storage.get_backend`).
+
     Returns
     -------
     sqlite3.Connection
-        Объект подключения к базе данных `ecom.db`.
+        Объект подключения к базе данных `DB_NAME`, ожидающее занятую
+        другим процессом блокировку до `BUSY_TIMEOUT` секунд.
+    """
+    return storage.get_backend().connect()
+
+def is_busy_error(error):
+    """Проверяет, что ошибка SQLite вызвана блокировкой базы (SQLITE_BUSY/SQLITE_LOCKED)."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+def retry_on_busy(func):
+    """
+    Декоратор: повторяет операцию записи, если база занята другим процессом.
+
+    После каждой неудачной попытки выдерживается случайная пауза до текущего
+    интервала (экспоненциальный рост от `RETRY_BACKOFF` до `RETRY_BACKOFF_MAX`),
+    всего выполняется до `WRITE_RETRIES` повторов. Операция должна сама
+    открывать подключение и фиксировать транзакцию: при ошибке её подключение
+    закрывается, и незафиксированные изменения откатываются.
     """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = RETRY_BACKOFF
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                if attempt >= WRITE_RETRIES:
+                    write_stats["failures"] += 1
+                    raise
+            attempt += 1
+            pause = random.uniform(0, delay)
+            write_stats["retries"] += 1
+            write_stats["backoff"] += pause
+            time.sleep(pause)
+            delay = min(delay * 2, RETRY_BACKOFF_MAX)
+    return wrapper
+
+class Transaction:
+    """
+    Единица работы: записи в рамках одной транзакции одного подключения.
+
+    Методы повторяют одноимённые функции модуля, но не открывают своих
+    подключений и не фиксируют изменения. Все команды выполняются через
+    один курсор, поэтому подготовленные выражения берутся из кэша
+    подключения, а не компилируются заново для каждой записи.
+    Создаётся функцией `transaction`.
 
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение с открытой транзакцией.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+    def execute(self, sql, params=()):
+        """Выполняет произвольную команду в транзакции и возвращает курсор."""
+        return self.cursor.execute(sql, params)
+
+    # ---------- Клиенты ----------
+    def add_client(self, name, email, phone, address):
+        """Добавляет клиента; возвращает его ID (см. `add_client`)."""
+        self.cursor.execute("INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)",
+                            (name, email, phone, address))
+        client_id = self.cursor.lastrowid
+        # Адрес разбирается при записи: отчёты по регионам только читают `address_lookup`
+        addresses.store_addresses(self.cursor, [address])
+        return client_id
+
+    def save_client(self, client):
+        """Сохраняет клиента; возвращает его ID (см. `save_client`)."""
+        return self.add_client(client.name, client.email, client.phone, client.address)
+
+    def delete_client_by_name(self, name, with_orders=False):
+        """
+        Удаляет клиентов с указанным именем.
+
+        Parameters
+        ----------
+        name : str
+            Имя клиента.
+        with_orders : bool, optional
+            Удалить также заказы этих клиентов (со счётчиками ТОП-N).
+
+        Returns
+        -------
+        int
+            Количество удалённых клиентов.
+        """
+        return self._delete_clients("name = ?", (name,), with_orders)
+
+    def delete_client_by_id(self, client_id, with_orders=False):
+        """
+        Удаляет клиента по ID; однофамильцы не затрагиваются.
+
+        Parameters
+        ----------
+        client_id : int
+            ID клиента.
+        with_orders : bool, optional
+            Удалить также заказы клиента (со счётчиками ТОП-N).
+
+        Returns
+        -------
+        bool
+            True, если клиент был найден.
+        """
+        return self._delete_clients("id = ?", (client_id,), with_orders) > 0
+
+    def _delete_clients(self, where, args, with_orders):
+        if with_orders:
+            leaderboard.forget_orders(
+                self.cursor, f"client_id IN (SELECT id FROM clients WHERE {where})", args)
+        self.cursor.execute(f"DELETE FROM clients WHERE {where}", args)
+        return self.cursor.rowcount
+
+    # ---------- Заказы ----------
+    def save_order(self, order):
+        """Сохраняет заказ; возвращает его ID (см. `save_order`)."""
+        return insert_order(self.cursor, order)
+
+    def save_orders(self, orders):
+        """
+        Сохраняет пакет заказов.
+
+        Строки добавляются по одной (нужны их ID), а счётчики ТОП-N
+        и скетчи дней обновляются один раз на клиента, товар и день для
+        всего пакета.
+
+        Parameters
+        ----------
+        orders : iterable of Order
+            Заказы; клиент задаётся ID или именем (см. `insert_order`).
+
+        Returns
+        -------
+        list of int
+            ID добавленных заказов в порядке `orders`.
+        """
+        order_ids, rows = [], []
+        for order in orders:
+            row = order_row(self.cursor, order)
+            self.cursor.execute(INSERT_ORDER_SQL, row)
+            order_ids.append(self.cursor.lastrowid)
+            rows.append(row)
+        leaderboard.record_orders(self.cursor, rows)
+        sketches.record_orders(self.cursor, rows)
+        return order_ids
+
+    def delete_order_by_id(self, order_id):
+        """Удаляет заказ; возвращает True, если он был найден."""
+        return leaderboard.forget_orders(self.cursor, "id = ?", (order_id,)) > 0
+
+    def delete_order_by_index(self, index):
+        """Удаляет заказ по позиции в порядке ID; возвращает True, если он был найден."""
+        row = self.cursor.execute("SELECT id FROM orders ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+        return bool(row) and self.delete_order_by_id(row[0])
+
+    # ---------- Товары ----------
+    def save_product(self, product):
+        """Сохраняет товар; возвращает его ID."""
+        self.cursor.execute("INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
+                            (product.name, product.price, product.category))
+        return self.cursor.lastrowid
+
+    def delete_product_by_id(self, product_id):
+        """Удаляет товар; возвращает True, если он был найден."""
+        self.cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        return self.cursor.rowcount > 0
+
+@contextmanager
+def transaction_on(conn):
+    """
+    Открывает единицу работы на уже открытом подключении (см. `transaction`).
+
+    Нужна для подключений с собственными настройками или присоединёнными
+    базами (`writer`, `archive`, `async_db`); подключение после блока не
+    закрывается. Подключение с ``isolation_level = None`` (ATTACH вне
+    транзакции) тоже подходит.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение без открытой транзакции.
+
+    Yields
+    ------
+    Transaction
+        Репозиторий записей текущей транзакции.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield Transaction(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    cache.bump_version()
+
+@storage.dispatch
+@contextmanager
+def transaction():
+    """
+    Открывает единицу работы: все записи внутри блока выполняются в одной
+    транзакции и фиксируются вместе при выходе из блока.
+
+    Транзакция начинается командой ``BEGIN IMMEDIATE``: блокировка записи
+    берётся сразу, и занятая база обнаруживается до первой записи. Чтобы
+    повторять операцию при занятой базе, блок помещают в функцию с
+    декоратором `retry_on_busy`, как в функциях записи этого модуля.
+    При исключении внутри блока все изменения откатываются. Для хранилища
+    без SQL используется его единица работы (`storage.PythonBackend.transaction`).
+
+    Yields
+    ------
+    Transaction
+        Репозиторий записей текущей транзакции.
+    """
+    with closing(connect()) as conn, transaction_on(conn) as tx:
+        yield tx
+
+@storage.dispatch
+@retry_on_busy
 def save_client(client):
     """
     Сохраняет клиента в базу данных.
@@ -26,20 +286,18 @@ def save_client(client):
     client : Client
         Объект клиента, содержащий имя, email, телефон и адрес.
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("""CREATE TABLE IF NOT EXISTS clients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        email TEXT,
-        phone TEXT,
-        address TEXT
-    )""")
-    cursor.execute("INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)",
-                   (client.name, client.email, client.phone, client.address))
-    conn.commit()
-    conn.close()
-
+    with transaction() as tx:
+        tx.execute("""CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            address TEXT
+        )""")
+        tx.save_client(client)
+
+@storage.dispatch
+@cache.cached
 def load_clients():
     """
     Загружает всех клиентов из базы данных.
@@ -51,11 +309,13 @@ def load_clients():
     """
     conn = connect()
     cursor = conn.cursor()
-    cursor.execute("SELECT name, email, phone, address FROM clients")
+    cursor.execute("SELECT name, email, phone, address, id FROM clients")
     rows = cursor.fetchall()
     conn.close()
-    return [Client(name, email, phone, address) for name, email, phone, address in rows]
+    return [Client(*row) for row in rows]
 
+@storage.dispatch
+@retry_on_busy
 def save_order(order):
     """
     Сохраняет заказ в базу данных.
@@ -65,63 +325,434 @@ def save_order(order):
     order : Order
         Объект заказа, содержащий ID клиента, список товаров, дату и общую сумму.
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("""CREATE TABLE IF NOT EXISTS orders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_id TEXT,
+    with transaction() as tx:
+        create_orders_table(tx.cursor)
+        tx.save_order(order)
+
+def _orders_table_sql(table="orders", autoincrement=True):
+    return f"""CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY{" AUTOINCREMENT" if autoincrement else ""},
+        client_id INTEGER REFERENCES clients (id),
         products TEXT,
         date TEXT,
         total REAL
-    )""")
-    product_list = ",".join([p.name for p in order.products])
-    cursor.execute("INSERT INTO orders (client_id, products, date, total) VALUES (?, ?, ?, ?)",
-                   (order.client_id, product_list, str(order.date), order.total))
-    conn.commit()
-    conn.close()
+    )"""
+
+def create_orders_table(cursor):
+    """
+    Создаёт таблицу заказов, если она ещё не существует.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
+    cursor.execute(_orders_table_sql())
+
+def resolve_client_id(cursor, name):
+    """
+    Возвращает ID клиента по имени, создавая клиента, если его ещё нет.
+
+    Для однофамильцев выбирается клиент с наименьшим ID.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    name : str
+        Имя клиента.
 
-def load_orders():
+    Returns
+    -------
+    int
+        ID клиента.
+    """
+    row = cursor.execute("SELECT MIN(id) FROM clients WHERE name = ?", (name,)).fetchone()
+    if row[0] is not None:
+        return row[0]
+    cursor.execute("INSERT INTO clients (name) VALUES (?)", (name,))
+    return cursor.lastrowid
+
+def migrate_client_keys(cursor, schema="main"):
     """
-    Загружает все заказы из базы данных.
+    Переводит `orders.client_id` с имени клиента (TEXT) на ссылку на `clients.id`.
+
+    Имена из заказов сопоставляются клиентам (при совпадении имён — клиенту
+    с наименьшим ID); клиенты, которых нет в справочнике, создаются. Таблица
+    заказов пересоздаётся с колонкой INTEGER в рамках текущей транзакции;
+    индексы и триггеры таблицы после миграции нужно создать заново.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    schema : str, optional
+        Схема с таблицей заказов: "main" или имя подключённого архива.
+        Справочник клиентов всегда берётся из "main".
+
+    Returns
+    -------
+    int
+        Количество перенесённых заказов; 0, если миграция не требовалась.
+    """
+    columns = {row[1]: row[2] for row in cursor.execute(f"PRAGMA {schema}.table_info(orders)")}
+    if not columns or columns.get("client_id", "").upper() == "INTEGER":
+        return 0
+
+    cursor.execute("""INSERT INTO main.clients (name)
+        SELECT DISTINCT o.client_id FROM {schema}.orders o
+        WHERE typeof(o.client_id) = 'text'
+          AND NOT EXISTS (SELECT 1 FROM main.clients c WHERE c.name = o.client_id)""".format(schema=schema))
+    cursor.execute("DROP TABLE IF EXISTS temp.client_keys")
+    cursor.execute("CREATE TEMP TABLE client_keys (name TEXT PRIMARY KEY, id INTEGER)")
+    cursor.execute("""INSERT INTO temp.client_keys
+        SELECT name, MIN(id) FROM main.clients WHERE name IS NOT NULL GROUP BY name""")
+
+    autoincrement = schema == "main"
+    cursor.execute(_orders_table_sql(f"{schema}.orders_migrated", autoincrement))
+    cursor.execute(f"""INSERT INTO {schema}.orders_migrated (id, client_id, products, date, total)
+        SELECT o.id, CASE WHEN typeof(o.client_id) = 'integer' THEN o.client_id ELSE k.id END,
+               o.products, o.date, o.total
+        FROM {schema}.orders o LEFT JOIN temp.client_keys k ON k.name = o.client_id""")
+    migrated = cursor.rowcount
+    sequence = None
+    if autoincrement:
+        row = cursor.execute(f"SELECT seq FROM {schema}.sqlite_sequence WHERE name = 'orders'").fetchone()
+        sequence = row[0] if row else None
+    cursor.execute(f"DROP TABLE {schema}.orders")
+    cursor.execute(f"ALTER TABLE {schema}.orders_migrated RENAME TO orders")
+    if sequence is not None:
+        # Номера удалённых заказов не должны выдаваться повторно
+        cursor.execute(f"UPDATE {schema}.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'orders'", (sequence,))
+    cursor.execute("DROP TABLE temp.client_keys")
+    return migrated
+
+def insert_order(cursor, order):
+    """
+    Добавляет строку заказа в рамках текущей транзакции, не фиксируя её.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    order : Order
+        Сохраняемый заказ.
+
+    Returns
+    -------
+    int
+        ID добавленного заказа.
+    """
+    row = order_row(cursor, order)
+    cursor.execute(INSERT_ORDER_SQL, row)
+    order_id = cursor.lastrowid
+    leaderboard.record_order(cursor, *row)
+    sketches.record_orders(cursor, [row])
+    return order_id
+
+INSERT_ORDER_SQL = "INSERT INTO orders (client_id, products, date, total) VALUES (?, ?, ?, ?)"
+
+def order_row(cursor, order):
+    """
+    Возвращает строку (client_id, products, date, total) таблицы заказов.
+
+    Клиент, заданный именем (старый формат вызова), находится или создаётся
+    в рамках текущей транзакции (см. `resolve_client_id`).
+    """
+    client_id = order.client_id
+    if isinstance(client_id, str):
+        client_id = resolve_client_id(cursor, client_id)
+    return client_id, ",".join([p.name for p in order.products]), str(order.date), order.total
+
+# Выборка заказов с именем клиента; {schema} — схема таблицы заказов
+ORDER_SELECT = """SELECT o.id, c.name, o.client_id, o.products, o.date, o.total
+    FROM {schema}.orders o LEFT JOIN main.clients c ON c.id = o.client_id"""
+
+def order_from_row(row):
+    """Преобразует строку выборки `ORDER_SELECT` в словарь заказа."""
+    return {"id": row[0], "client": row[1], "client_id": row[2], "products": row[3], "date": row[4], "total": row[5]}
+
+@storage.dispatch
+@cache.cached
+def load_orders(date_from=None, date_to=None):
+    """
+    Загружает заказы из базы данных.
+
+    Без диапазона дат возвращаются все заказы рабочей таблицы. Если диапазон
+    задан, в выборку прозрачно включаются архивные разделы, пересекающиеся с ним.
+
+    Parameters
+    ----------
+    date_from : str, optional
+        Начальная дата "ГГГГ-ММ-ДД" включительно.
+    date_to : str, optional
+        Конечная дата "ГГГГ-ММ-ДД" включительно.
 
     Returns
     -------
     list of dict
-        Список заказов в виде словарей с ключами: client, products, date, total.
+        Список заказов в виде словарей с ключами: id, client (имя клиента),
+        client_id, products, date, total.
     """
     conn = connect()
     cursor = conn.cursor()
-    cursor.execute("SELECT client_id, products, date, total FROM orders")
-    rows = cursor.fetchall()
+    if date_from is None and date_to is None:
+        cursor.execute(ORDER_SELECT.format(schema="main") + " ORDER BY o.id")
+        rows = cursor.fetchall()
+    else:
+        from archive import iter_order_schemas, date_filter
+        where, args = date_filter(date_from, date_to)
+        rows = []
+        for schema in iter_order_schemas(conn, date_from, date_to):
+            rows.extend(conn.execute(ORDER_SELECT.format(schema=schema) + where, args))
     conn.close()
-    return [{"client": r[0], "products": r[1], "date": r[2], "total": r[3]} for r in rows]
+    return [order_from_row(r) for r in rows]
 
+@storage.dispatch
+@retry_on_busy
 def delete_order_by_index(index):
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM orders LIMIT 1 OFFSET ?", (index,))
-    row = cursor.fetchone()
-    if row:
-        cursor.execute("DELETE FROM orders WHERE id = ?", (row[0],))
-    conn.commit()
-    conn.close()
+    with transaction() as tx:
+        tx.delete_order_by_index(index)
 
-def export_orders_to_csv(filename="orders_export.csv"):
+@storage.dispatch
+@retry_on_busy
+def delete_order_by_id(order_id):
     """
-    Экспортирует все заказы в CSV-файл.
+    Удаляет заказ по его ID.
+
+    Parameters
+    ----------
+    order_id : int
+        ID заказа.
+
+    Returns
+    -------
+    bool
+        True, если заказ был найден и удалён.
+    """
+    with transaction() as tx:
+        return tx.delete_order_by_id(order_id)
+
+# Колонки, по которым можно сортировать заказы (у каждой есть индекс вида (колонка, id))
+ORDER_SORT_COLUMNS = ("date", "total")
+
+def create_order_indexes(cursor):
+    """
+    Создаёт индексы для постраничного просмотра заказов.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_date_id ON orders (date, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_total_id ON orders (total, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_client ON orders (client_id, date, id)")
+
+@storage.dispatch
+def load_orders_page(sort="date", descending=False, after=None, limit=100, client=None,
+                     date_from=None, date_to=None, min_total=None, max_total=None, client_id=None,
+                     conn=None):
+    """
+    Загружает одну страницу заказов с сортировкой и фильтрами.
+
+    Используется постраничная навигация по ключу (keyset pagination):
+    следующая страница начинается после пары (значение сортировки, id)
+    последней строки предыдущей, поэтому стоимость запроса не зависит от
+    номера страницы, а сортировка выполняется по индексу.
+
+    Parameters
+    ----------
+    sort : str, optional
+        Колонка сортировки: "date" или "total".
+    descending : bool, optional
+        Сортировать по убыванию.
+    after : tuple, optional
+        Ключ, возвращённый для предыдущей страницы. None — первая страница.
+    limit : int, optional
+        Количество заказов на странице.
+    client : str, optional
+        Начало имени клиента.
+    date_from, date_to : str, optional
+        Диапазон дат "ГГГГ-ММ-ДД" включительно.
+    min_total, max_total : float, optional
+        Диапазон суммы заказа.
+    client_id : int, optional
+        ID клиента.
+    conn : sqlite3.Connection, optional
+        Подключение к базе. Если не задано, открывается через `connect()`.
+
+    Returns
+    -------
+    tuple of (list of dict, tuple or None)
+        Заказы (см. `load_orders`) и ключ для загрузки следующей страницы
+        (None, если страница последняя).
+    """
+    if sort not in ORDER_SORT_COLUMNS:
+        raise ValueError(f"Неизвестная колонка сортировки: {sort}")
+    conditions, args = [], []
+    if client:
+        # Диапазон вместо LIKE: поиск по началу имени использует индекс
+        conditions.append("c.name >= ? AND c.name < ?")
+        args += [client, client + "\U0010ffff"]
+    if client_id is not None:
+        conditions.append("o.client_id = ?")
+        args.append(client_id)
+    if date_from:
+        conditions.append("o.date >= ?")
+        args.append(date_from)
+    if date_to:
+        conditions.append("o.date < ?")
+        args.append(date_to + DATE_END)
+    if min_total is not None:
+        conditions.append("o.total >= ?")
+        args.append(min_total)
+    if max_total is not None:
+        conditions.append("o.total <= ?")
+        args.append(max_total)
+    direction = "DESC" if descending else "ASC"
+    if after is not None:
+        conditions.append(f"(o.{sort}, o.id) {'<' if descending else '>'} (?, ?)")
+        args += list(after)
+
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    try:
+        rows = conn.execute(
+            ORDER_SELECT.format(schema="main") + f"{where} ORDER BY o.{sort} {direction}, o.id {direction} LIMIT ?",
+            args + [limit + 1]
+        ).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    orders = [order_from_row(r) for r in rows[:limit]]
+    next_key = None
+    if len(rows) > limit:
+        last = orders[-1]
+        next_key = (last[sort], last["id"])
+    return orders, next_key
+
+def export_orders_to_csv(filename="orders_export.csv", incremental=False, token=None):
+    """
+    Экспортирует заказы в CSV-файл.
 
     Parameters
     ----------
     filename : str, optional
         Имя файла для экспорта. По умолчанию "orders_export.csv".
+    incremental : bool, optional
+        Дописывать в файл только заказы, добавленные, изменённые или удалённые
+        с прошлого инкрементального экспорта в этот же файл (по журналу
+        изменений). Файл содержит колонки id, op, client, products, date, total;
+        первый запуск выгружает все текущие заказы.
+    token : tasks.CancelToken, optional
+        Токен отмены и прогресса полной выгрузки. Заказы читаются и
+        записываются пакетами по `EXPORT_BATCH`; при отмене недописанный
+        файл удаляется и возбуждается `tasks.Cancelled`.
+
+    Returns
+    -------
+    int
+        Количество записанных строк.
+    """
+    if incremental:
+        return export_order_changes_to_csv(filename)
+    count = 0
+    try:
+        with open(filename, "w", newline="", encoding="utf-8") as f, \
+                closing(_iter_order_batches(token)) as batches:
+            writer = csv.DictWriter(f, fieldnames=["client", "products", "date", "total"], extrasaction="ignore")
+            writer.writeheader()
+            for batch, total in batches:
+                writer.writerows(batch)
+                count += len(batch)
+                if token is not None:
+                    token.report(count, total, "Выгрузка заказов")
+    except tasks.Cancelled:
+        os.remove(filename)
+        raise
+    return count
+
+def _iter_order_batches(token=None):
+    """Возвращает пакеты заказов (см. `load_orders`) и общее их количество."""
+    if token is None or not storage.get_backend().sql:
+        orders = load_orders()
+        for start in range(0, len(orders), EXPORT_BATCH):
+            yield orders[start:start + EXPORT_BATCH], len(orders)
+        return
+    with closing(connect()) as conn, tasks.interruptible(conn, token):
+        total = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        cursor = conn.execute(ORDER_SELECT.format(schema="main") + " ORDER BY o.id")
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            yield [order_from_row(r) for r in rows], total
+
+def export_order_changes_to_csv(filename):
+    """
+    Дописывает в CSV-файл изменения заказов с момента прошлой выгрузки в этот файл.
+
+    Водяной знак выгрузки хранится в базе под именем файла и обновляется только
+    после записи файла, поэтому при сбое изменения будут выгружены повторно,
+    но не потеряны.
+
+    Parameters
+    ----------
+    filename : str
+        Имя файла выгрузки.
+
+    Returns
+    -------
+    int
+        Количество записанных строк.
     """
-    import csv
-    orders = load_orders()
-    with open(filename, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["client", "products", "date", "total"])
-        writer.writeheader()
-        writer.writerows(orders)
+    conn = connect()
+    cursor = conn.cursor()
+    changelog.install_change_log(cursor)
+    name = "export:" + os.path.abspath(filename)
+    watermark = changelog.get_watermark(conn, name)
+    if watermark is None or not os.path.exists(filename):
+        # Первая выгрузка: все текущие заказы
+        new_watermark = changelog.current_seq(conn)
+        rows = [(r[0], changelog.OP_INSERT, r[1]) + tuple(r[3:]) for r in cursor.execute(
+            ORDER_SELECT.format(schema="main") + " ORDER BY o.id")]
+        mode = "w"
+    else:
+        latest, new_watermark = changelog.latest_changes(conn, "orders", watermark)
+        rows = []
+        for row_id, op in sorted(latest.items()):
+            if op == changelog.OP_DELETE:
+                rows.append((row_id, op, "", "", "", ""))
+                continue
+            row = cursor.execute(ORDER_SELECT.format(schema="main") + " WHERE o.id = ?", (row_id,)).fetchone()
+            if row:
+                rows.append((row[0], op, row[1]) + tuple(row[3:]))
+        mode = "a"
+
+    with open(filename, mode, newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if mode == "w":
+            writer.writerow(["id", "op", "client", "products", "date", "total"])
+        writer.writerows(rows)
 
+    conn.close()
+    _save_export_watermark(name, new_watermark)
+    return len(rows)
+
+@retry_on_busy
+def _save_export_watermark(name, seq):
+    # Файл уже записан: повторяется только фиксация водяного знака
+    with transaction() as tx:
+        changelog.set_watermark(tx.conn, name, seq)
+        # Записи, прочитанные всеми потребителями, больше не нужны: журнал не растёт без предела
+        changelog.purge_changes(tx.conn)
+
+@storage.dispatch
+@cache.cached
 def load_products():
     """
     Загружает все товары из базы данных.
@@ -139,20 +770,41 @@ def load_products():
         price REAL,
         category TEXT
     )""")
-    cursor.execute("SELECT name, price, category FROM products")
+    cursor.execute("SELECT name, price, category, id FROM products")
     rows = cursor.fetchall()
     conn.close()
-    return [Product(name, price, category) for name, price, category in rows]
+    return [Product(*row) for row in rows]
 
+@storage.dispatch
+@retry_on_busy
 def initialize_db():
     """
     Инициализирует структуру базы данных.
 
-    Создаёт таблицы: clients, products, orders — если они ещё не существуют.
+    Создаёт таблицы: clients, products, orders — если они ещё не существуют,
+    и переводит заказы старого формата (имя клиента в `client_id`) на ID
+    клиентов, включая архивные разделы.
     """
-    conn = connect()
-    cursor = conn.cursor()
+    with transaction() as tx:
+        create_schema(tx.cursor)
+        # Адреса клиентов, записанных в обход `add_client`, и адреса после смены правил разбора
+        addresses.update_address_lookup(tx.cursor)
+        # Без выгрузок журнал иначе очищался бы только при следующей из них
+        changelog.purge_changes(tx.conn)
+    # Импорт внутри функции: модуль archive сам импортирует db
+    from archive import migrate_archive_client_keys
+    migrate_archive_client_keys()
+
+
+def create_schema(cursor):
+    """
+    Создаёт все таблицы базы данных через переданный курсор.
 
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
     # Таблица клиентов
     cursor.execute("""CREATE TABLE IF NOT EXISTS clients (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -161,6 +813,7 @@ def initialize_db():
         phone TEXT,
         address TEXT
     )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clients_name ON clients (name)")
 
     # Таблица продуктов
     cursor.execute("""CREATE TABLE IF NOT EXISTS products (
@@ -170,20 +823,27 @@ def initialize_db():
         category TEXT
     )""")
 
-    # Таблица заказов
-    cursor.execute("""CREATE TABLE IF NOT EXISTS orders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_id TEXT,
-        products TEXT,
-        date TEXT,
-        total REAL
-    )""")
+    # Таблица заказов (с переводом старого формата на ID клиентов) и индексы
+    create_orders_table(cursor)
+    migrate_client_keys(cursor)
+    create_order_indexes(cursor)
 
-    conn.commit()
-    conn.close()
+    # Счётчики по клиентам и товарам для ТОП-N
+    leaderboard.create_leaderboards(cursor)
+
+    # Журнал изменений и триггеры
+    changelog.install_change_log(cursor)
 
+    # Скетчи заказов по дням для приближённой аналитики
+    sketches.create_sketch_tables(cursor)
 
-def delete_client_by_name(name):
+    # Разобранные адреса клиентов для отчётов по регионам
+    addresses.create_address_tables(cursor)
+
+
+@storage.dispatch
+@retry_on_busy
+def delete_client_by_name(name, with_orders=False):
     """
     Удаляет клиента по имени.
 
@@ -191,20 +851,65 @@ def delete_client_by_name(name):
     ----------
     name : str
         Имя клиента, которого нужно удалить.
+    with_orders : bool, optional
+        Удалить в той же транзакции и заказы клиента.
     """
-    conn = connect()
-    cursor = conn.cursor()
-    print("Удаляем имя:", repr(name))
-    cursor.execute("DELETE FROM clients WHERE name = ?", (name,))
-    conn.commit()
-    conn.close()
+    with transaction() as tx:
+        tx.delete_client_by_name(name, with_orders)
 
-#Блок для импорта клиентов из CSV
-#Подключение к существующей базе данных
-conn = sqlite3.connect("ecom.db")
-cursor = conn.cursor()
+@storage.dispatch
+@retry_on_busy
+def delete_client_by_id(client_id, with_orders=False):
+    """
+    Удаляет клиента по ID.
+
+    Parameters
+    ----------
+    client_id : int
+        ID клиента.
+    with_orders : bool, optional
+        Удалить в той же транзакции и заказы клиента.
+
+    Returns
+    -------
+    bool
+        True, если клиент был найден.
+    """
+    with transaction() as tx:
+        return tx.delete_client_by_id(client_id, with_orders)
+
+@storage.dispatch
+@retry_on_busy
+def save_product(product):
+    """
+    Сохраняет товар в базу данных.
 
+    Parameters
+    ----------
+    product : Product
+        Товар с названием, ценой и категорией.
+    """
+    with transaction() as tx:
+        tx.save_product(product)
+
+@storage.dispatch
+@retry_on_busy
+def delete_product_by_id(product_id):
+    """
+    Удаляет товар по его ID.
+
+    Parameters
+    ----------
+    product_id : int
+        ID товара.
+    """
+    with transaction() as tx:
+        tx.delete_product_by_id(product_id)
+
+#Блок для импорта клиентов из CSV
 
+@storage.dispatch
+@retry_on_busy
 def add_client(name, email, phone, address):
     """
       Добавляет клиента в базу данных.
@@ -220,11 +925,39 @@ def add_client(name, email, phone, address):
       address : str
           Адрес доставки.
       """
-    cursor.execute("""
-        INSERT INTO clients (name, email, phone, address)
-        VALUES (?, ?, ?, ?)
-    """, (name, email, phone, address))
-    conn.commit()
+    with transaction() as tx:
+        tx.add_client(name, email, phone, address)
+
+@retry_on_busy
+def import_clients(filepath):
+    """
+    Добавляет клиентов из CSV-файла одной транзакцией.
+
+    Parameters
+    ----------
+    filepath : str
+        Путь к CSV-файлу с колонками "Имя", "Email", "Телефон", "Адрес".
+
+    Returns
+    -------
+    int
+        Количество импортированных клиентов.
+    """
+    # Все клиенты файла добавляются одной транзакцией: при ошибке не остаётся частичного импорта
+    with open(filepath, newline='', encoding='utf-8-sig') as csvfile, transaction() as tx:
+        reader = csv.DictReader(csvfile)
+        imported = 0
+        for row in reader:
+            name = row.get("Имя", "").strip()
+            email = row.get("Email", "").strip()
+            phone = row.get("Телефон", "").strip()
+            address = row.get("Адрес", "").strip()
+
+            if name:  # Не добавляем пустые строки
+                tx.add_client(name, email, phone, address)
+                print(f"Импортирован клиент: {name}, {email}, {phone}, {address}")
+                imported += 1
+    return imported
 
 #Импорт из CSV и сохранение в базу
 def import_clients_from_csv():
@@ -234,7 +967,7 @@ def import_clients_from_csv():
     Notes
     -----
     - Открывает диалог выбора файла.
-    - Загружает клиентов из CSV и сохраняет их в базу данных.
+    - Загружает клиентов из CSV и сохраняет их в базу данных (`import_clients`).
     - Показывает сообщение об успешном импорте или ошибке.
     """
     filepath = filedialog.askopenfilename(
@@ -245,21 +978,9 @@ def import_clients_from_csv():
         return
 
     try:
-        with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            imported = 0
-            for row in reader:
-                name = row.get("Имя", "").strip()
-                email = row.get("Email", "").strip()
-                phone = row.get("Телефон", "").strip()
-                address = row.get("Адрес", "").strip()
-
-                if name:  # Не добавляем пустые строки
-                    add_client(name, email, phone, address)
-                    print(f"Импортирован клиент: {name}, {email}, {phone}, {address}")
-                    imported += 1
-
-            messagebox.showinfo("Импорт завершён", f"Импортировано клиентов: {imported}")
-
+        imported = import_clients(filepath)
     except Exception as e:
-        messagebox.showerror("Ошибка импорта", f"Не удалось загрузить файл:\n{e}")
\ No newline at end of file
+        messagebox.showerror("Ошибка импорта", f"Не удалось загрузить файл:\n{e}")
+        return
+    # Сообщение показывается после фиксации: пока окно открыто, база не заблокирована
+    messagebox.showinfo("Импорт завершён", f"Импортировано клиентов: {imported}")
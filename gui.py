@@ -1,20 +1,31 @@
+import sqlite3
 import tkinter as tk
 from tkinter import filedialog
 from tkinter import messagebox, ttk
-from models import Client, Order
+from models import Client, Order, Product
 from utils import validate_email, validate_phone, validate_address
 from db import (
-    save_client, save_order,
+    save_client, save_order, save_product, delete_product_by_id, is_busy_error,
     load_clients, load_products,
-    delete_order_by_index, export_orders_to_csv,
-    connect, delete_client_by_name, load_orders,
+    delete_order_by_id, export_orders_to_csv,
+    delete_client_by_id, load_orders,
+    load_orders_page, ORDER_SORT_COLUMNS,
     import_clients_from_csv
 )
 from analysis import (
     sales_trend_monthly_change,
     top_clients_from_db, show_client_stats,
-    order_trend_from_db
+    order_trend_from_db, show_cohort_retention,
+    show_rfm_segments, show_regional_sales, show_top_products
 )
+from backup import start_backup
+from cache import data_version
+from archive import archive_orders
+from order_import import ImportFormatError, import_orders_from_csv
+from shards import load_shards, show_store_summary
+import lifecycle
+import tasks
+from datetime import datetime
 import pandas as pd
 
 # ========== Защита от повторного открытия окон ==========
@@ -47,6 +58,9 @@ def open_unique_window(key, title, width=600, height=400):
     win = tk.Toplevel()
     win.title(title)
     opened_windows[key] = win
+    # При закрытии окно убирается из реестра и освобождает свои ресурсы
+    lifecycle.manage_window(win)
+    lifecycle.on_close(win, lambda: opened_windows.pop(key, None) if opened_windows.get(key) is win else None)
 
     #Центрирование окна
     win.update_idletasks()  # Обновляем размеры до размещения
@@ -58,6 +72,87 @@ def open_unique_window(key, title, width=600, height=400):
 
     return win
 
+def show_write_error(error):
+    """
+    Сообщает, что запись в базу не удалась и после повторных попыток.
+
+    Параметры
+    ----------
+    error : sqlite3.OperationalError
+        Ошибка последней попытки.
+    """
+    if is_busy_error(error):
+        text = "База данных занята другими пользователями. Повторите попытку позже."
+    else:
+        text = f"Не удалось сохранить изменения:\n{error}"
+    messagebox.showerror("Ошибка базы данных", text)
+
+# ========== Долгие операции ==========
+def run_with_progress(key, title, work, on_done):
+    """
+    Выполняет долгую операцию в фоне с индикатором прогресса и кнопкой «Отмена».
+
+    Операция выполняется в отдельном потоке и получает `tasks.CancelToken`.
+    Кнопка «Отмена» или закрытие окна отменяют токен: выполняющийся запрос
+    прерывается, подключения закрываются, а результат отбрасывается.
+
+    Параметры
+    ----------
+    key : str
+        Уникальный идентификатор окна прогресса.
+    title : str
+        Заголовок окна.
+    work : callable
+        Операция work(token); выполняется в фоновом потоке и не должна
+        обращаться к Tkinter.
+    on_done : callable
+        Вызывается в главном потоке как on_done(result) после успешного
+        завершения.
+
+    Возвращает
+    ----------
+    tasks.CancelToken или None
+        Токен операции, либо None, если такая операция уже выполняется.
+    """
+    window = open_unique_window(key, title, width=360, height=130)
+    if window is None:
+        return None
+
+    token = tasks.CancelToken()
+    state = {"done": False, "result": None, "error": None}
+    status_label = tk.Label(window, text="Выполняется...")
+    status_label.pack(pady=(15, 5))
+    progress = ttk.Progressbar(window, mode="determinate", maximum=100, length=300)
+    progress.pack(pady=5)
+    ttk.Button(window, text="Отмена", command=window.destroy).pack(pady=5)
+    lifecycle.on_close(window, token.cancel)
+
+    def finish(result, error):
+        state["result"], state["error"] = result, error
+        state["done"] = True
+
+    tasks.run_in_thread(work, token, finish)
+
+    def poll():
+        if not window.winfo_exists():
+            return
+        if not state["done"]:
+            progress["value"] = token.percent
+            status_label.config(text=f"{token.status or 'Выполняется'}... {token.percent:.0f}%")
+            lifecycle.after(window, 100, poll)
+            return
+        window.destroy()
+        error = state["error"]
+        if isinstance(error, tasks.Cancelled):
+            return
+        if error is not None:
+            messagebox.showerror("Ошибка", f"Операция не выполнена:\n{error}")
+        else:
+            on_done(state["result"])
+
+    poll()
+    return token
+
 # ========== Форма добавления клиента ==========
 def create_client_form():
     """
@@ -108,7 +203,11 @@ def create_client_form():
             return
 
         client = Client(name=name, email=email, phone=phone, address=address)
-        save_client(client)
+        try:
+            save_client(client)
+        except sqlite3.OperationalError as e:
+            show_write_error(e)
+            return
         messagebox.showinfo("Успех", f"Клиент {name} добавлен")
 
         name_entry.delete(0, tk.END)
@@ -136,7 +235,7 @@ def create_order_form():
         return
 
     tk.Label(window, text="Клиент").pack()
-    client_combo = ttk.Combobox(window, values=[c.name for c in clients])
+    client_combo = ttk.Combobox(window, values=[c.name for c in clients], state="readonly")
     client_combo.pack()
 
     tk.Label(window, text="Выберите товары").pack()
@@ -146,80 +245,180 @@ def create_order_form():
     product_listbox.pack()
 
     def submit_order():
-        client_name = client_combo.get()
+        client_index = client_combo.current()
         selected = product_listbox.curselection()
-        if not selected or not client_name:
+        if not selected or client_index < 0:
             messagebox.showerror("Ошибка", "Выберите клиента и товары")
             return
-        client = next(c for c in clients if c.name == client_name)
+        # По позиции в списке, а не по имени: у однофамильцев разные ID
+        client = clients[client_index]
         selected_products = [products[i] for i in selected]
-        order = Order(client_id=client.name, products=selected_products)
-        save_order(order)
+        order = Order(client_id=client.id, products=selected_products)
+        try:
+            save_order(order)
+        except sqlite3.OperationalError as e:
+            show_write_error(e)
+            return
         messagebox.showinfo("Готово", f"Заказ сохранён: {order.total} руб.")
         window.destroy()
 
     tk.Button(window, text="Создать", command=submit_order).pack()
 
 # ========== Просмотр заказов ==========
-def view_orders():
-    orders = load_orders()
-    window = open_unique_window("view_orders", "Заказы")
-    if window is None:
-        return
-
-    button_width = 30
-
-    def show_orders(data):
-        listbox.delete(0, tk.END)
-        for o in data:
-            listbox.insert(tk.END, f"{o['date']} | {o['client']} | {o['total']} руб.")
-
-    def sort_total():
-        show_orders(sorted(orders, key=lambda o: o["total"], reverse=True))
+# Количество заказов, подгружаемых за один раз, и период проверки изменений в базе (мс)
+ORDERS_PAGE_SIZE = 200
+ORDERS_REFRESH_MS = 2000
 
-    def sort_date():
-        show_orders(sorted(orders, key=lambda o: o["date"]))
-
-    ttk.Button(window, text="Сорт. по сумме", command=sort_total, width=button_width).pack(pady=10)
-    ttk.Button(window, text="Сорт. по дате", command=sort_date, width=button_width).pack(pady=10)
-    ttk.Button(window, text="Удалить заказ", command=manage_orders, width=button_width).pack(pady=10)
-    ttk.Button(window, text="Экспорт заказов (CSV)", command=export_orders, width=button_width).pack(pady=10)
-    listbox = tk.Listbox(window, width=60)
-    listbox.pack()
-    show_orders(orders)
-
-# ========== Управление заказами ==========
-def manage_orders():
+def view_orders():
     """
-    Открывает окно управления заказами.
+    Открывает просмотр заказов с сортировкой, фильтрами и постраничной загрузкой.
 
-    Позволяет просматривать и удалять заказы из базы данных.
+    Сортировка и фильтрация выполняются запросами к базе (`load_orders_page`),
+    следующая страница подгружается при прокрутке до конца таблицы. Если
+    данные в базе изменились, список обновляется автоматически.
     """
-    orders = load_orders()
-    window = open_unique_window("manage_orders", "Управление заказами")
+    window = open_unique_window("view_orders", "Заказы", width=900, height=600)
     if window is None:
         return
 
-    listbox = tk.Listbox(window, width=60)
-    listbox.pack()
+    state = {"sort": "date", "descending": False, "after": None, "has_more": False,
+             "filters": {}, "loaded": 0, "loading": False, "version": data_version()}
+
+    # Фильтры
+    filters_frame = tk.Frame(window)
+    filters_frame.pack(fill="x", padx=10, pady=5)
+    filter_fields = [("client", "Клиент"), ("date_from", "Дата с (ГГГГ-ММ-ДД)"), ("date_to", "Дата по"),
+                     ("min_total", "Сумма от"), ("max_total", "Сумма до")]
+    entries = {}
+    for column, (key, label) in enumerate(filter_fields):
+        tk.Label(filters_frame, text=label).grid(row=0, column=column, sticky="w", padx=2)
+        entry = tk.Entry(filters_frame, width=18)
+        entry.grid(row=1, column=column, padx=2)
+        entry.bind("<Return>", lambda event: apply_filters())
+        entries[key] = entry
+
+    # Таблица заказов
+    table_frame = tk.Frame(window)
+    table_frame.pack(fill="both", expand=True, padx=10)
+    columns = ("id", "date", "client", "total", "products")
+    headings = {"id": "ID", "date": "Дата", "client": "Клиент", "total": "Сумма, руб.", "products": "Товары"}
+    widths = {"id": 70, "date": 140, "client": 220, "total": 100, "products": 300}
+    tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+    for column in columns:
+        if column in ORDER_SORT_COLUMNS:
+            tree.heading(column, text=headings[column], command=lambda c=column: sort_by(c))
+        else:
+            tree.heading(column, text=headings[column])
+        tree.column(column, width=widths[column], anchor="e" if column in ("id", "total") else "w")
+    scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+
+    def on_scroll(first, last):
+        scrollbar.set(first, last)
+        # Прокрутили до конца — подгружаем следующую страницу
+        if float(last) >= 1.0 and state["has_more"] and not state["loading"]:
+            state["loading"] = True
+            window.after_idle(load_page)
+
+    tree.configure(yscrollcommand=on_scroll)
+    tree.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+    status_label = tk.Label(window, anchor="w")
+    status_label.pack(fill="x", padx=10)
+
+    def update_headings():
+        for column in ORDER_SORT_COLUMNS:
+            arrow = ""
+            if column == state["sort"]:
+                arrow = " ▼" if state["descending"] else " ▲"
+            tree.heading(column, text=headings[column] + arrow)
+
+    def load_page(limit=ORDERS_PAGE_SIZE):
+        state["loading"] = False
+        if not window.winfo_exists():
+            return
+        orders, state["after"] = load_orders_page(
+            state["sort"], state["descending"], state["after"], limit, **state["filters"])
+        state["has_more"] = state["after"] is not None
+        for o in orders:
+            tree.insert("", tk.END, iid=str(o["id"]),
+                        values=(o["id"], o["date"], o["client"], o["total"], o["products"]))
+        state["loaded"] += len(orders)
+        more = ", прокрутите вниз для продолжения" if state["has_more"] else ""
+        status_label.config(text=f"Загружено заказов: {state['loaded']}{more}")
+
+    def reload(keep_loaded=False):
+        # При автоматическом обновлении сохраняем количество уже показанных строк
+        limit = max(ORDERS_PAGE_SIZE, state["loaded"]) if keep_loaded else ORDERS_PAGE_SIZE
+        tree.delete(*tree.get_children())
+        state["after"], state["loaded"] = None, 0
+        state["version"] = data_version()
+        update_headings()
+        load_page(limit)
+
+    def sort_by(column):
+        if state["sort"] == column:
+            state["descending"] = not state["descending"]
+        else:
+            state["sort"], state["descending"] = column, False
+        reload()
 
-    def refresh():
-        listbox.delete(0, tk.END)
-        for i, o in enumerate(orders):
-            listbox.insert(tk.END, f"{i+1}) {o['date']} | {o['client']} | {o['total']} руб.")
+    def apply_filters():
+        values = {key: entry.get().strip() for key, entry in entries.items()}
+        filters = {}
+        try:
+            for key in ("date_from", "date_to"):
+                if values[key]:
+                    datetime.strptime(values[key], "%Y-%m-%d")
+                    filters[key] = values[key]
+            for key in ("min_total", "max_total"):
+                if values[key]:
+                    filters[key] = float(values[key].replace(",", "."))
+        except ValueError:
+            messagebox.showerror("Ошибка", "Даты вводятся в формате ГГГГ-ММ-ДД, суммы — числом")
+            return
+        if values["client"]:
+            filters["client"] = values["client"]
+        state["filters"] = filters
+        reload()
 
-    def delete_order():
-        idx = listbox.curselection()
-        if not idx:
+    def delete_selected():
+        selected = tree.selection()
+        if not selected:
             messagebox.showerror("Ошибка", "Выберите заказ")
             return
-        delete_order_by_index(idx[0])
-        orders.pop(idx[0])
-        refresh()
-        messagebox.showinfo("Удалено", "Заказ удалён")
+        for iid in selected:
+            try:
+                delete_order_by_id(int(iid))
+            except sqlite3.OperationalError as e:
+                show_write_error(e)
+                break
+            tree.delete(iid)
+            state["loaded"] -= 1
+        # Собственное удаление уже отражено в таблице — не перезагружаем её
+        state["version"] = data_version()
+        messagebox.showinfo("Удалено", f"Удалено заказов: {len(selected)}")
+
+    def poll_changes():
+        if not window.winfo_exists():
+            return
+        if data_version() != state["version"]:
+            reload(keep_loaded=True)
+        lifecycle.after(window, ORDERS_REFRESH_MS, poll_changes)
+
+    ttk.Button(filters_frame, text="Применить", command=apply_filters).grid(row=1, column=len(filter_fields), padx=5)
 
-    tk.Button(window, text="Удалить", command=delete_order).pack()
-    refresh()
+    buttons_frame = tk.Frame(window)
+    buttons_frame.pack(pady=5)
+    ttk.Button(buttons_frame, text="Обновить", command=lambda: reload(keep_loaded=True)).pack(side="left", padx=3)
+    ttk.Button(buttons_frame, text="Удалить выбранные", command=delete_selected).pack(side="left", padx=3)
+    ttk.Button(buttons_frame, text="Экспорт заказов (CSV)", command=export_orders).pack(side="left", padx=3)
+    ttk.Button(buttons_frame, text="Экспорт изменений (CSV)", command=export_order_changes).pack(side="left", padx=3)
+    ttk.Button(buttons_frame, text="Импорт заказов (CSV)", command=import_orders).pack(side="left", padx=3)
+    ttk.Button(buttons_frame, text="Архивировать старые заказы", command=archive_orders_form).pack(side="left", padx=3)
+
+    reload()
+    lifecycle.after(window, ORDERS_REFRESH_MS, poll_changes)
 
 # ========== Меню анализа ==========
 def show_analysis_menu():
@@ -243,15 +442,149 @@ def show_analysis_menu():
 
     ttk.Button(window, text="Статистика по клиентам", command=show_client_stats, width=button_width).pack(pady=5)
     ttk.Button(window, text="Топ-клиенты", command=top_clients_from_db, width=button_width).pack(pady=5)
+    ttk.Button(window, text="Топ товаров", command=show_top_products, width=button_width).pack(pady=5)
     ttk.Button(window, text="Динамика заказов", command=order_trend_from_db, width=button_width).pack(pady=5)
     ttk.Button(window, text="Продажи по месяцам", command=sales_trend_monthly_change, width=button_width).pack(pady=5)
+    ttk.Button(window, text="Когорты клиентов", command=show_cohort_retention, width=button_width).pack(pady=5)
+    ttk.Button(window, text="RFM-сегментация", command=show_rfm_segments, width=button_width).pack(pady=5)
+    ttk.Button(window, text="Продажи по регионам", command=show_regional_sales, width=button_width).pack(pady=5)
+    if load_shards():
+        ttk.Button(window, text="Сводка по магазинам", command=show_store_summary, width=button_width).pack(pady=5)
     ttk.Button(window, text="Закрыть", command=window.destroy, width=button_width).pack(pady=10)
 
 
 # ========== Экспорт заказов ==========
 def export_orders():
-    export_orders_to_csv()
-    messagebox.showinfo("Экспорт", "Файл orders_export.csv создан")
+    """
+    Выгружает все заказы в orders_export.csv в фоне с возможностью отмены.
+    """
+    run_with_progress("export_orders", "Экспорт заказов",
+                      lambda token: export_orders_to_csv(token=token),
+                      lambda count: messagebox.showinfo("Экспорт", f"Файл orders_export.csv создан, заказов: {count}"))
+
+def export_order_changes():
+    """
+    Дописывает в orders_changes.csv заказы, изменённые с прошлой выгрузки.
+    """
+    count = export_orders_to_csv("orders_changes.csv", incremental=True)
+    messagebox.showinfo("Экспорт", f"В файл orders_changes.csv записано изменений: {count}")
+
+# ========== Импорт заказов ==========
+def import_orders():
+    """
+    Загружает заказы из CSV-файла (формат выгрузки или построчные позиции)
+    и показывает отчёт, в том числе о ненайденных клиентах и товарах.
+    """
+    path = filedialog.askopenfilename(
+        title="Выберите CSV файл с заказами",
+        filetypes=[("CSV файлы", "*.csv"), ("Все файлы", "*.*")]
+    )
+    if not path:
+        return
+    try:
+        report = import_orders_from_csv(path)
+    except sqlite3.OperationalError as e:
+        show_write_error(e)
+        return
+    except (ImportFormatError, OSError, UnicodeDecodeError) as e:
+        messagebox.showerror("Ошибка импорта", f"Не удалось загрузить файл:\n{e}")
+        return
+
+    lines = [f"Импортировано заказов: {report['imported']} ({report['rows_per_sec']:.0f} строк/с)",
+             f"Отклонено заказов: {report['rejected']}"]
+    for title, names in (("Неизвестные клиенты", report["unresolved_clients"]),
+                         ("Неизвестные товары", report["unresolved_products"])):
+        if names:
+            shown = ", ".join(f"{name} ({count})" for name, count in names.most_common(5))
+            more = f" и ещё {len(names) - 5}" if len(names) > 5 else ""
+            lines.append(f"{title}: {shown}{more}")
+    messagebox.showinfo("Импорт заказов", "\n".join(lines))
+
+# ========== Архивирование заказов ==========
+def archive_orders_form():
+    """
+    Открывает форму архивирования заказов старше указанной даты.
+
+    Заказы переносятся в архивные файлы по годам или месяцам.
+    """
+    window = open_unique_window("archive_form", "Архивирование заказов", width=340, height=200)
+    if window is None:
+        return
+
+    tk.Label(window, text="Архивировать заказы до даты (ГГГГ-ММ-ДД)").pack(pady=(10, 0))
+    cutoff_entry = tk.Entry(window)
+    cutoff_entry.insert(0, f"{datetime.now().year - 1}-01-01")
+    cutoff_entry.pack()
+
+    periods = {"По годам": "year", "По месяцам": "month"}
+    tk.Label(window, text="Разбиение архива").pack()
+    period_combo = ttk.Combobox(window, values=list(periods), state="readonly")
+    period_combo.current(0)
+    period_combo.pack()
+
+    def submit():
+        cutoff = cutoff_entry.get().strip()
+        try:
+            datetime.strptime(cutoff, "%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите дату в формате ГГГГ-ММ-ДД")
+            return
+        moved = archive_orders(cutoff, periods[period_combo.get()])
+        messagebox.showinfo("Готово", f"Перенесено в архив заказов: {sum(moved.values())}")
+        window.destroy()
+
+    tk.Button(window, text="Архивировать", command=submit).pack(pady=10)
+
+# ========== Резервное копирование ==========
+def create_backup():
+    """
+    Создаёт резервную копию базы данных, не блокируя интерфейс.
+
+    Копирование идёт в фоновом потоке порциями страниц; окно показывает прогресс
+    и сообщает о завершении.
+    """
+    path = filedialog.asksaveasfilename(
+        title="Сохранить резервную копию",
+        defaultextension=".db",
+        initialfile=f"ecom_backup_{datetime.now():%Y%m%d_%H%M}.db",
+        filetypes=[("База данных SQLite", "*.db")]
+    )
+    if not path:
+        return
+
+    window = open_unique_window("backup", "Резервное копирование", width=360, height=100)
+    if window is None:
+        return
+
+    status_label = tk.Label(window, text="Копирование...")
+    status_label.pack(pady=20)
+    state = {"done": False, "error": None, "remaining": 0, "total": 0}
+
+    def on_progress(status, remaining, total):
+        state["remaining"], state["total"] = remaining, total
+
+    def on_done(error):
+        state["error"] = error
+        state["done"] = True
+
+    start_backup(path, on_done=on_done, progress=on_progress)
+
+    def poll():
+        if not window.winfo_exists():
+            return
+        if not state["done"]:
+            if state["total"]:
+                percent = 100 * (state["total"] - state["remaining"]) // state["total"]
+                status_label.config(text=f"Копирование... {percent}%")
+            lifecycle.after(window, 100, poll)
+            return
+        window.destroy()
+        if state["error"]:
+            messagebox.showerror("Ошибка", f"Не удалось создать копию:\n{state['error']}")
+        else:
+            messagebox.showinfo("Готово", f"Резервная копия сохранена:\n{path}")
+
+    poll()
 
 # ========== Добавление товара ==========
 def create_product_form():
@@ -298,19 +631,12 @@ def create_product_form():
             messagebox.showerror("Ошибка", "\n".join(errors))
             return
 
-        conn = connect()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
-            (name, price, category)
-        )
-        conn.commit()
-        conn.close()
+        try:
+            save_product(Product(name, price, category))
+        except sqlite3.OperationalError as e:
+            show_write_error(e)
+            return
 
-        messagebox.showinfo("Готово", f"Товар '{name}' добавлен")
-        name_entry.delete(0, tk.END)
-        price_entry.delete(0, tk.END)
-        category_entry.delete
         messagebox.showinfo("Готово", f"Товар '{name}' добавлен")
         name_entry.delete(0, tk.END)
         price_entry.delete(0, tk.END)
@@ -334,13 +660,8 @@ def manage_products():
 
     def refresh_list():
         product_listbox.delete(0, tk.END)
-        conn = connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, price, category FROM products")
-        rows = cursor.fetchall()
-        conn.close()
-        for row in rows:
-            product_listbox.insert(tk.END, f"{row[0]}) {row[1]} — {row[2]} руб. ({row[3]})")
+        for p in load_products():
+            product_listbox.insert(tk.END, f"{p.id}) {p.name} — {p.price} руб. ({p.category})")
 
     def delete_product():
         selected = product_listbox.curselection()
@@ -349,11 +670,11 @@ def manage_products():
             return
         item_text = product_listbox.get(selected[0])
         product_id = int(item_text.split(")")[0])
-        conn = connect()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        conn.commit()
-        conn.close()
+        try:
+            delete_product_by_id(product_id)
+        except sqlite3.OperationalError as e:
+            show_write_error(e)
+            return
         messagebox.showinfo("Удалено", f"Товар ID {product_id} удалён")
         refresh_list()
 
@@ -370,7 +691,6 @@ if __name__ == "__main__":
     tk.Button(root, text="Добавить товар", command=create_product_form).pack(pady=5)
     tk.Button(root, text="Создать заказ", command=create_order_form).pack(pady=5)
     tk.Button(root, text="Просмотр заказов", command=view_orders).pack(pady=5)
-    tk.Button(root, text="Управление заказами", command=manage_orders).pack(pady=5)
     tk.Button(root, text="Статистика клиентов", command=show_client_stats).pack(pady=5)
     tk.Button(root, text="Аналитика", command=show_analysis_menu).pack(pady=10)
     tk.Button(root, text="Экспорт заказов", command=export_orders).pack(pady=10)
@@ -453,11 +773,13 @@ def show_client_list():
     def populate_tree(data):
         tree.delete(*tree.get_children())
         for client in data:
-            tree.insert("", "end", values=(
+            # У клиентов, созданных по заказам при миграции, контакты не заполнены
+            # ID клиента — идентификатор строки: однофамильцы различаются
+            tree.insert("", "end", iid=str(client.id), values=(
                 client.name,
-                client.email,
-                client.phone,
-                client.address
+                client.email or "",
+                client.phone or "",
+                client.address or ""
             ))
 
     populate_tree(clients)
@@ -467,10 +789,10 @@ def show_client_list():
         query = search_var.get().lower()
         filtered = [
             client for client in clients
-            if query in client.name.lower()
-               or query in client.email.lower()
-               or query in client.phone.lower()
-               or query in client.address.lower()
+            if query in (client.name or "").lower()
+               or query in (client.email or "").lower()
+               or query in (client.phone or "").lower()
+               or query in (client.address or "").lower()
         ]
         populate_tree(filtered)
 
@@ -487,24 +809,28 @@ def show_client_list():
         """
         Удаляет выбранного клиента из таблицы и базы данных.
 
-        Запрашивает подтверждение, удаляет клиента и обновляет таблицу.
+        Запрашивает подтверждение, удаляет клиента вместе с его заказами
+        (заказы ссылаются на ID клиента) и обновляет таблицу.
         """
         selected_item = tree.selection()
         if selected_item:
+            client_id = int(selected_item[0])
             client_name = tree.item(selected_item)["values"][0]
 
-            confirm = messagebox.askyesno("Удаление", f"Удалить клиента «{client_name}» из базы?")
+            confirm = messagebox.askyesno("Удаление", f"Удалить клиента «{client_name}» и все его заказы из базы?")
             if not confirm:
                 return
 
             # Удаляем из базы
-            delete_client_by_name(client_name)
+            try:
+                delete_client_by_id(client_id, with_orders=True)
+            except sqlite3.OperationalError as e:
+                show_write_error(e)
+                return
 
-            # Обновляем список
-            updated_clients = [c.name for c in load_clients()]
-            original_clients.clear()
-            original_clients.extend(updated_clients)
-            populate_tree(original_clients)
+            # Обновляем список с учётом текущего поиска
+            clients[:] = load_clients()
+            update_search()
 
             messagebox.showinfo("Удалено", f"Клиент «{client_name}» удалён.")
         else:
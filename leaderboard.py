@@ -0,0 +1,328 @@
+"""
+Инкрементальные счётчики по клиентам и товарам (таблицы лидеров).
+
+Таблица `client_totals` хранит для каждого клиента количество заказов, сумму
+в копейках и дату последнего заказа, таблица `product_totals` — количество
+проданных единиц и заказов по каждому товару. Счётчики обновляются в той же
+транзакции, что и вставка или удаление заказа (`db.insert_order`,
+`forget_orders`), а индексы по убыванию счётчиков позволяют получать
+ТОП-N без сортировки всех клиентов.
+
+Счётчики отражают рабочую таблицу заказов: перенос в архив уменьшает их так
+же, как удаление. Проверка `check_leaderboards` пересчитывает значения по
+исходным заказам; запуск `python leaderboard.py [--rebuild]` проверяет базу
+и при расхождениях пересобирает счётчики.
+"""
+
+import argparse
+from collections import Counter
+
+# Сумма заказа в копейках: одно и то же выражение для вставки, удаления и проверки
+KOPECKS_SQL = "CAST(ROUND(COALESCE({total}, 0) * 100) AS INTEGER)"
+
+# Порядок сортировки ТОП-N и индекс, который его обслуживает
+CLIENT_ORDERINGS = {
+    "orders": "t.order_count DESC, t.client_id",
+    "revenue": "t.revenue_kopecks DESC, t.client_id",
+}
+PRODUCT_ORDERINGS = {
+    "quantity": "quantity DESC, product",
+    "orders": "order_count DESC, product",
+}
+
+
+def create_leaderboards(cursor):
+    """
+    Создаёт таблицы счётчиков и индексы для запросов ТОП-N.
+
+    Если таблицы создаются впервые, а в базе уже есть заказы, счётчики
+    заполняются по ним.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
+    existed = cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('client_totals', 'product_totals')"
+    ).fetchone()[0] == 2
+    cursor.execute("""CREATE TABLE IF NOT EXISTS client_totals (
+        client_id INTEGER PRIMARY KEY,
+        order_count INTEGER NOT NULL,
+        revenue_kopecks INTEGER NOT NULL,
+        last_order_date TEXT
+    )""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS product_totals (
+        product TEXT PRIMARY KEY,
+        quantity INTEGER NOT NULL,
+        order_count INTEGER NOT NULL
+    )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_client_totals_orders ON client_totals (order_count DESC, client_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_client_totals_revenue ON client_totals (revenue_kopecks DESC, client_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_totals_quantity ON product_totals (quantity DESC, product)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_totals_orders ON product_totals (order_count DESC, product)")
+    if not existed:
+        rebuild_leaderboards(cursor)
+
+
+def _split_products(products):
+    """Разбирает строку товаров заказа ("Чай,Квас") в счётчик по названиям."""
+    return Counter(name for name in (products or "").split(",") if name)
+
+
+def kopecks(total):
+    """
+    Переводит сумму заказа в целые копейки так же, как `KOPECKS_SQL`
+    (ROUND в SQLite округляет половину от нуля).
+    """
+    value = (total or 0) * 100
+    return int(value + 0.5) if value >= 0 else int(value - 0.5)
+
+
+def record_order(cursor, client_id, products, date, total):
+    """
+    Учитывает новый заказ в счётчиках в рамках текущей транзакции.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    client_id : int or None
+        ID клиента.
+    products : str
+        Товары заказа через запятую, как в колонке `orders.products`.
+    date : str
+        Дата заказа "ГГГГ-ММ-ДД".
+    total : float
+        Сумма заказа.
+    """
+    record_orders(cursor, [(client_id, products, date, total)])
+
+
+def record_orders(cursor, rows):
+    """
+    Учитывает пакет новых заказов: счётчики сначала складываются в памяти,
+    затем каждый клиент и товар обновляется одной командой.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    rows : iterable of tuple
+        Заказы (client_id, products, date, total) в формате таблицы `orders`.
+    """
+    clients, products = _totals((client_id, names, date, kopecks(total))
+                                for client_id, names, date, total in rows)
+    cursor.executemany("""INSERT INTO client_totals (client_id, order_count, revenue_kopecks, last_order_date)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (client_id) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            revenue_kopecks = revenue_kopecks + excluded.revenue_kopecks,
+            last_order_date = CASE
+                WHEN last_order_date IS NULL OR excluded.last_order_date > last_order_date
+                THEN excluded.last_order_date ELSE last_order_date END""",
+                       [(client_id, *totals) for client_id, totals in clients.items()])
+    cursor.executemany("""INSERT INTO product_totals (product, quantity, order_count) VALUES (?, ?, ?)
+        ON CONFLICT (product) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            order_count = order_count + excluded.order_count""",
+                       [(name, *totals) for name, totals in products.items()])
+
+
+def _totals(rows):
+    """
+    Складывает строки (client_id, products, date, kopecks) в счётчики.
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        {client_id: [заказов, копеек, последняя дата]} и
+        {товар: [единиц, заказов]}.
+    """
+    clients, products = {}, {}
+    for client_id, names, date, kopecks in rows:
+        if client_id is not None:
+            totals = clients.setdefault(client_id, [0, 0, None])
+            totals[0] += 1
+            totals[1] += kopecks
+            if date is not None and (totals[2] is None or date > totals[2]):
+                totals[2] = date
+        for name, quantity in _split_products(names).items():
+            totals = products.setdefault(name, [0, 0])
+            totals[0] += quantity
+            totals[1] += 1
+    return clients, products
+
+
+def _select_orders(where="", schema="main"):
+    return f"SELECT client_id, products, date, {KOPECKS_SQL.format(total='total')} FROM {schema}.orders{where}"
+
+
+def forget_orders(cursor, where, args=(), schema="main"):
+    """
+    Удаляет заказы, подходящие под условие, и вычитает их из счётчиков
+    в рамках текущей транзакции.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    where : str
+        Условие WHERE (без самого слова) для таблицы заказов.
+    args : sequence, optional
+        Параметры условия.
+    schema : str, optional
+        Схема рабочей таблицы заказов.
+
+    Returns
+    -------
+    int
+        Количество удалённых заказов.
+    """
+    clients, products = _totals(cursor.execute(_select_orders(f" WHERE {where}", schema), args).fetchall())
+    cursor.execute(f"DELETE FROM {schema}.orders WHERE {where}", args)
+    deleted = cursor.rowcount
+    cursor.executemany(f"""UPDATE {schema}.client_totals SET
+            order_count = order_count - ?,
+            revenue_kopecks = revenue_kopecks - ?,
+            last_order_date = CASE WHEN ? < last_order_date THEN last_order_date
+                ELSE (SELECT MAX(date) FROM {schema}.orders WHERE client_id = ?) END
+        WHERE client_id = ?""",
+                       [(count, kopecks, date, client_id, client_id)
+                        for client_id, (count, kopecks, date) in clients.items()])
+    cursor.executemany(f"""UPDATE {schema}.product_totals SET quantity = quantity - ?, order_count = order_count - ?
+        WHERE product = ?""",
+                       [(quantity, count, name) for name, (quantity, count) in products.items()])
+    cursor.executemany(f"DELETE FROM {schema}.client_totals WHERE client_id = ? AND order_count <= 0",
+                       [(client_id,) for client_id in clients])
+    cursor.executemany(f"DELETE FROM {schema}.product_totals WHERE product = ? AND order_count <= 0",
+                       [(name,) for name in products])
+    return deleted
+
+
+def expected_totals(conn, schema="main"):
+    """
+    Пересчитывает счётчики по исходным заказам (полный проход по таблице).
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        Счётчики клиентов и товаров в формате `_totals`.
+    """
+    return _totals(conn.execute(_select_orders(schema=schema)))
+
+
+def rebuild_leaderboards(cursor, schema="main"):
+    """
+    Заполняет таблицы счётчиков заново по исходным заказам в рамках
+    текущей транзакции.
+    """
+    clients, products = expected_totals(cursor, schema)
+    cursor.execute(f"DELETE FROM {schema}.client_totals")
+    cursor.execute(f"DELETE FROM {schema}.product_totals")
+    cursor.executemany(f"INSERT INTO {schema}.client_totals VALUES (?, ?, ?, ?)",
+                       [(client_id, *totals) for client_id, totals in clients.items()])
+    cursor.executemany(f"INSERT INTO {schema}.product_totals VALUES (?, ?, ?)",
+                       [(name, *totals) for name, totals in products.items()])
+
+
+def check_leaderboards(conn, schema="main"):
+    """
+    Сверяет таблицы счётчиков с пересчётом по исходным заказам.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection or sqlite3.Cursor
+        Подключение к базе данных.
+
+    Returns
+    -------
+    dict
+        {"clients": [...], "products": [...]} — отсортированные ключи
+        (ID клиентов и названия товаров), для которых счётчики расходятся
+        с заказами. Пустые списки означают, что счётчики согласованы.
+    """
+    clients, products = expected_totals(conn, schema)
+    stored_clients = {row[0]: list(row[1:]) for row in conn.execute(
+        f"SELECT client_id, order_count, revenue_kopecks, last_order_date FROM {schema}.client_totals")}
+    stored_products = {row[0]: list(row[1:]) for row in conn.execute(
+        f"SELECT product, quantity, order_count FROM {schema}.product_totals")}
+    return {
+        "clients": sorted(key for key in clients.keys() | stored_clients.keys()
+                          if clients.get(key) != stored_clients.get(key)),
+        "products": sorted(key for key in products.keys() | stored_products.keys()
+                           if products.get(key) != stored_products.get(key)),
+    }
+
+
+def top_clients(conn, limit=5, by="orders"):
+    """
+    Возвращает лучших клиентов по счётчикам; читает `limit` строк индекса.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе данных.
+    limit : int, optional
+        Количество клиентов.
+    by : str, optional
+        "orders" — по количеству заказов, "revenue" — по сумме.
+
+    Returns
+    -------
+    list of tuple
+        Кортежи (client_id, имя, заказов, сумма в рублях, последняя дата).
+    """
+    if by not in CLIENT_ORDERINGS:
+        raise ValueError(f"Неизвестный порядок: {by}")
+    return conn.execute(f"""SELECT t.client_id, c.name, t.order_count, t.revenue_kopecks / 100.0, t.last_order_date
+        FROM client_totals t LEFT JOIN clients c ON c.id = t.client_id
+        ORDER BY {CLIENT_ORDERINGS[by]} LIMIT ?""", (limit,)).fetchall()
+
+
+def top_products(conn, limit=5, by="quantity"):
+    """
+    Возвращает самые продаваемые товары по счётчикам.
+
+    Parameters
+    ----------
+    by : str, optional
+        "quantity" — по количеству единиц, "orders" — по количеству заказов.
+
+    Returns
+    -------
+    list of tuple
+        Кортежи (товар, единиц, заказов).
+    """
+    if by not in PRODUCT_ORDERINGS:
+        raise ValueError(f"Неизвестный порядок: {by}")
+    return conn.execute(f"SELECT product, quantity, order_count FROM product_totals "
+                        f"ORDER BY {PRODUCT_ORDERINGS[by]} LIMIT ?", (limit,)).fetchall()
+
+
+def main():
+    import db
+
+    parser = argparse.ArgumentParser(description="Проверка счётчиков клиентов и товаров")
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--rebuild", action="store_true", help="пересобрать счётчики при расхождениях")
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        db.create_schema(cursor)
+        conn.commit()
+        report = check_leaderboards(conn)
+        print(f"Расхождений: клиентов {len(report['clients'])}, товаров {len(report['products'])}")
+        if args.rebuild and (report["clients"] or report["products"]):
+            rebuild_leaderboards(cursor)
+            conn.commit()
+            print("Счётчики пересобраны")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Освобождение ресурсов окон интерфейса.
+
+Окно, подключённое через `manage_window`, при закрытии (крестиком, кнопкой
+или вместе с родителем) вызывает зарегистрированные для него обработчики:
+закрывает графики matplotlib, отменяет отложенные вызовы `after`,
+удаляется из реестра открытых окон. После закрытия окна из кэша
+результатов удаляются устаревшие записи.
+
+Закрытие крестиком по умолчанию уничтожает окно только на стороне Tcl:
+объект `Toplevel` остаётся в словаре `children` родителя вместе со всеми
+виджетами и замыканиями-обработчиками. Поэтому `manage_window` назначает
+обработчик `WM_DELETE_WINDOW`, который вызывает `destroy()` объекта.
+
+Рост памяти за сеанс показывает `memory_report` (по снимкам `tracemalloc`);
+если задана переменная окружения `ECOM_TRACEMALLOC`, отслеживание
+включается при запуске приложения, а отчёт выводится при выходе.
+"""
+
+import gc
+import os
+import tracemalloc
+
+import matplotlib.pyplot as plt
+
+import cache
+
+TRACEMALLOC_ENV = "ECOM_TRACEMALLOC"
+
+# Обработчики закрытия и отложенные вызовы по имени окна Tk
+_cleanups = {}
+_after_ids = {}
+_baseline = None
+
+
+def manage_window(window):
+    """
+    Подключает окно к управлению ресурсами.
+
+    Параметры
+    ----------
+    window : tk.Toplevel
+        Окно верхнего уровня.
+    """
+    name = str(window)
+    _cleanups.setdefault(name, [])
+    _after_ids.setdefault(name, set())
+    window.protocol("WM_DELETE_WINDOW", window.destroy)
+    # <Destroy> окна верхнего уровня приходит и для всех дочерних виджетов
+    window.bind("<Destroy>", lambda event: _release(window) if event.widget is window else None, add="+")
+
+
+def on_close(window, func):
+    """Регистрирует функцию без аргументов, вызываемую при закрытии окна."""
+    _cleanups.setdefault(str(window), []).append(func)
+
+
+def attach_figure(window, figure):
+    """
+    Закрывает график matplotlib вместе с окном.
+
+    Освобождает фигуру pyplot (если она создана через `plt.figure`) и
+    очищает оси, чтобы холст и данные графика не удерживались ссылками.
+    """
+    def release():
+        plt.close(figure)
+        figure.clear()
+    on_close(window, release)
+
+
+def after(window, ms, func):
+    """
+    Планирует вызов `window.after(ms, func)`, отменяемый при закрытии окна.
+
+    Возвращает
+    ----------
+    str
+        Идентификатор вызова.
+    """
+    ids = _after_ids.setdefault(str(window), set())
+
+    def call():
+        ids.discard(after_id)
+        func()
+
+    after_id = window.after(ms, call)
+    ids.add(after_id)
+    return after_id
+
+
+def _release(window):
+    name = str(window)
+    for after_id in _after_ids.pop(name, ()):
+        try:
+            window.after_cancel(after_id)
+        except Exception:
+            pass
+    for func in reversed(_cleanups.pop(name, [])):
+        try:
+            func()
+        except Exception as e:
+            print(f"Ошибка при освобождении ресурсов окна {name}: {e}")
+    cache.purge_stale()
+
+
+def managed_windows():
+    """Возвращает количество открытых окон под управлением `manage_window`."""
+    return len(_cleanups)
+
+
+def start_tracking(frames=1):
+    """
+    Включает `tracemalloc` и запоминает базовый снимок для `memory_report`.
+
+    Параметры
+    ----------
+    frames : int, optional
+        Глубина стека, сохраняемого для каждого выделения памяти.
+    """
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    gc.collect()
+    _baseline = tracemalloc.take_snapshot()
+
+
+def memory_report(limit=10):
+    """
+    Формирует отчёт о памяти процесса.
+
+    Параметры
+    ----------
+    limit : int, optional
+        Сколько мест с наибольшим ростом памяти показать.
+
+    Возвращает
+    ----------
+    str
+        Текущий и пиковый объём отслеживаемой памяти, число открытых окон и
+        графиков, записей кэша и места кода с наибольшим ростом относительно
+        снимка `start_tracking`.
+    """
+    if not tracemalloc.is_tracing():
+        return "Отслеживание памяти не включено (tracemalloc)"
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    stats = cache.cache_stats()
+    lines = [
+        f"Память: {current / 2**20:.1f} МБ, пик {peak / 2**20:.1f} МБ",
+        f"Окон: {managed_windows()}, графиков pyplot: {len(plt.get_fignums())}, "
+        f"записей кэша: {stats['entries']} ({stats['size'] / 2**20:.1f} МБ)",
+    ]
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    if _baseline is not None:
+        lines.append("Наибольший рост с начала отслеживания:")
+        for stat in snapshot.compare_to(_baseline, "lineno")[:limit]:
+            lines.append(f"  {stat.size_diff / 1024:+.1f} КБ ({stat.count_diff:+d}): {stat.traceback}")
+    else:
+        lines.append("Наибольшие выделения памяти:")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            lines.append(f"  {stat.size / 1024:.1f} КБ ({stat.count}): {stat.traceback}")
+    return "\n".join(lines)
+
+
+def start_from_env():
+    """Включает отслеживание памяти, если задана переменная `ECOM_TRACEMALLOC`."""
+    if os.environ.get(TRACEMALLOC_ENV):
+        start_tracking()
+
+
+def shutdown():
+    """
+    Освобождает ресурсы процесса при выходе: графики pyplot, кэш результатов
+    и контрольные подключения кэша. Если включено отслеживание памяти,
+    выводит `memory_report`.
+    """
+    if tracemalloc.is_tracing():
+        print(memory_report())
+    plt.close("all")
+    cache.result_cache.clear()
+    cache.close_monitors()
@@ -3,9 +3,16 @@ from gui import (
     view_orders,
     show_analysis_menu,
     show_product_menu,
-    show_clients_menu
+    show_clients_menu,
+    create_backup
 )
 from db import initialize_db
+from backup import start_snapshot_schedule, stop_snapshot_schedule
+from tkwatchdog import start_watchdog, stop_watchdog
+from shards import STORE_ENV, use_store
+from dashboard import Dashboard
+import lifecycle
+import os
 import tkinter as tk
 
 def main():
@@ -21,15 +28,32 @@ def main():
     - Использует модуль `tkinter` для создания GUI.
     - Все действия вызываются через соответствующие функции из модуля `gui`.
     - Перед запуском интерфейса вызывается `initialize_db()` для подготовки базы данных.
+    - Если задана переменная окружения `ECOM_SNAPSHOT_INTERVAL` (секунды,
+      `backup.SNAPSHOT_INTERVAL`), аналитика работает по периодически
+      обновляемому снимку базы.
+    - Если задана переменная окружения `ECOM_WATCHDOG`, зависания главного
+      цикла записываются модулем `tkwatchdog`.
+    - Над кнопками показывается панель показателей (`dashboard`), которая
+      обновляется только при изменении данных.
+    - Окна освобождают графики и прочие ресурсы при закрытии (`lifecycle`);
+      если задана переменная окружения `ECOM_TRACEMALLOC`, при выходе
+      выводится отчёт о памяти.
+    - Если задана переменная окружения `ECOM_STORE`, приложение работает с
+      базой этого магазина из списка `shards.SHARDS_FILE`.
     """
+    store = os.environ.get(STORE_ENV)
+    if store:
+        use_store(store)
+    lifecycle.start_from_env()
     initialize_db()
+    start_snapshot_schedule()
 
     root = tk.Tk()
-    root.title("Система управления заказами")
+    root.title("Система управления заказами" + (f" — {store}" if store else ""))
 
     # Размеры окна приложения
-    window_width = 320
-    window_height = 500
+    window_width = 560
+    window_height = 720
 
     # Получение размеров экрана
     screen_width = root.winfo_screenwidth()
@@ -42,6 +66,10 @@ def main():
     # Установка геометрии с позиционированием для открытия окна приложения по центру экрана
     root.geometry(f"{window_width}x{window_height}+{x}+{y}")
 
+    # Панель показателей
+    dashboard = Dashboard(root)
+    dashboard.pack(fill="x", padx=10, pady=(10, 0))
+
     # Кнопки меню действий
     tk.Label(root, text="Главное меню", font=("Arial", 14, "bold")).pack(pady=10)
 
@@ -50,9 +78,15 @@ def main():
     tk.Button(root, text="Работа с клиентами", command=show_clients_menu, width=30).pack(pady=5)
     tk.Button(root, text="Работа с товарами", command=show_product_menu, width=30).pack(pady=10)
     tk.Button(root, text="Аналитика", command=show_analysis_menu, width=30).pack(pady=10)
+    tk.Button(root, text="Резервная копия", command=create_backup, width=30).pack(pady=10)
 
     # Запуск приложения
+    start_watchdog(root)
+    dashboard.start()
     root.mainloop()
+    stop_watchdog()
+    stop_snapshot_schedule()
+    lifecycle.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
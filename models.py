@@ -18,12 +18,15 @@ class Client(Entity):
         Телефон.
     address : str
         Адрес доставки.
+    id : int, optional
+        ID клиента в базе данных (None для ещё не сохранённого клиента).
     """
-    def __init__(self, name, email, phone, address):
+    def __init__(self, name, email, phone, address, id=None):
         self.name = name
         self.email = email
         self.phone = phone
         self.address = address
+        self.id = id
 
 class Product(Entity):
     """Класс товара.
@@ -36,19 +39,23 @@ class Product(Entity):
         Цена товара.
     category : str
         Категория товара.
+    id : int, optional
+        ID товара в базе данных (None для ещё не сохранённого товара).
     """
-    def __init__(self, name, price, category="Общие"):
+    def __init__(self, name, price, category="Общие", id=None):
         self.name = name
         self.price = price
         self.category = category
+        self.id = id
 
 class Order(Entity):
     """Класс заказа.
 
     Parameters
     ----------
-    client_id : str
-        Имя или ID клиента.
+    client_id : int or str
+        ID клиента. Для совместимости допускается имя клиента: при
+        сохранении оно сопоставляется ID (см. `db.resolve_client_id`).
     products : list of Product
         Список купленных товаров.
     date : datetime, optional
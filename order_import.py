@@ -0,0 +1,242 @@
+"""
+Массовый импорт заказов из CSV.
+
+Поддерживаются два формата, определяемые по заголовку файла:
+
+* заказы — колонки ``client,products,date,total``, как в выгрузке
+  `db.export_orders_to_csv`; товары перечислены через запятую, пустая сумма
+  считается по ценам товаров;
+* позиции — колонки ``order,client,product,quantity,price,date``: каждая
+  строка описывает одну позицию, строки одного заказа (одинаковый ``order``)
+  идут подряд; ``quantity`` и ``price`` необязательны (1 и цена из справочника).
+
+Файл читается потоково. Имена клиентов и товаров сопоставляются со
+справочниками через словари, построенные одним запросом перед импортом;
+заказы вставляются пакетами, каждый пакет — отдельная транзакция.
+Заказы с неизвестными клиентами или товарами и некорректные строки
+пропускаются и попадают в отчёт.
+"""
+
+import csv
+import time
+from collections import Counter
+from datetime import date
+
+import db
+import leaderboard
+import sketches
+
+# Количество заказов в одной транзакции
+BATCH_SIZE = 10_000
+# Сколько описаний ошибок сохраняется в отчёте
+MAX_ERRORS = 100
+
+FORMAT_ORDERS = "orders"
+FORMAT_LINE_ITEMS = "line_items"
+FORMAT_COLUMNS = {
+    FORMAT_ORDERS: ("client", "products", "date"),
+    FORMAT_LINE_ITEMS: ("order", "client", "product", "date"),
+}
+
+
+class ImportFormatError(ValueError):
+    """Заголовок файла не соответствует ни одному из форматов импорта."""
+
+
+def detect_format(header):
+    """
+    Определяет формат файла по списку колонок заголовка.
+
+    Raises
+    ------
+    ImportFormatError
+        Если обязательных колонок нет.
+    """
+    columns = set(header or ())
+    for name, required in FORMAT_COLUMNS.items():
+        if columns.issuperset(required):
+            return name
+    raise ImportFormatError(
+        "Ожидаются колонки client,products,date,total или order,client,product,quantity,price,date")
+
+
+def load_lookups(conn):
+    """
+    Строит словари для сопоставления имён: клиент → ID (для однофамильцев —
+    наименьший ID, как в `db.resolve_client_id`) и товар → цена.
+    """
+    clients = dict(conn.execute("SELECT name, MIN(id) FROM clients GROUP BY name"))
+    prices = dict(conn.execute("SELECT name, MIN(price) FROM products GROUP BY name"))
+    return clients, prices
+
+
+class _Report:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.unresolved_clients = Counter()
+        self.unresolved_products = Counter()
+        self.errors = []
+
+    def error(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self, rows, elapsed):
+        return {
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "rows": rows,
+            "unresolved_clients": self.unresolved_clients,
+            "unresolved_products": self.unresolved_products,
+            "errors": self.errors,
+            "elapsed": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def _check_date(value):
+    value = value.strip()
+    date.fromisoformat(value)
+    return value
+
+
+def _unresolved(client, names, clients, prices, report):
+    """
+    Сопоставляет клиента и товары со справочниками.
+
+    Returns
+    -------
+    tuple of (int or None, str or None)
+        ID клиента и описание проблемы (None, если всё найдено).
+    """
+    problems = []
+    client_id = clients.get(client)
+    if client_id is None:
+        report.unresolved_clients[client] += 1
+        problems.append(f"неизвестный клиент «{client}»")
+    missing = [name for name in names if name not in prices]
+    for name in missing:
+        report.unresolved_products[name] += 1
+    if missing:
+        problems.append("неизвестные товары: " + ", ".join(missing))
+    elif not names:
+        problems.append("нет товаров")
+    return client_id, "; ".join(problems) or None
+
+
+def _order_rows(reader, clients, prices, report):
+    """Строки формата заказов → кортежи (client_id, products, date, total)."""
+    for line, row in enumerate(reader, start=2):
+        names = [name.strip() for name in (row["products"] or "").split(",") if name.strip()]
+        client_id, problem = _unresolved((row["client"] or "").strip(), names, clients, prices, report)
+        if problem:
+            report.error(line, problem)
+            continue
+        try:
+            day = _check_date(row["date"] or "")
+            total = (row.get("total") or "").strip()
+            total = float(total) if total else round(sum(prices[name] for name in names), 2)
+        except ValueError as e:
+            report.error(line, f"некорректное значение: {e}")
+            continue
+        yield client_id, ",".join(names), day, total
+
+
+def _grouped_line_items(reader):
+    """Группирует идущие подряд строки позиций с одинаковым order."""
+    line, key, rows = None, None, []
+    for number, row in enumerate(reader, start=2):
+        if rows and row["order"] != key:
+            yield line, rows
+            rows = []
+        if not rows:
+            line, key = number, row["order"]
+        rows.append(row)
+    if rows:
+        yield line, rows
+
+
+def _line_item_rows(reader, clients, prices, report):
+    """Строки формата позиций, сгруппированные по колонке order → заказы."""
+    for line, rows in _grouped_line_items(reader):
+        first = rows[0]
+        names = [(row["product"] or "").strip() for row in rows]
+        client_id, problem = _unresolved((first["client"] or "").strip(), names, clients, prices, report)
+        if problem:
+            report.error(line, f"заказ {first['order']}: {problem}")
+            continue
+        products, total = [], 0.0
+        try:
+            day = _check_date(first["date"] or "")
+            for name, row in zip(names, rows):
+                quantity = int(row.get("quantity") or 1)
+                if quantity < 1:
+                    raise ValueError(f"количество {quantity}")
+                price = (row.get("price") or "").strip()
+                total += (float(price) if price else prices[name]) * quantity
+                products.extend([name] * quantity)
+        except ValueError as e:
+            report.error(line, f"заказ {first['order']}: некорректное значение: {e}")
+            continue
+        yield client_id, ",".join(products), day, round(total, 2)
+
+
+@db.retry_on_busy
+def _insert_batch(batch):
+    with db.transaction() as tx:
+        tx.cursor.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (?, ?, ?, ?)", batch)
+        leaderboard.record_orders(tx.cursor, batch)
+        sketches.record_orders(tx.cursor, batch)
+
+
+def import_orders_from_csv(path, batch_size=BATCH_SIZE, encoding="utf-8-sig"):
+    """
+    Импортирует заказы из CSV-файла в формате заказов или позиций.
+
+    Parameters
+    ----------
+    path : str
+        Путь к CSV-файлу.
+    batch_size : int, optional
+        Количество заказов в одной транзакции.
+    encoding : str, optional
+        Кодировка файла.
+
+    Returns
+    -------
+    dict
+        Отчёт: imported (заказов добавлено), rejected (заказов отклонено),
+        rows (строк файла), unresolved_clients и unresolved_products
+        (Counter неизвестных имён с числом строк), errors (список (номер
+        строки, описание), не больше `MAX_ERRORS`), elapsed (сек.) и
+        rows_per_sec.
+
+    Raises
+    ------
+    ImportFormatError
+        Если формат файла не распознан.
+    """
+    started = time.perf_counter()
+    with db.transaction() as tx:
+        db.create_schema(tx.cursor)
+        clients, prices = load_lookups(tx.conn)
+
+    report = _Report()
+    with open(path, newline="", encoding=encoding) as f:
+        reader = csv.DictReader(f)
+        file_format = detect_format(reader.fieldnames)
+        parse = _order_rows if file_format == FORMAT_ORDERS else _line_item_rows
+        batch = []
+        for order in parse(reader, clients, prices, report):
+            batch.append(order)
+            if len(batch) >= batch_size:
+                _insert_batch(batch)
+                report.imported += len(batch)
+                batch = []
+        if batch:
+            _insert_batch(batch)
+            report.imported += len(batch)
+        rows = reader.line_num - 1
+    return report.as_dict(rows, time.perf_counter() - started)
@@ -0,0 +1,329 @@
+"""
+Работа с несколькими магазинами: у каждого магазина (шарда) своя база данных.
+
+Список магазинов хранится в JSON-файле `SHARDS_FILE` (переменная окружения
+`ECOM_SHARDS`) вида ``{"Магазин": "путь/к/базе.db", ...}``; относительные
+пути считаются от каталога файла. Интерфейс работает с одним магазином
+(`use_store`, переменная окружения `ECOM_STORE`), а отчёты по всем
+магазинам строит `ShardCoordinator`: запросы к шардам выполняются
+параллельно в пуле процессов или потоков, а частичные агрегаты
+объединяются на координаторе.
+
+Частичные агрегаты объединяются так, чтобы результат совпадал с расчётом
+по одной общей базе: количества и суммы в копейках складываются по ключу,
+ТОП клиентов выбирается из ТОП-N каждого магазина (ID клиентов у магазинов
+свои, поэтому ключи не пересекаются), а ТОП товаров — по полным счётчикам
+товаров, сложенным по названию: один товар продаётся во многих магазинах,
+и ТОП-N отдельных магазинов для точного ответа недостаточно.
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+import analysis
+import db
+import leaderboard
+
+SHARDS_FILE = os.environ.get("ECOM_SHARDS", "shards.json")
+STORE_ENV = "ECOM_STORE"
+
+EXECUTOR_PROCESS = "process"
+EXECUTOR_THREAD = "thread"
+EXECUTORS = {EXECUTOR_PROCESS: ProcessPoolExecutor, EXECUTOR_THREAD: ThreadPoolExecutor}
+
+
+def load_shards(path=None):
+    """
+    Загружает список магазинов.
+
+    Параметры
+    ----------
+    path : str, optional
+        Путь к JSON-файлу; по умолчанию `SHARDS_FILE`.
+
+    Возвращает
+    ----------
+    dict
+        Словарь {магазин: путь к базе}; пустой, если файла нет.
+    """
+    path = path or SHARDS_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        shards = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    return {store: os.path.join(base, db_path) for store, db_path in shards.items()}
+
+
+def use_store(store, shards=None):
+    """
+    Переключает слой данных (`db.DB_NAME`) на базу магазина.
+
+    Raises
+    ------
+    KeyError
+        Если магазин не найден в списке.
+    """
+    shards = load_shards() if shards is None else shards
+    if store not in shards:
+        raise KeyError(f"Магазин не найден: {store}")
+    db.DB_NAME = shards[store]
+    return db.DB_NAME
+
+
+# ========== Запросы к одному шарду (выполняются в пуле) ==========
+def _connect(path):
+    return sqlite3.connect(path, timeout=db.BUSY_TIMEOUT)
+
+
+def _shard_aggregate(path, func, columns, date_from=None, date_to=None):
+    """Частичный агрегат `analysis.aggregate_orders` по базе одного магазина."""
+    conn = _connect(path)
+    try:
+        return analysis.aggregate_orders(func, columns, conn=conn, date_from=date_from, date_to=date_to)
+    finally:
+        conn.close()
+
+
+def _shard_client_stats(path):
+    conn = _connect(path)
+    try:
+        merged = analysis.aggregate_orders(analysis._client_partial, "client_id, total", conn=conn)
+        return analysis._client_result(merged, analysis.client_names(conn))
+    finally:
+        conn.close()
+
+
+def _shard_top_clients(path, limit, by):
+    conn = _connect(path)
+    try:
+        return leaderboard.top_clients(conn, limit, by)
+    finally:
+        conn.close()
+
+
+def _shard_product_totals(path):
+    conn = _connect(path)
+    try:
+        return conn.execute("SELECT product, quantity, order_count FROM product_totals").fetchall()
+    finally:
+        conn.close()
+
+
+def _shard_summary(path):
+    """Заказов, выручка в копейках и клиентов по счётчикам `client_totals`."""
+    conn = _connect(path)
+    try:
+        return conn.execute("SELECT COALESCE(SUM(order_count), 0), COALESCE(SUM(revenue_kopecks), 0), "
+                            "COUNT(*) FROM client_totals").fetchone()
+    finally:
+        conn.close()
+
+
+def _shard_orders_page(path, sort, descending, after, limit, filters):
+    conn = _connect(path)
+    try:
+        return db.load_orders_page(sort, descending, after, limit, conn=conn, **filters)
+    finally:
+        conn.close()
+
+
+def _sort_value(value):
+    # NULL в SQLite меньше любого значения
+    return (value is not None, value)
+
+
+class ShardCoordinator:
+    """Выполняет чтение и агрегаты по всем магазинам параллельно.
+
+    Parameters
+    ----------
+    shards : dict, optional
+        Словарь {магазин: путь к базе}; по умолчанию `load_shards()`.
+    workers : int, optional
+        Размер пула; по умолчанию — число магазинов, но не больше числа ядер.
+    executor : str, optional
+        "process" — пул процессов (агрегаты pandas масштабируются по ядрам),
+        "thread" — пул потоков (дешевле запуск, SQLite отпускает GIL на
+        время выполнения запроса).
+    """
+    def __init__(self, shards=None, workers=None, executor=EXECUTOR_PROCESS):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Неизвестный тип пула: {executor}")
+        self.shards = dict(load_shards() if shards is None else shards)
+        self.workers = workers or max(1, min(len(self.shards), os.cpu_count() or 1))
+        self.executor = executor
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Останавливает пул."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _run(self, calls):
+        """
+        Выполняет вызовы {магазин: (функция, аргументы)} и возвращает
+        {магазин: результат} в порядке списка магазинов.
+        """
+        if self.workers == 1 or len(calls) < 2:
+            return {store: func(*args) for store, (func, args) in calls.items()}
+        if self._pool is None:
+            self._pool = EXECUTORS[self.executor](max_workers=self.workers)
+        futures = {store: self._pool.submit(func, *args) for store, (func, args) in calls.items()}
+        return {store: future.result() for store, future in futures.items()}
+
+    def _map(self, func, *args):
+        return self._run({store: (func, (path,) + args) for store, path in self.shards.items()})
+
+    def aggregate(self, func, columns, date_from=None, date_to=None):
+        """
+        Вычисляет агрегат `analysis.aggregate_orders` по всем магазинам.
+
+        Возвращает
+        ----------
+        pandas.Series, pandas.DataFrame or None
+            Сумма частичных агрегатов магазинов по ключу; None, если заказов нет.
+        """
+        return analysis._merge_partials(self._map(_shard_aggregate, func, columns, date_from, date_to).values())
+
+    def daily_order_counts(self, year, month):
+        """Количество заказов по дням месяца (см. `analysis.daily_order_counts`)."""
+        date_from, date_to = f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-31"
+        return self.aggregate(partial(analysis._daily_partial, year=year, month=month), "date", date_from, date_to)
+
+    def monthly_sales(self):
+        """Сумма продаж в рублях по месяцам (см. `analysis.monthly_sales`)."""
+        kopecks = self.aggregate(analysis._monthly_partial, "date, total")
+        if kopecks is None:
+            return None
+        return (kopecks / 100).rename("total")
+
+    def client_stats(self):
+        """
+        Статистика по клиентам всех магазинов.
+
+        Возвращает
+        ----------
+        pandas.DataFrame
+            Колонки 'Магазин' и колонки `analysis.client_stats_from_db`.
+        """
+        frames = [frame.assign(Магазин=store) for store, frame in self._map(_shard_client_stats).items()]
+        if not frames:
+            return analysis._client_result(None).assign(Магазин=None)
+        stats = pd.concat(frames, ignore_index=True)
+        return stats[["Магазин", "Клиент", "Количество заказов", "Общая сумма"]]
+
+    def top_clients(self, limit=5, by="orders"):
+        """
+        Лучшие клиенты по всем магазинам.
+
+        Возвращает
+        ----------
+        list of tuple
+            Кортежи (магазин, client_id, имя, заказов, сумма в рублях, последняя дата).
+        """
+        if by not in leaderboard.CLIENT_ORDERINGS:
+            raise ValueError(f"Неизвестный порядок: {by}")
+        column = 2 if by == "orders" else 3
+        rows = [(store,) + tuple(row) for store, top in self._map(_shard_top_clients, limit, by).items()
+                for row in top]
+        position = {store: i for i, store in enumerate(self.shards)}
+        return heapq.nsmallest(limit, rows, key=lambda row: (-row[column + 1], position[row[0]], row[1]))
+
+    def top_products(self, limit=5, by="quantity"):
+        """
+        Самые продаваемые товары по всем магазинам.
+
+        Возвращает
+        ----------
+        list of tuple
+            Кортежи (товар, единиц, заказов).
+        """
+        if by not in leaderboard.PRODUCT_ORDERINGS:
+            raise ValueError(f"Неизвестный порядок: {by}")
+        totals = {}
+        for rows in self._map(_shard_product_totals).values():
+            for product, quantity, orders in rows:
+                current = totals.setdefault(product, [0, 0])
+                current[0] += quantity
+                current[1] += orders
+        column = 0 if by == "quantity" else 1
+        top = heapq.nsmallest(limit, totals.items(), key=lambda item: (-item[1][column], item[0]))
+        return [(product, quantity, orders) for product, (quantity, orders) in top]
+
+    def summary(self):
+        """
+        Сводка по магазинам: заказы, клиенты, выручка и средний чек.
+
+        Возвращает
+        ----------
+        pandas.DataFrame
+            Строка на магазин и итоговая строка "Итого"; средний чек итога
+            считается по суммарной выручке, а не как среднее по магазинам.
+        """
+        rows = [(store,) + tuple(row) for store, row in self._map(_shard_summary).items()]
+        rows.append(("Итого", sum(r[1] for r in rows), sum(r[2] for r in rows), sum(r[3] for r in rows)))
+        df = pd.DataFrame(rows, columns=["Магазин", "Заказов", "Выручка", "Клиентов"])
+        df["Выручка"] = df["Выручка"] / 100
+        df["Средний чек"] = (df["Выручка"] / df["Заказов"].where(df["Заказов"] > 0)).round(2).fillna(0.0)
+        return df[["Магазин", "Заказов", "Клиентов", "Выручка", "Средний чек"]]
+
+    def load_orders_page(self, sort="date", descending=False, after=None, limit=100, **filters):
+        """
+        Загружает страницу заказов всех магазинов (см. `db.load_orders_page`).
+
+        Каждый магазин отдаёт до `limit` заказов после своего ключа, страницы
+        сливаются по (значение сортировки, порядок магазина в списке, id). Ключ следующей
+        страницы — словарь ключей магазинов.
+
+        Возвращает
+        ----------
+        tuple of (list of dict, dict or None)
+            Заказы с дополнительным полем "store" и ключ следующей страницы
+            (None, если страница последняя).
+        """
+        after = after or {}
+        pages = self._run({store: (_shard_orders_page, (path, sort, descending, after.get(store), limit, filters))
+                           for store, path in self.shards.items()})
+        orders = [dict(order, store=store) for store, (page, _) in pages.items() for order in page]
+        position = {store: i for i, store in enumerate(self.shards)}
+        orders.sort(key=lambda o: (_sort_value(o[sort]), position[o["store"]], o["id"]), reverse=descending)
+        page = orders[:limit]
+
+        next_after = dict(after)
+        for order in page:
+            next_after[order["store"]] = (order[sort], order["id"])
+        more = len(orders) > limit or any(key is not None for _, key in pages.values())
+        return page, (next_after if more else None)
+
+
+def show_store_summary():
+    """
+    Отображает сводку по всем магазинам из `SHARDS_FILE`.
+    """
+    from tkinter import messagebox
+
+    shards = load_shards()
+    if not shards:
+        messagebox.showinfo("Сводка по магазинам", f"Магазины не настроены ({SHARDS_FILE})")
+        return
+    try:
+        with ShardCoordinator(shards) as coordinator:
+            df = coordinator.summary()
+    except (sqlite3.Error, OSError) as e:
+        messagebox.showerror("Ошибка", f"Не удалось построить сводку: {e}")
+        return
+    analysis.show_dataframe_window("store_summary", "Сводка по магазинам", df, width=600)
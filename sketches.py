@@ -0,0 +1,515 @@
+"""
+Вероятностные скетчи заказов по дням для приближённой аналитики.
+
+Для каждого дня таблица `order_sketches` хранит количество заказов и три
+объединяемых (mergeable) скетча фиксированного размера:
+
+* `HyperLogLog` по ID клиентов — число различных клиентов. Стандартная
+  относительная ошибка 1,04/√m, где m = 2^`HLL_PRECISION` регистров: для
+  m = 4096 — около 1,6% (в 95% случаев — не больше 3,3%). Пока клиентов
+  намного меньше m, оценка (линейный подсчёт) практически точна.
+* `KllSketch` по суммам заказов и по числу товаров в заказе — квантили
+  (медиана, p90, p99). Ошибка по рангу для k = `KLL_K` = 200 — не больше
+  ~1,65% с вероятностью 99%: возвращаемое значение лежит между истинными
+  квантилями уровней q ± 0,0165. Пока в скетче меньше k значений, квантили
+  точные.
+
+Скетчи дня обновляются в той же транзакции, что и вставка заказа
+(`db.insert_order`, `db.Transaction.save_orders`, импорт заказов). Запросы
+за любой диапазон дат объединяют скетчи дней и не читают заказы.
+
+Удаление из скетча невозможно, поэтому удаление, изменение и перенос заказа
+в архив только помечают день устаревшим (триггеры на `orders`). Устаревшие
+дни пересобираются по заказам — включая архивные разделы — при первом
+запросе, который их затрагивает (`refresh_stale`).
+
+Запуск ``python sketches.py [--from ГГГГ-ММ-ДД] [--to ГГГГ-ММ-ДД]`` печатает
+сводку за период.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sqlite3
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+
+# Число регистров HyperLogLog: 2^HLL_PRECISION
+HLL_PRECISION = 12
+# Параметр точности KLL: размер верхнего уровня
+KLL_K = 200
+# Во сколько раз уменьшается ёмкость каждого следующего уровня KLL (сверху вниз)
+KLL_C = 2 / 3
+# Квантили сводки
+QUANTILES = (0.5, 0.9, 0.99)
+
+_DAY = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class HyperLogLog:
+    """Оценка числа различных значений.
+
+    Parameters
+    ----------
+    precision : int, optional
+        Число бит индекса регистра; регистров 2^precision.
+    """
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @property
+    def relative_error(self):
+        """Стандартная относительная ошибка оценки."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, value):
+        # Хеш не зависит от процесса (в отличие от hash()), поэтому скетч можно хранить
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Объединяет с другим скетчем той же точности; возвращает self."""
+        if other.precision != self.precision:
+            raise ValueError("Скетчи HyperLogLog разной точности")
+        merged = np.maximum(np.frombuffer(self.registers, dtype=np.uint8),
+                            np.frombuffer(other.registers, dtype=np.uint8))
+        self.registers = bytearray(merged.tobytes())
+        return self
+
+    def count(self):
+        """Возвращает оценку числа различных значений."""
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        m = len(registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.exp2(-registers.astype(np.float64)).sum()
+        zeros = m - np.count_nonzero(registers)
+        if estimate <= 2.5 * m and zeros:
+            # Малые значения: линейный подсчёт по пустым регистрам
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        # Регистры малых дней почти все нулевые и хорошо сжимаются
+        return zlib.compress(bytes([self.precision]) + bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        raw = zlib.decompress(data)
+        sketch = cls(raw[0])
+        sketch.registers = bytearray(raw[1:])
+        return sketch
+
+
+class KllSketch:
+    """Квантили потока значений (скетч KLL).
+
+    Уровень h хранит значения с весом 2^h. Переполненный уровень
+    сортируется, и каждое второе значение (со случайным сдвигом)
+    переносится на уровень выше.
+
+    Parameters
+    ----------
+    k : int, optional
+        Параметр точности (см. описание модуля).
+    seed : int, optional
+        Начальное значение генератора случайных сдвигов.
+    """
+    def __init__(self, k=KLL_K, seed=None):
+        self.k = k
+        self.count = 0
+        self.levels = [[]]
+        self._rng = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.k * KLL_C ** depth)) + 1
+
+    def _grow(self):
+        self.levels.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for h in range(len(self.levels)):
+                items = self.levels[h]
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self._grow()
+                items.sort()
+                even = len(items) - len(items) % 2
+                self.levels[h + 1].extend(items[self._rng.getrandbits(1):even:2])
+                self.levels[h] = items[even:]
+                self._size = sum(len(level) for level in self.levels)
+                break
+
+    def merge(self, other):
+        """Объединяет с другим скетчем; возвращает self."""
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.count += other.count
+        self._size = sum(len(level) for level in self.levels)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """
+        Возвращает приближённые квантили.
+
+        Parameters
+        ----------
+        qs : sequence of float
+            Уровни от 0 до 1.
+
+        Returns
+        -------
+        list
+            Значения из потока (None для пустого скетча).
+        """
+        if not self.count:
+            return [None] * len(qs)
+        values = np.concatenate([np.asarray(level, dtype=np.float64) for level in self.levels])
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, [q * cumulative[-1] for q in qs], side="left")
+        return [values[min(i, len(values) - 1)].item() for i in positions]
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def to_json(self):
+        return json.dumps({"k": self.k, "n": self.count, "levels": self.levels}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketch = cls(data["k"])
+        sketch.count = data["n"]
+        sketch.levels = data["levels"]
+        sketch._size = sum(len(level) for level in sketch.levels)
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.levels)))
+        return sketch
+
+
+class OrderSketch:
+    """Скетчи заказов одного дня или объединённого диапазона."""
+    def __init__(self):
+        self.orders = 0
+        self.clients = HyperLogLog()
+        self.totals = KllSketch()
+        self.items = KllSketch()
+
+    def add(self, client_id, products, total):
+        self.orders += 1
+        if client_id is not None:
+            self.clients.add(client_id)
+        if total is not None:
+            self.totals.update(float(total))
+        self.items.update(sum(1 for name in (products or "").split(",") if name))
+
+    def merge(self, other):
+        self.orders += other.orders
+        self.clients.merge(other.clients)
+        self.totals.merge(other.totals)
+        self.items.merge(other.items)
+        return self
+
+    def to_row(self):
+        return self.orders, self.clients.to_bytes(), self.totals.to_json(), self.items.to_json()
+
+    @classmethod
+    def from_row(cls, orders, clients, totals, items):
+        sketch = cls()
+        sketch.orders = orders
+        sketch.clients = HyperLogLog.from_bytes(clients)
+        sketch.totals = KllSketch.from_json(totals)
+        sketch.items = KllSketch.from_json(items)
+        return sketch
+
+    def summary(self, qs=QUANTILES):
+        """
+        Returns
+        -------
+        dict
+            orders — заказов; clients — оценка числа различных клиентов;
+            totals и items — словари {q: квантиль} сумм заказов и числа
+            товаров в заказе.
+        """
+        return {
+            "orders": self.orders,
+            "clients": self.clients.count() if self.orders else 0,
+            "totals": dict(zip(qs, self.totals.quantiles(qs))),
+            "items": dict(zip(qs, self.items.quantiles(qs))),
+        }
+
+
+def _day(value):
+    """День заказа "ГГГГ-ММ-ДД" или None для пустой и некорректной даты."""
+    value = str(value or "")[:10]
+    return value if _DAY.fullmatch(value) else None
+
+
+def create_sketch_tables(cursor):
+    """
+    Создаёт таблицу скетчей и триггеры, помечающие дни устаревшими.
+
+    Если таблица создаётся впервые, все дни с заказами (в том числе
+    архивными) помечаются устаревшими и будут собраны при первом запросе.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    """
+    existed = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_sketches'").fetchone()
+    cursor.execute("""CREATE TABLE IF NOT EXISTS order_sketches (
+        day TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        clients BLOB,
+        totals TEXT,
+        items TEXT,
+        stale INTEGER NOT NULL DEFAULT 0
+    )""")
+    # stale увеличивается при каждом изменении: пересборка сбрасывает его, только если
+    # за время пересборки день не изменился снова
+    mark = """INSERT INTO order_sketches (day, stale) SELECT substr({row}.date, 1, 10), 1
+            WHERE {row}.date IS NOT NULL ON CONFLICT (day) DO UPDATE SET stale = stale + 1"""
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS order_sketches_delete AFTER DELETE ON orders BEGIN
+            {mark.format(row="OLD")};
+        END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS order_sketches_update
+        AFTER UPDATE OF client_id, products, date, total ON orders BEGIN
+            {mark.format(row="OLD")};
+            {mark.format(row="NEW")};
+        END""")
+    if not existed:
+        mark_stale(cursor)
+
+
+def mark_stale(cursor):
+    """
+    Помечает устаревшими все дни с заказами рабочей таблицы и архивов.
+
+    Используется после вставки заказов в обход `record_orders`
+    (например, генератором тестовой базы).
+    """
+    days = {_day(row[0]) for row in cursor.execute("SELECT DISTINCT substr(date, 1, 10) FROM orders")}
+    try:
+        partitions = cursor.execute("SELECT min_date, max_date FROM archive_partitions").fetchall()
+    except sqlite3.OperationalError:
+        # Архивов ещё не было — реестр не создан
+        partitions = []
+    for min_date, max_date in partitions:
+        first, last = _day(min_date), _day(max_date)
+        if first and last:
+            day = date.fromisoformat(first)
+            while day.isoformat() <= last:
+                days.add(day.isoformat())
+                day += timedelta(days=1)
+    days.discard(None)
+    cursor.executemany("""INSERT INTO order_sketches (day, stale) VALUES (?, 1)
+        ON CONFLICT (day) DO UPDATE SET stale = stale + 1""", [(day,) for day in sorted(days)])
+
+
+def record_orders(cursor, rows):
+    """
+    Добавляет новые заказы в скетчи их дней в рамках текущей транзакции.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор открытого подключения.
+    rows : iterable of tuple
+        Заказы (client_id, products, date, total) в формате таблицы `orders`.
+    """
+    by_day = {}
+    for client_id, products, day, total in rows:
+        day = _day(day)
+        if day is not None:
+            by_day.setdefault(day, []).append((client_id, products, total))
+    for day, orders in by_day.items():
+        row = cursor.execute("SELECT orders, clients, totals, items, stale FROM order_sketches WHERE day = ?",
+                             (day,)).fetchone()
+        if row is not None and row[4]:
+            # День всё равно будет пересобран по заказам. Версия увеличивается: пересборка,
+            # начатая до этой записи, не должна сбросить пометку
+            cursor.execute("UPDATE order_sketches SET stale = stale + 1 WHERE day = ?", (day,))
+            continue
+        sketch = OrderSketch.from_row(*row[:4]) if row is not None else OrderSketch()
+        for order in orders:
+            sketch.add(*order)
+        cursor.execute("""INSERT INTO order_sketches (day, orders, clients, totals, items) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (day) DO UPDATE SET orders = excluded.orders, clients = excluded.clients,
+                totals = excluded.totals, items = excluded.items""", (day, *sketch.to_row()))
+
+
+def _runs(days):
+    """Разбивает отсортированные дни на отрезки подряд идущих дней."""
+    runs = []
+    for day in days:
+        if runs and date.fromisoformat(runs[-1][1]) + timedelta(days=1) == date.fromisoformat(day):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _range_args(date_from, date_to):
+    # Импорт внутри функции: модуль db сам импортирует sketches
+    from db import DATE_END
+    return date_from or "", (date_to or "9999-12-31") + DATE_END
+
+
+def refresh_stale(conn, date_from=None, date_to=None):
+    """
+    Пересобирает устаревшие дни диапазона по заказам, включая архивные разделы.
+
+    Подключение не должно находиться внутри транзакции (архивные разделы
+    подключаются командой ATTACH); изменения фиксируются.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе данных.
+    date_from, date_to : str, optional
+        Диапазон дней "ГГГГ-ММ-ДД" включительно.
+
+    Returns
+    -------
+    int
+        Количество пересобранных дней.
+    """
+    stale = conn.execute("SELECT day, stale FROM order_sketches WHERE stale > 0 AND day >= ? AND day < ?",
+                         _range_args(date_from, date_to)).fetchall()
+    if not stale:
+        return 0
+    from archive import iter_order_schemas
+    rebuilt = {day: OrderSketch() for day, _ in stale}
+    for first, last in _runs(sorted(rebuilt)):
+        bounds = _range_args(first, last)
+        for schema in iter_order_schemas(conn, *bounds):
+            for client_id, products, day, total in conn.execute(
+                    f"SELECT client_id, products, date, total FROM {schema}.orders WHERE date >= ? AND date < ?",
+                    bounds):
+                sketch = rebuilt.get(_day(day))
+                if sketch is not None:
+                    sketch.add(client_id, products, total)
+    with conn:
+        for day, version in stale:
+            sketch = rebuilt[day]
+            if sketch.orders:
+                conn.execute("""UPDATE order_sketches SET orders = ?, clients = ?, totals = ?, items = ?, stale = 0
+                    WHERE day = ? AND stale = ?""", (*sketch.to_row(), day, version))
+            else:
+                conn.execute("DELETE FROM order_sketches WHERE day = ? AND stale = ?", (day, version))
+    return len(stale)
+
+
+def iter_day_sketches(conn, date_from=None, date_to=None):
+    """
+    Перебирает скетчи дней диапазона, предварительно пересобрав устаревшие.
+
+    Yields
+    ------
+    tuple of (str, OrderSketch)
+        День и его скетч в порядке возрастания дат.
+    """
+    refresh_stale(conn, date_from, date_to)
+    rows = conn.execute("""SELECT day, orders, clients, totals, items FROM order_sketches
+        WHERE day >= ? AND day < ? AND stale = 0 ORDER BY day""", _range_args(date_from, date_to))
+    for day, *row in rows:
+        yield day, OrderSketch.from_row(*row)
+
+
+def range_sketch(conn, date_from=None, date_to=None):
+    """
+    Объединяет скетчи дней диапазона, не читая заказы.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе данных.
+    date_from, date_to : str, optional
+        Диапазон дней "ГГГГ-ММ-ДД" включительно.
+
+    Returns
+    -------
+    OrderSketch
+        Объединённый скетч (см. `OrderSketch.summary`).
+    """
+    merged = OrderSketch()
+    for _, sketch in iter_day_sketches(conn, date_from, date_to):
+        merged.merge(sketch)
+    return merged
+
+
+def distinct_clients(conn, date_from=None, date_to=None, by="day"):
+    """
+    Оценивает число различных клиентов по дням или месяцам.
+
+    Parameters
+    ----------
+    by : str, optional
+        "day" — по дням, "month" — по месяцам ("ГГГГ-ММ").
+
+    Returns
+    -------
+    dict
+        {период: оценка числа клиентов} в порядке возрастания периодов.
+    """
+    if by not in ("day", "month"):
+        raise ValueError(f"Неизвестный период: {by}")
+    width = 10 if by == "day" else 7
+    buckets = {}
+    for day, sketch in iter_day_sketches(conn, date_from, date_to):
+        key = day[:width]
+        if key in buckets:
+            buckets[key].merge(sketch.clients)
+        else:
+            buckets[key] = sketch.clients
+    return {key: hll.count() for key, hll in buckets.items()}
+
+
+def main():
+    import db
+    from contextlib import closing
+
+    parser = argparse.ArgumentParser(description="Приближённая сводка заказов по скетчам")
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--from", dest="date_from")
+    parser.add_argument("--to", dest="date_to")
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    with closing(db.connect()) as conn:
+        summary = range_sketch(conn, args.date_from, args.date_to).summary()
+    print(f"Заказов: {summary['orders']}, клиентов: ~{summary['clients']}")
+    for name, title in (("totals", "Сумма заказа"), ("items", "Товаров в заказе")):
+        print(f"{title}: " + ", ".join(f"p{round(q * 100)} {value}" for q, value in summary[name].items()))
+
+
+if __name__ == "__main__":
+    main()
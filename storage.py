@@ -0,0 +1,446 @@
+"""
+Хранилища данных для слоя `db`.
+
+Все функции `db` получают подключения через `db.connect()`, который
+обращается к текущему хранилищу (`get_backend`). Хранилище выбирается
+переменной окружения `ECOM_STORAGE` или вызовом `use_backend`:
+
+* ``sqlite`` или ``sqlite:путь.db`` — файл SQLite (по умолчанию
+  `db.DB_NAME`);
+* ``sqlite-memory`` или ``sqlite-memory:имя`` — общая база SQLite в памяти
+  (``file:имя?mode=memory&cache=shared``): все подключения процесса видят
+  одни данные, пока хранилище открыто; диск не используется;
+* ``python`` — хранилище на словарях и отсортированных списках без SQL для
+  быстрых симуляций. Поддерживает функции `db` для клиентов, товаров и
+  заказов (см. `PythonBackend`) и пакетное чтение заказов в `analysis`;
+  функции, которым нужен SQL (архив, журнал изменений, счётчики ТОП-N,
+  HTTP API), вызывают `UnsupportedOperation`.
+
+Для SQLite-хранилищ `db.DB_NAME` указывает на их базу, поэтому модули,
+открывающие подключения по пути (`cache`, `writer`, `async_db`), работают
+с тем же хранилищем. Базу в памяти нельзя читать из других процессов:
+параметр `processes` аналитики с ней не используется.
+"""
+
+import bisect
+import functools
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from models import Client, Product
+
+STORAGE_ENV = "ECOM_STORAGE"
+DEFAULT_STORAGE = "sqlite"
+
+_backend = None
+
+
+class UnsupportedOperation(NotImplementedError):
+    """Операция недоступна в текущем хранилище."""
+
+
+def _db():
+    # Импорт внутри функции: модуль db сам импортирует storage
+    import db
+    return db
+
+
+class SQLiteBackend:
+    """Файл базы данных SQLite.
+
+    Parameters
+    ----------
+    path : str, optional
+        Путь к базе. Если не задан, используется `db.DB_NAME`.
+    """
+    kind = "sqlite"
+    sql = True
+
+    def __init__(self, path=None):
+        self.location = path
+
+    def connect(self):
+        """Открывает подключение к базе `db.DB_NAME` (пути и URI ``file:``)."""
+        db = _db()
+        return sqlite3.connect(db.DB_NAME, timeout=db.BUSY_TIMEOUT, uri=True)
+
+    def close(self):
+        pass
+
+
+class SharedMemoryBackend(SQLiteBackend):
+    """Общая база SQLite в памяти процесса.
+
+    База существует, пока открыто хотя бы одно подключение к ней, поэтому
+    хранилище держит собственное подключение до вызова `close`.
+
+    Parameters
+    ----------
+    name : str, optional
+        Имя базы: хранилища с одинаковым именем разделяют данные.
+    """
+    kind = "sqlite-memory"
+
+    def __init__(self, name="ecom"):
+        super().__init__(memory_uri(name))
+        self._keeper = sqlite3.connect(self.location, uri=True, check_same_thread=False)
+
+    def close(self):
+        """Закрывает базу; данные удаляются, когда закрыты все её подключения."""
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+
+
+def memory_uri(name):
+    """Возвращает URI общей базы SQLite в памяти с указанным именем."""
+    return f"file:{name}?mode=memory&cache=shared"
+
+
+def _sort_key(value, order_id):
+    # NULL в SQLite меньше любого значения
+    return (value is not None, value), order_id
+
+
+class PythonBackend:
+    """Хранилище на словарях Python для симуляций.
+
+    Клиенты, товары и заказы хранятся в словарях по ID (в порядке
+    добавления, то есть по возрастанию ID), для постраничного просмотра
+    поддерживаются отсортированные списки ключей (значение, id) по каждой
+    колонке сортировки. Методы повторяют сигнатуры и результаты
+    одноимённых функций `db`, а `transaction` — единицу работы
+    `db.transaction` (методы записи `db.Transaction`).
+    """
+    kind = "python"
+    sql = False
+
+    def __init__(self):
+        self.clients = {}
+        self.products = {}
+        self.orders = {}
+        self._sorted = {"date": [], "total": []}
+        self._last_id = {"clients": 0, "products": 0, "orders": 0}
+        self._lock = threading.RLock()
+
+    def connect(self):
+        raise UnsupportedOperation("Хранилище python не поддерживает SQL-подключения")
+
+    def close(self):
+        pass
+
+    def _next_id(self, table):
+        self._last_id[table] += 1
+        return self._last_id[table]
+
+    def _changed(self):
+        import cache
+        cache.bump_version()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Единица работы: при исключении внутри блока все изменения отменяются.
+
+        На время блока хранилище заблокировано для других потоков.
+
+        Yields
+        ------
+        PythonBackend
+            Само хранилище: его методы записи совпадают с `db.Transaction`.
+        """
+        with self._lock:
+            snapshot = (dict(self.clients), dict(self.products), dict(self.orders),
+                        {column: list(keys) for column, keys in self._sorted.items()}, dict(self._last_id))
+            try:
+                yield self
+            except BaseException:
+                self.clients, self.products, self.orders, self._sorted, self._last_id = snapshot
+                self._changed()
+                raise
+
+    # ---------- Клиенты ----------
+    def initialize_db(self):
+        pass
+
+    def add_client(self, name, email, phone, address):
+        with self._lock:
+            client_id = self._next_id("clients")
+            self.clients[client_id] = Client(name, email, phone, address, client_id)
+        self._changed()
+        return client_id
+
+    def save_client(self, client):
+        return self.add_client(client.name, client.email, client.phone, client.address)
+
+    def load_clients(self):
+        with self._lock:
+            return [Client(c.name, c.email, c.phone, c.address, c.id) for c in self.clients.values()]
+
+    def delete_client_by_name(self, name, with_orders=False):
+        with self._lock:
+            return self._delete_clients([c.id for c in self.clients.values() if c.name == name], with_orders)
+
+    def delete_client_by_id(self, client_id, with_orders=False):
+        with self._lock:
+            return self._delete_clients([client_id] if client_id in self.clients else [], with_orders) > 0
+
+    def _delete_clients(self, client_ids, with_orders):
+        if with_orders:
+            for order_id in [o for o, row in self.orders.items() if row[0] in client_ids]:
+                self.delete_order_by_id(order_id)
+        for client_id in client_ids:
+            del self.clients[client_id]
+        self._changed()
+        return len(client_ids)
+
+    def client_names(self):
+        with self._lock:
+            return {c.id: c.name for c in self.clients.values()}
+
+    def _resolve_client_id(self, name):
+        for client in self.clients.values():
+            if client.name == name:
+                return client.id
+        client_id = self._next_id("clients")
+        self.clients[client_id] = Client(name, None, None, None, client_id)
+        return client_id
+
+    # ---------- Товары ----------
+    def save_product(self, product):
+        with self._lock:
+            product_id = self._next_id("products")
+            self.products[product_id] = Product(product.name, product.price, product.category, product_id)
+        self._changed()
+        return product_id
+
+    def load_products(self):
+        with self._lock:
+            return [Product(p.name, p.price, p.category, p.id) for p in self.products.values()]
+
+    def delete_product_by_id(self, product_id):
+        with self._lock:
+            found = self.products.pop(product_id, None) is not None
+        self._changed()
+        return found
+
+    # ---------- Заказы ----------
+    def save_order(self, order):
+        with self._lock:
+            client_id = order.client_id
+            if isinstance(client_id, str):
+                client_id = self._resolve_client_id(client_id)
+            order_id = self._next_id("orders")
+            row = (client_id, ",".join(p.name for p in order.products), str(order.date), order.total)
+            self.orders[order_id] = row
+            bisect.insort(self._sorted["date"], _sort_key(row[2], order_id))
+            bisect.insort(self._sorted["total"], _sort_key(row[3], order_id))
+        self._changed()
+        return order_id
+
+    def save_orders(self, orders):
+        with self._lock:
+            return [self.save_order(order) for order in orders]
+
+    def _order_dict(self, order_id):
+        client_id, products, day, total = self.orders[order_id]
+        client = self.clients.get(client_id)
+        return {"id": order_id, "client": client.name if client else None, "client_id": client_id,
+                "products": products, "date": day, "total": total}
+
+    def load_orders(self, date_from=None, date_to=None):
+        with self._lock:
+            return [self._order_dict(order_id) for order_id in self._order_ids(date_from, date_to)]
+
+    def _order_ids(self, date_from=None, date_to=None):
+        if date_from is None and date_to is None:
+            return list(self.orders)
+        keys = self._sorted["date"]
+        start = bisect.bisect_left(keys, ((True, date_from or ""), 0))
+        # Граница как в `archive.date_filter`: date < date_to + DATE_END
+        end = bisect.bisect_left(keys, ((True, date_to + _db().DATE_END),)) if date_to else len(keys)
+        return sorted(order_id for _, order_id in keys[start:end])
+
+    def delete_order_by_id(self, order_id):
+        with self._lock:
+            row = self.orders.pop(order_id, None)
+            if row is not None:
+                for column, value in (("date", row[2]), ("total", row[3])):
+                    keys = self._sorted[column]
+                    del keys[bisect.bisect_left(keys, _sort_key(value, order_id))]
+        self._changed()
+        return row is not None
+
+    def delete_order_by_index(self, index):
+        with self._lock:
+            order_ids = list(self.orders)
+            if 0 <= index < len(order_ids):
+                return self.delete_order_by_id(order_ids[index])
+            return False
+
+    def load_orders_page(self, sort="date", descending=False, after=None, limit=100, client=None,
+                         date_from=None, date_to=None, min_total=None, max_total=None, client_id=None,
+                         conn=None):
+        db = _db()
+        if sort not in db.ORDER_SORT_COLUMNS:
+            raise ValueError(f"Неизвестная колонка сортировки: {sort}")
+        checks = []
+        if client:
+            checks.append(lambda o: o["client"] is not None and o["client"].startswith(client))
+        if client_id is not None:
+            checks.append(lambda o: o["client_id"] == client_id)
+        if date_from:
+            checks.append(lambda o: o["date"] >= date_from)
+        if date_to:
+            checks.append(lambda o: o["date"] < date_to + db.DATE_END)
+        if min_total is not None:
+            checks.append(lambda o: o["total"] is not None and o["total"] >= min_total)
+        if max_total is not None:
+            checks.append(lambda o: o["total"] is not None and o["total"] <= max_total)
+
+        with self._lock:
+            keys = self._sorted[sort]
+            if descending:
+                end = bisect.bisect_left(keys, _sort_key(*after)) if after is not None else len(keys)
+                positions = range(end - 1, -1, -1)
+            else:
+                start = bisect.bisect_right(keys, _sort_key(*after)) if after is not None else 0
+                positions = range(start, len(keys))
+            orders = []
+            for position in positions:
+                order = self._order_dict(keys[position][1])
+                if all(check(order) for check in checks):
+                    orders.append(order)
+                    if len(orders) > limit:
+                        break
+        next_key = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_key = (orders[-1][sort], orders[-1]["id"])
+        return orders, next_key
+
+    def order_frame(self, columns, date_from=None, date_to=None):
+        """
+        Возвращает заказы в виде DataFrame с колонками из списка `columns`
+        (строка вида "client_id, date, total"), как запрос `analysis.iter_order_chunks`.
+        """
+        import pandas as pd
+
+        names = [name.strip() for name in columns.split(",")]
+        positions = {"client_id": 0, "products": 1, "date": 2, "total": 3}
+        with self._lock:
+            order_ids = self._order_ids(date_from, date_to)
+            rows = [self.orders[order_id] for order_id in order_ids]
+        data = {}
+        for name in names:
+            if name == "id":
+                data[name] = order_ids
+            elif name in positions:
+                data[name] = [row[positions[name]] for row in rows]
+            else:
+                raise UnsupportedOperation(f"Колонка {name} недоступна в хранилище python")
+        return pd.DataFrame(data, columns=names)
+
+
+BACKENDS = {
+    SQLiteBackend.kind: SQLiteBackend,
+    SharedMemoryBackend.kind: SharedMemoryBackend,
+    PythonBackend.kind: PythonBackend,
+}
+
+
+def create_backend(spec):
+    """
+    Создаёт хранилище по описанию вида "тип" или "тип:параметр".
+
+    Parameters
+    ----------
+    spec : str
+        "sqlite[:путь]", "sqlite-memory[:имя]" или "python".
+
+    Returns
+    -------
+    SQLiteBackend, SharedMemoryBackend or PythonBackend
+    """
+    kind, _, argument = spec.partition(":")
+    if kind not in BACKENDS:
+        raise ValueError(f"Неизвестное хранилище: {kind}")
+    return BACKENDS[kind](argument) if argument else BACKENDS[kind]()
+
+
+def location_from_env(default):
+    """
+    Возвращает путь (или URI) базы SQLite для хранилища из `ECOM_STORAGE`.
+
+    Используется для начального значения `db.DB_NAME`.
+    """
+    kind, _, argument = os.environ.get(STORAGE_ENV, DEFAULT_STORAGE).partition(":")
+    if kind == SharedMemoryBackend.kind:
+        return memory_uri(argument or "ecom")
+    if kind == SQLiteBackend.kind and argument:
+        return argument
+    return default
+
+
+def get_backend():
+    """Возвращает текущее хранилище; при первом вызове создаёт его по `ECOM_STORAGE`."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(os.environ.get(STORAGE_ENV, DEFAULT_STORAGE))
+    return _backend
+
+
+def use_backend(backend):
+    """
+    Делает хранилище текущим.
+
+    Для SQLite-хранилища с заданной базой `db.DB_NAME` переключается на неё.
+    Кэшированные результаты прежнего хранилища устаревают.
+
+    Returns
+    -------
+    object
+        Предыдущее хранилище.
+    """
+    import cache
+    global _backend
+    previous = get_backend()
+    _backend = backend
+    if backend.sql and backend.location:
+        _db().DB_NAME = backend.location
+    # Версия данных хранилища без SQL — только счётчик записей: без него
+    # результат одного хранилища выдавался бы для другого
+    cache.bump_version()
+    return previous
+
+
+@contextmanager
+def using(backend):
+    """Контекст: временно делает хранилище текущим и восстанавливает прежнее и `db.DB_NAME`."""
+    db = _db()
+    db_name = db.DB_NAME
+    previous = use_backend(backend)
+    try:
+        yield backend
+    finally:
+        use_backend(previous)
+        db.DB_NAME = db_name
+
+
+def dispatch(func):
+    """
+    Декоратор функций `db`: если текущее хранилище не поддерживает SQL,
+    вызывается его одноимённый метод.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        backend = get_backend()
+        if backend.sql:
+            return func(*args, **kwargs)
+        method = getattr(backend, func.__name__, None)
+        if method is None:
+            raise UnsupportedOperation(f"Хранилище {backend.kind} не поддерживает {func.__name__}")
+        return method(*args, **kwargs)
+    return wrapper
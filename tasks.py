@@ -0,0 +1,149 @@
+"""
+Отмена долгих операций и отчёт о прогрессе.
+
+Долгие функции `db` и `analysis` принимают необязательный параметр
+``token`` — `CancelToken`. Между пакетами данных они вызывают
+`CancelToken.check` и сообщают прогресс через `CancelToken.report`, а
+выполняющийся SQL-запрос прерывается обработчиком прогресса SQLite
+(`interruptible`). Отменённая операция завершается исключением
+`Cancelled`; подключения и временные файлы при этом закрываются и
+удаляются обычными блоками ``finally``.
+
+Интерфейс запускает такие операции в фоновом потоке (`run_in_thread`) и
+показывает окно с индикатором и кнопкой «Отмена» (`gui.run_with_progress`).
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Через сколько инструкций виртуальной машины SQLite проверяется отмена
+PROGRESS_STEPS = 10_000
+
+
+class Cancelled(Exception):
+    """Операция отменена."""
+
+
+class CancelToken:
+    """Флаг отмены операции и её прогресс.
+
+    Отмену запрашивает один поток (интерфейс), проверяет — другой
+    (выполняющий операцию).
+
+    Parameters
+    ----------
+    on_progress : callable, optional
+        Вызывается как on_progress(percent, status) при каждом `report`
+        в потоке операции.
+    """
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.percent = 0.0
+        self.status = ""
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Запрашивает отмену операции."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """
+        Raises
+        ------
+        Cancelled
+            Если отмена запрошена.
+        """
+        if self._event.is_set():
+            raise Cancelled()
+
+    def report(self, done, total, status=None):
+        """
+        Сообщает прогресс `done` из `total` и проверяет отмену.
+
+        Raises
+        ------
+        Cancelled
+            Если отмена запрошена.
+        """
+        self.percent = min(100.0, 100.0 * done / total) if total else 0.0
+        if status is not None:
+            self.status = status
+        if self.on_progress is not None:
+            self.on_progress(self.percent, self.status)
+        self.check()
+
+
+def check(token):
+    """Проверяет отмену, если токен задан."""
+    if token is not None:
+        token.check()
+
+
+@contextmanager
+def interruptible(conn, token, steps=PROGRESS_STEPS):
+    """
+    Контекст: SQL-запросы подключения прерываются при отмене токена.
+
+    Ошибка прерванного запроса (в том числе обёрнутая pandas) заменяется
+    на `Cancelled`. Без токена контекст ничего не делает.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Подключение к базе.
+    token : CancelToken or None
+        Токен отмены.
+    steps : int, optional
+        Период проверки в инструкциях виртуальной машины SQLite.
+    """
+    if token is None:
+        yield
+        return
+    token.check()
+    conn.set_progress_handler(lambda: 1 if token.cancelled else 0, steps)
+    try:
+        yield
+    except Cancelled:
+        raise
+    except (sqlite3.Error, Exception) as e:
+        if token.cancelled:
+            raise Cancelled() from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def run_in_thread(func, token, on_done):
+    """
+    Выполняет func(token) в фоновом потоке.
+
+    Parameters
+    ----------
+    func : callable
+        Операция; получает токен отмены.
+    token : CancelToken
+        Токен отмены.
+    on_done : callable
+        Вызывается в фоновом потоке как on_done(result, error) после
+        завершения; error — исключение (в том числе `Cancelled`) или None.
+
+    Returns
+    -------
+    threading.Thread
+    """
+    def run():
+        try:
+            result = func(token)
+        except BaseException as e:
+            on_done(None, e)
+        else:
+            on_done(result, None)
+
+    thread = threading.Thread(target=run, name="ecom-task", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,150 @@
+"""
+Unit-тесты нормализации адресов и отчёта по регионам.
+"""
+
+import os
+import tempfile
+import unittest
+from contextlib import closing
+from datetime import date
+from unittest.mock import patch
+
+import pandas as pd
+
+import addresses
+import analysis
+import cache
+import db
+import storage
+from addresses import Address
+from datagen import generate_database
+from models import Order, Product
+
+
+class TestNormalizeAddress(unittest.TestCase):
+    def test_variants(self):
+        cases = {
+            "г. Казань, ул. Ленина, д. 10": Address("Республика Татарстан", "Казань", "ул. Ленина", "10"),
+            "420000, респ. Татарстан, г Казань, улица  гагарина 12а, кв. 4":
+                Address("Республика Татарстан", "Казань", "ул. Гагарина", "12а"),
+            "Самарская обл., Самара, Мира 5": Address("Самарская область", "Самара", "Мира", "5"),
+            "москва, проспект мира, 5/2": Address("Москва", "Москва", "пр-т Мира", "5/2"),
+            "Йошкар-Ола, Советская ул., дом 3": Address("Республика Марий Эл", "Йошкар-Ола", "ул. Советская", "3"),
+            "СПб, Невский пр., 1": Address("Санкт-Петербург", "Санкт-Петербург", "пр-т Невский", "1"),
+            "г. Энск, пер. Тихий": Address(None, "Энск", "пер. Тихий", None),
+            "ул. Ленина, 10": Address(None, None, "ул. Ленина", "10"),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(addresses.normalize_address(text), expected)
+        self.assertEqual(addresses.normalize_address(None), addresses.EMPTY_ADDRESS)
+        self.assertEqual(addresses.normalize_address("  "), addresses.EMPTY_ADDRESS)
+
+    def test_each_distinct_address_parsed_once(self):
+        addresses._parse.cache_clear()
+        column = pd.Series(["г. Омск, ул. Мира, д. 1", "г. Омск,  ул. Мира, д. 1", None, "г. Уфа"] * 50,
+                           index=range(100, 300))
+        parsed = addresses.normalize_addresses(column)
+        self.assertEqual(list(parsed.index), list(column.index))
+        self.assertEqual(parsed.loc[101, "city"], "Омск")
+        self.assertIsNone(parsed.loc[102, "city"])
+        # Варианты с лишними пробелами разбираются один раз, пустой адрес — не разбирается
+        self.assertEqual(addresses._parse.cache_info().misses, 2)
+        self.assertEqual(list(addresses.normalize_addresses([]).columns), list(Address._fields))
+
+
+class TestRegionalSales(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, "ecom.db")
+        generate_database(cls.db_path, orders=4_000, clients=150, start=date(2024, 1, 1), days=90)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+
+    def test_lookup_table_persists_parsed_addresses(self):
+        with closing(db.connect()) as conn:
+            conn.execute("DELETE FROM address_lookup")
+            conn.commit()
+            distinct = conn.execute("SELECT COUNT(DISTINCT address) FROM clients").fetchone()[0]
+            self.assertEqual(addresses.sync_address_lookup(conn), distinct)
+            self.assertEqual(addresses.sync_address_lookup(conn), 0)
+            # Новая версия правил разбора — адреса разбираются заново
+            with patch("addresses.PARSER_VERSION", addresses.PARSER_VERSION + 1):
+                self.assertEqual(addresses.sync_address_lookup(conn), distinct)
+
+    def test_report_matches_sql_join(self):
+        db.add_client("Без адреса", "", "", "")
+        db.save_order(Order(151, [Product("Чай", 150.0)], date="2024-02-01"))
+        sales = analysis.regional_sales.uncached("region", chunksize=500)
+        self.assertIn(analysis.UNKNOWN_PLACE, set(sales["Регион"]))
+        with closing(db.connect()) as conn:
+            expected = pd.read_sql_query("""SELECT COALESCE(l.region, ?) AS region, COUNT(*) AS orders,
+                    ROUND(SUM(o.total), 2) AS revenue
+                FROM orders o JOIN clients c ON c.id = o.client_id
+                LEFT JOIN address_lookup l ON l.address = c.address GROUP BY 1""", conn,
+                params=(analysis.UNKNOWN_PLACE,), index_col="region")
+        actual = sales.set_index("Регион")
+        self.assertEqual(actual["Количество заказов"].to_dict(), expected["orders"].to_dict())
+        for region, revenue in expected["revenue"].items():
+            self.assertAlmostEqual(actual.loc[region, "Общая сумма"], revenue, places=2)
+        self.assertAlmostEqual(sales["Доля выручки, %"].sum(), 100, delta=0.5)
+        self.assertEqual(sales["Клиентов"].sum(), 151)
+
+        cities = analysis.regional_sales.uncached("city")
+        self.assertEqual(list(cities.columns[:2]), ["Регион", "Город"])
+        self.assertAlmostEqual(cities["Общая сумма"].sum(), sales["Общая сумма"].sum(), places=2)
+        with self.assertRaises(ValueError):
+            analysis.regional_sales.uncached("country")
+
+    def test_report_reads_without_writing(self):
+        expected = analysis.regional_sales.uncached("city")
+        with closing(db.connect()) as conn:
+            conn.execute("DELETE FROM address_lookup")
+            conn.commit()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            # Адреса без строки в address_lookup разбираются в памяти
+            pd.testing.assert_frame_equal(analysis.regional_sales.uncached("city"), expected)
+            self.assertEqual(conn.execute("PRAGMA data_version").fetchone()[0], version)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM address_lookup").fetchone()[0], 0)
+        # Инициализация базы заново заполняет таблицу для остальных тестов
+        db.initialize_db()
+        with closing(db.connect()) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM address_lookup").fetchone()[0],
+                             conn.execute("SELECT COUNT(DISTINCT address) FROM clients").fetchone()[0])
+
+    def test_saved_client_address_is_parsed(self):
+        db.add_client("С адресом", "", "", "г. Тверь, проспект Победы, 3")
+        with closing(db.connect()) as conn:
+            row = conn.execute("SELECT region, city, street, house FROM address_lookup WHERE address = ?",
+                               ("г. Тверь, проспект Победы, 3",)).fetchone()
+        self.assertEqual(row, ("Тверская область", "Тверь", "пр-т Победы", "3"))
+
+
+class TestPythonBackend(unittest.TestCase):
+    def test_report_without_sqlite(self):
+        with storage.using(storage.PythonBackend()):
+            db.initialize_db()
+            db.add_client("Клиент 1", "", "", "г. Пермь, ул. Ленина, д. 1")
+            db.add_client("Клиент 2", "", "", "Пермь, Ленина 7")
+            db.add_client("Клиент 3", "", "", "г. Тверь")
+            for client_id in (1, 2, 3, 3):
+                db.save_order(Order(client_id, [Product("Чай", 150.0)], date="2025-01-01"))
+            sales = analysis.regional_sales.uncached("region")
+        self.assertEqual(sales["Регион"].tolist(), ["Пермский край", "Тверская область"])
+        self.assertEqual(sales["Количество заказов"].tolist(), [2, 2])
+        self.assertEqual(sales["Клиентов"].tolist(), [2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
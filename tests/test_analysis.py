@@ -2,13 +2,41 @@
 Unit-тесты для анализа данных.
 """
 
+import os
+import sqlite3
+import tempfile
 import unittest
+from datetime import date
 import seaborn as sns
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 import pandas as pd
-from analysis import safe_parse, client_stats, order_trend_from_db, sales_trend_monthly_change
+from analysis import (
+    safe_parse, client_stats, order_trend_from_db, sales_trend_monthly_change,
+    cohort_retention, rfm_scores, client_stats_from_db, daily_order_counts, monthly_sales
+)
+from datagen import generate_database
+import cache
+import db
+import tasks
+
+
+def run_now(key, title, work, on_done):
+    """Синхронная замена `gui.run_with_progress` для тестов без дисплея."""
+    on_done(work(tasks.CancelToken()))
 
 class TestSafeParse(unittest.TestCase):
+    def setUp(self):
+        # Графики читают базу через `analytics_connect`: рабочая ecom.db не трогается
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patcher = patch("db.DB_NAME", os.path.join(self.tmp.name, "ecom.db"))
+        self.patcher.start()
+        db.initialize_db()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
     def test_valid_string_list(self):
         s = "[{'name': 'Product A'}, {'name': 'Product B'}]"
         result = safe_parse(s)
@@ -47,49 +75,100 @@ class TestSafeParse(unittest.TestCase):
         self.assertEqual(alice_row['Количество заказов'], 2)
         self.assertEqual(alice_row['Общая сумма'], 250)
 
-    @patch('analysis.sqlite3.connect')
-    def test_order_trend_from_db_empty(self, mock_connect):
-        mock_conn = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.execute.return_value.fetchall.return_value = []
-        mock_conn.close.return_value = None
-
+    @patch('gui.run_with_progress', run_now)
+    def test_order_trend_from_db_empty(self):
         with patch('analysis.pd.read_sql_query', return_value=pd.DataFrame()):
             with patch('builtins.print') as mock_print:
                 order_trend_from_db()
                 mock_print.assert_called_with("Нет данных — таблица заказов пуста.")
 
-    @patch('analysis.sqlite3.connect')
-    def test_sales_trend_monthly_change_empty(self, mock_connect):
-        mock_conn = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.close.return_value = None
-
+    @patch('gui.run_with_progress', run_now)
+    def test_sales_trend_monthly_change_empty(self):
         with patch('analysis.pd.read_sql_query', return_value=pd.DataFrame()):
             with patch('builtins.print') as mock_print:
                 sales_trend_monthly_change()
                 mock_print.assert_called()
 
 
-    @patch('analysis.sqlite3.connect')
-    def test_order_trend_from_db_empty(self, mock_connect):
-        mock_conn = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value.execute.return_value.fetchall.return_value = []
-        mock_conn.close.return_value = None
-
-        with patch('analysis.pd.read_sql_query', return_value=pd.DataFrame()):
-            with patch('builtins.print') as mock_print:
-                order_trend_from_db()
-                mock_print.assert_called_with("Нет данных — таблица заказов пуста.")
-
-    @patch('analysis.sqlite3.connect')
-    @patch('analysis.pd.read_sql_query')
-    def test_sales_trend_monthly_change_empty(self, mock_read_sql, mock_connect):
-        mock_read_sql.return_value = pd.DataFrame()
-        with patch('builtins.print') as mock_print:
-            sales_trend_monthly_change()
-            mock_print.assert_called()
+class TestCohortsAndRFM(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, client_id TEXT, products TEXT, date TEXT, total REAL)")
+        rows = [
+            ("Alice", "2025-01-05", 100.0),
+            ("Alice", "2025-02-10", 50.0),
+            ("Alice", "2025-03-01", 70.0),
+            ("Bob", "2025-01-20", 300.0),
+            ("Carol", "2025-02-03", 20.0),
+            ("Carol", "2025-02-25", 25.0),
+            ("Carol", "2025-04-11", 30.0),
+        ]
+        self.conn.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (?, '', ?, ?)", rows)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_cohort_retention_matrix(self):
+        retention = cohort_retention(self.conn, chunksize=2)
+        self.assertEqual(list(retention.index), ["2025-01", "2025-02"])
+        self.assertEqual(retention.loc["2025-01", "Размер когорты"], 2)
+        self.assertEqual(retention.loc["2025-01", 0], 1.0)
+        self.assertEqual(retention.loc["2025-01", 1], 0.5)
+        self.assertEqual(retention.loc["2025-02", 2], 1.0)
+        self.assertEqual(retention.loc["2025-02", 1], 0.0)
+
+    def test_rfm_scores_chunked_matches_single_pass(self):
+        chunked = rfm_scores(self.conn, as_of="2025-05-01", chunksize=2).set_index("Клиент")
+        single = rfm_scores(self.conn, as_of="2025-05-01", chunksize=100).set_index("Клиент")
+        pd.testing.assert_frame_equal(chunked.sort_index(), single.sort_index())
+        self.assertEqual(chunked.loc["Alice", "Частота"], 3)
+        self.assertEqual(chunked.loc["Bob", "Сумма"], 300.0)
+        self.assertEqual(chunked.loc["Carol", "Давность, дн."], 20)
+        self.assertEqual(chunked.loc["Carol", "R"], chunked["R"].max())
+
+    def test_rfm_scores_empty(self):
+        self.conn.execute("DELETE FROM orders")
+        self.assertTrue(rfm_scores(self.conn).empty)
+        self.assertTrue(cohort_retention(self.conn).empty)
+
+
+
+class TestChunkedAggregation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        generate_database(self.db_path, orders=3000, clients=40, start=date(2025, 1, 1), days=365)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_client_stats_modes_match_in_memory(self):
+        expected = client_stats(db.load_orders.uncached())
+        for kwargs in ({"chunksize": None}, {"chunksize": 257}, {"chunksize": 700, "processes": 2}):
+            actual = client_stats_from_db.uncached(**kwargs)
+            pd.testing.assert_frame_equal(actual, expected)
+
+    def test_daily_and_monthly_modes_match(self):
+        daily = daily_order_counts(2025, 8, chunksize=None)
+        self.assertEqual(list(daily.index), list(range(1, 32)))
+        self.assertGreater(daily.sum(), 0)
+        monthly = monthly_sales(chunksize=None)
+        self.assertEqual(list(monthly.index), list(range(1, 13)))
+        for kwargs in ({"chunksize": 100}, {"chunksize": 1000, "processes": 2}):
+            pd.testing.assert_series_equal(daily_order_counts(2025, 8, **kwargs), daily)
+            pd.testing.assert_series_equal(monthly_sales(**kwargs), monthly)
+
+    def test_empty_table(self):
+        conn = db.connect()
+        conn.execute("DELETE FROM orders")
+        conn.commit()
+        conn.close()
+        self.assertIsNone(daily_order_counts(2025, 8, chunksize=100))
+        self.assertIsNone(monthly_sales(chunksize=100, processes=2))
+        self.assertTrue(client_stats_from_db.uncached().empty)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+"""
+Unit-тесты HTTP API.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import api
+from api import create_server
+from datagen import client_name, generate_database
+
+
+class TestApi(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "api.db")
+        generate_database(path, orders=2000, clients=50)
+        cls.server = create_server(port=0, db_path=path, pool_size=2, quiet=True)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.server.pool.close()
+        cls.tmp.cleanup()
+
+    def get(self, path):
+        with urlopen(self.base + path) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def test_orders_pagination(self):
+        first = self.get("/orders?limit=10")
+        second = self.get("/orders?limit=10&offset=10")
+        self.assertEqual(len(first["items"]), 10)
+        self.assertEqual(first["next_offset"], 10)
+        self.assertLess(first["items"][-1]["id"], second["items"][0]["id"])
+
+    def test_orders_filters(self):
+        name = client_name(3)
+        body = self.get(f"/orders?client={quote(name)}&date_from=2023-06-01&min_total=200&limit=1000")
+        self.assertTrue(body["items"])
+        for order in body["items"]:
+            self.assertEqual(order["client"], name)
+            self.assertGreaterEqual(order["date"], "2023-06-01")
+            self.assertGreaterEqual(order["total"], 200)
+
+    def test_date_to_includes_whole_last_day(self):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        conn.execute("CREATE TABLE clients (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, client_id INTEGER, products TEXT, date TEXT, total REAL)")
+        conn.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (1, 'Чай', ?, 1.0)",
+                         [("2025-03-01",), ("2025-03-01 18:30",), ("2025-03-02",)])
+        body = api.list_orders(conn, {"date_from": ["2025-03-01"], "date_to": ["2025-03-01"]})
+        conn.close()
+        self.assertEqual([o["date"] for o in body["items"]], ["2025-03-01", "2025-03-01 18:30"])
+
+    def test_client_stats_totals(self):
+        body = self.get("/stats/clients?limit=1000")
+        self.assertEqual(sum(row["order_count"] for row in body["items"]), 2000)
+
+    def test_rfm_endpoint(self):
+        body = self.get("/stats/rfm?limit=5")
+        self.assertEqual(len(body["items"]), 5)
+        self.assertIn("RFM", body["items"][0])
+
+    def test_bad_request_and_unknown_route(self):
+        with self.assertRaises(HTTPError) as ctx:
+            self.get("/orders?limit=abc")
+        self.assertEqual(ctx.exception.code, 400)
+        with self.assertRaises(HTTPError) as ctx:
+            self.get("/nothing")
+        self.assertEqual(ctx.exception.code, 404)
+
+    def test_unexpected_error_returns_json_500(self):
+        def broken(conn, params):
+            raise ValueError("сбой расчёта")
+
+        with patch.dict("api.ROUTES", {"/stats/rfm": broken}):
+            with self.assertRaises(HTTPError) as ctx:
+                self.get("/stats/rfm")
+        self.assertEqual(ctx.exception.code, 500)
+        self.assertEqual(json.loads(ctx.exception.read().decode("utf-8")), {"error": "Внутренняя ошибка: ValueError"})
+        # Сервер продолжает обслуживать запросы
+        self.assertEqual(len(self.get("/orders?limit=1")["items"]), 1)
+
+    def test_concurrent_readers(self):
+        results = []
+
+        def read():
+            results.append(len(self.get("/orders?limit=50")["items"]))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [50] * 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Unit-тесты архивирования заказов.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import archive
+import cache
+import changelog
+import db
+from analysis import rfm_scores
+from models import Order, Product
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        self.archive_dir = os.path.join(self.tmp.name, "archive")
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+        db.initialize_db()
+        for i, day in enumerate(["2023-03-01", "2023-11-15", "2024-02-10", "2024-07-01", "2025-01-20"]):
+            db.save_order(Order(f"Клиент {i % 2}", [Product("Чай", 10.0 * (i + 1))], date=date.fromisoformat(day)))
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_archive_moves_old_orders_by_year(self):
+        moved = archive.archive_orders("2024-06-01", "year", self.archive_dir)
+        self.assertEqual(moved, {"2023": 2, "2024": 1})
+        self.assertEqual([o["date"] for o in db.load_orders()], ["2024-07-01", "2025-01-20"])
+        self.assertTrue(os.path.exists(os.path.join(self.archive_dir, "orders_2023.db")))
+
+        conn = sqlite3.connect(self.db_path)
+        changes, _ = changelog.changes_since(conn, table="orders")
+        self.assertEqual(sum(c["op"] == archive.OP_ARCHIVE for c in changes), 3)
+        self.assertFalse(any(c["op"] == changelog.OP_DELETE for c in changes))
+        conn.close()
+
+    def test_date_range_spans_hot_and_archived(self):
+        archive.archive_orders("2024-06-01", "month", self.archive_dir)
+        spanning = db.load_orders(date_from="2023-11-01", date_to="2024-12-31")
+        self.assertEqual([o["date"] for o in spanning], ["2023-11-15", "2024-02-10", "2024-07-01"])
+        everything = db.load_orders(date_from="2000-01-01")
+        self.assertEqual(len(everything), 5)
+
+    def test_malformed_dates_are_left_in_place(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE orders SET date = '' WHERE date = '2023-03-01'")
+        conn.execute("UPDATE orders SET date = '15.11.2023' WHERE date = '2023-11-15'")
+        conn.commit()
+        conn.close()
+        moved = archive.archive_orders("2024-06-01", "month", self.archive_dir)
+        self.assertEqual(moved, {"2024-02": 1})
+        self.assertEqual(len(db.load_orders()), 4)
+        with self.assertRaises(ValueError):
+            archive.period_bounds("")
+
+    def test_date_to_includes_whole_last_day(self):
+        db.save_order(Order("Клиент 0", [Product("Чай", 5.0)], date="2023-11-15 18:30"))
+        expected = ["2023-11-15", "2023-11-15 18:30"]
+        page, _ = db.load_orders_page(date_from="2023-11-01", date_to="2023-11-15")
+        self.assertEqual([o["date"] for o in page], expected)
+        archive.archive_orders("2024-06-01", "month", self.archive_dir)
+        orders = db.load_orders(date_from="2023-11-01", date_to="2023-11-15")
+        self.assertEqual([o["date"] for o in orders], expected)
+
+    def test_compressed_archives_are_readable(self):
+        archive.archive_orders("2024-06-01", "year", self.archive_dir)
+        self.assertEqual(sorted(archive.compress_cold_archives(older_than_days=0)), ["2023", "2024"])
+        self.assertFalse(os.path.exists(os.path.join(self.archive_dir, "orders_2023.db")))
+        self.assertEqual(len(db.load_orders(date_from="2023-01-01", date_to="2023-12-31")), 2)
+
+        archive.archive_orders("2025-06-01", "year", self.archive_dir)
+        self.assertEqual(db.load_orders(), [])
+        self.assertEqual(len(db.load_orders(date_from="2023-01-01")), 5)
+
+    def test_analytics_over_range(self):
+        archive.archive_orders("2024-06-01", "year", self.archive_dir)
+        rfm = rfm_scores(date_from="2023-01-01").set_index("Клиент")
+        self.assertEqual(rfm["Частота"].sum(), 5)
+
+    def test_legacy_archive_migrated_to_client_ids(self):
+        archive.archive_orders("2024-01-01", "year", self.archive_dir)
+        # Архив старого формата: имя клиента вместо ID
+        path = os.path.join(self.archive_dir, "orders_2023.db")
+        conn = sqlite3.connect(path)
+        conn.execute("ALTER TABLE orders RENAME TO orders_new")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, client_id TEXT, products TEXT, date TEXT, total REAL)")
+        conn.execute("""INSERT INTO orders SELECT id, 'Клиент ' || (client_id - 1), products, date, total
+                        FROM orders_new""")
+        conn.execute("DROP TABLE orders_new")
+        conn.commit()
+        conn.close()
+        archive.compress_cold_archives(older_than_days=0)
+
+        db.initialize_db()
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT typeof(client_id) FROM orders").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("integer",), ("integer",)])
+        orders = db.load_orders(date_from="2023-01-01", date_to="2023-12-31")
+        self.assertEqual([o["client"] for o in orders], ["Клиент 0", "Клиент 1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
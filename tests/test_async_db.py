@@ -0,0 +1,145 @@
+"""
+Unit-тесты асинхронного слоя доступа к данным.
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from async_db import AsyncDatabase, enable_wal
+from db import create_schema
+from models import Client, Order, Product
+
+
+class TestAsyncDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        conn = sqlite3.connect(self.db_path)
+        create_schema(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_concurrent_mixed_workload(self):
+        async def scenario():
+            async with AsyncDatabase(self.db_path) as adb:
+                products = [Product("Чай", 100.0)]
+                await asyncio.gather(*(adb.save_client(Client(f"Клиент {i}", "a@b.ru", "+79990000000", "ул. Мира"))
+                                       for i in range(5)))
+                clients = await adb.load_clients()
+                writes = [adb.save_order(Order(clients[i % 5].id, products)) for i in range(60)]
+                writes += [adb.save_order(Order(f"Новый клиент {i}", products)) for i in range(3)]
+                reads = [adb.load_orders() for _ in range(10)]
+                results = await asyncio.gather(*writes, *reads)
+                self.assertEqual(len(set(results[:63])), 63)
+                orders = await adb.load_orders()
+                clients = await adb.load_clients()
+                self.assertEqual(len(orders), 63)
+                self.assertEqual(len(clients), 8)
+                self.assertEqual({o["client"] for o in orders},
+                                 {f"Клиент {i}" for i in range(5)} | {f"Новый клиент {i}" for i in range(3)})
+                await adb.delete_order_by_index(0)
+                self.assertEqual(len(await adb.load_orders()), 62)
+
+        asyncio.run(scenario())
+
+    def test_mirrors_db_products_and_client_deletion(self):
+        async def scenario():
+            async with AsyncDatabase(self.db_path) as adb:
+                await adb.run(lambda conn: conn.execute(
+                    "INSERT INTO products (name, price, category) VALUES ('Чай', 150.0, 'Напитки')"), write=True)
+                products = await adb.load_products()
+                self.assertEqual([(p.id, p.name) for p in products], [(1, "Чай")])
+                await adb.save_order(Order("Alice", [Product("Чай", 10.0)]))
+                await adb.save_order(Order("Bob", [Product("Чай", 10.0)]))
+                await adb.delete_client_by_name("Alice", with_orders=True)
+                self.assertEqual([o["client"] for o in await adb.load_orders()], ["Bob"])
+                bob = (await adb.load_clients())[0]
+                self.assertTrue(await adb.delete_client_by_id(bob.id, with_orders=True))
+                self.assertEqual(await adb.load_orders(), [])
+
+        asyncio.run(scenario())
+
+    def test_reads_run_alongside_long_query(self):
+        # Тяжёлый запрос выполняется в SQLite без GIL; короткие чтения в другом потоке пула не ждут его
+        heavy = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 5000000) SELECT SUM(x) FROM n"
+
+        async def scenario():
+            async with AsyncDatabase(self.db_path, max_workers=2) as adb:
+                await adb.save_order(Order("Alice", [Product("Чай", 10.0)]))
+                long = asyncio.ensure_future(adb.run(lambda conn: conn.execute(heavy).fetchone()[0]))
+                await asyncio.sleep(0.05)
+                reads = [len(await adb.load_orders()) for _ in range(5)]
+                finished_first = long.done()
+                total = await long
+            return reads, finished_first, total
+
+        reads, finished_first, total = asyncio.run(scenario())
+        self.assertEqual(reads, [1] * 5)
+        self.assertFalse(finished_first)
+        self.assertEqual(total, 5000000 * 5000001 // 2)
+
+    def test_journal_mode_is_opt_in(self):
+        def journal_mode():
+            conn = sqlite3.connect(self.db_path)
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            conn.close()
+            return mode
+
+        async def write_during_iteration():
+            async with AsyncDatabase(self.db_path) as adb:
+                for i in range(20):
+                    await adb.save_order(Order("Bob", [Product("Квас", float(i))]))
+                orders = adb.iter_orders(batch_size=5)
+                first = await orders.__anext__()
+                # В режиме WAL запись не ждёт открытого курсора чтения
+                await asyncio.wait_for(adb.save_order(Order("Bob", [Product("Сыр", 1.0)])), 2)
+                return [first] + [order async for order in orders]
+
+        asyncio.run(AsyncDatabase(self.db_path).close())
+        self.assertEqual(journal_mode(), "delete")
+        self.assertEqual(enable_wal(self.db_path), "wal")
+        self.assertEqual(len(asyncio.run(write_during_iteration())), 20)
+        self.assertEqual(journal_mode(), "wal")
+
+    def test_cancellation_interrupts_query(self):
+        long_query = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+
+        async def scenario():
+            async with AsyncDatabase(self.db_path) as adb:
+                task = asyncio.ensure_future(adb.run(lambda conn: conn.execute(long_query).fetchone()))
+                await asyncio.sleep(0.1)
+                start = time.perf_counter()
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                await adb.save_order(Order("Alice", [Product("Чай", 10.0)]))
+                self.assertEqual(len(await adb.load_orders()), 1)
+                return time.perf_counter() - start
+
+        self.assertLess(asyncio.run(scenario()), 2.0)
+
+    def test_async_iteration_and_export(self):
+        async def scenario():
+            async with AsyncDatabase(self.db_path) as adb:
+                for i in range(25):
+                    await adb.save_order(Order("Bob", [Product("Квас", float(i))]))
+                totals = [o["total"] async for o in adb.iter_orders(batch_size=7)]
+                path = os.path.join(self.tmp.name, "export.csv")
+                await adb.export_orders_to_csv(path, batch_size=10)
+                return totals, path
+
+        totals, path = asyncio.run(scenario())
+        self.assertEqual(totals, [float(i) for i in range(25)])
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 26)
+
+
+if __name__ == '__main__':
+    unittest.main()
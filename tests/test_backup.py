@@ -0,0 +1,104 @@
+"""
+Unit-тесты резервного копирования и снимков базы данных.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import backup
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, client_id TEXT, products TEXT, date TEXT, total REAL)")
+        conn.executemany(
+            "INSERT INTO orders (client_id, products, date, total) VALUES (?, 'x', '2025-08-01', ?)",
+            [(f"client{i}", float(i)) for i in range(2000)]
+        )
+        conn.commit()
+        conn.close()
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        backup.stop_snapshot_schedule()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_backup_copies_all_rows_in_steps(self):
+        dest = os.path.join(self.tmp.name, "copy.db")
+        steps = []
+        backup.backup_database(dest, pages=1, sleep=0, progress=lambda s, r, t: steps.append(r))
+        self.assertGreater(len(steps), 1)
+        self.assertFalse(os.path.exists(dest + ".part"))
+        conn = sqlite3.connect(dest)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 2000)
+        conn.close()
+
+    def test_start_backup_reports_completion(self):
+        dest = os.path.join(self.tmp.name, "bg.db")
+        result = {}
+        thread = backup.start_backup(dest, on_done=lambda error: result.setdefault("error", error))
+        thread.join(10)
+        self.assertIsNone(result["error"])
+        self.assertTrue(os.path.exists(dest))
+
+    def test_snapshot_is_read_only(self):
+        path = os.path.join(self.tmp.name, "snap.db")
+        backup.create_snapshot(path)
+        conn = backup.connect_snapshot(path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 2000)
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM orders")
+        conn.close()
+
+    def test_analytics_uses_snapshot_when_scheduled(self):
+        path = os.path.join(self.tmp.name, "snap.db")
+        scheduler = backup.start_snapshot_schedule(interval=60, path=path)
+        deadline = time.time() + 10
+        while scheduler.last_snapshot is None and time.time() < deadline:
+            time.sleep(0.01)
+        conn = backup.analytics_connect()
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM orders")
+        conn.close()
+
+    def test_snapshot_versions_are_not_overwritten(self):
+        scheduler = backup.SnapshotScheduler(60, path=os.path.join(self.tmp.name, "snap.db"))
+        with patch("backup._scheduler", scheduler):
+            scheduler.refresh()
+            reader = backup.analytics_connect()
+            scheduler.refresh()
+            # Открытая версия не перезаписана: читатель видит свои данные, аналитика — новую версию
+            self.assertEqual(reader.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 2000)
+            reader.close()
+            self.assertTrue(backup.analytics_path().endswith("snap.2.db"))
+            scheduler.refresh()
+            scheduler.refresh()
+            self.assertEqual(backup.analytics_path(), scheduler.current)
+        self.assertEqual(sorted(os.path.basename(p) for p in scheduler._versions), ["snap.3.db", "snap.4.db"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "snap.1.db")))
+
+    def test_locked_old_version_is_kept(self):
+        scheduler = backup.SnapshotScheduler(60, path=os.path.join(self.tmp.name, "snap.db"))
+        scheduler._versions = ["a.db", "b.db", "c.db"]
+        with patch("os.remove", side_effect=PermissionError("занят")):
+            scheduler._remove_old_versions()
+        self.assertEqual(scheduler._versions, ["a.db", "b.db", "c.db"])
+
+    def test_schedule_disabled_by_default(self):
+        self.assertIsNone(backup.start_snapshot_schedule(interval=0))
+        conn = backup.analytics_connect()
+        conn.execute("DELETE FROM orders WHERE id = 1")
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
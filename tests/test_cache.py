@@ -0,0 +1,129 @@
+"""
+Unit-тесты кэша результатов чтения.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cache
+import db
+import storage
+from cache import ResultCache
+from models import Order, Product
+
+
+class TestResultCache(unittest.TestCase):
+    def test_lru_eviction_by_size(self):
+        rc = ResultCache(max_bytes=cache.estimate_size("x" * 100) * 2 + 10)
+        rc.put("a", 1, "x" * 100)
+        rc.put("b", 1, "y" * 100)
+        rc.get("a", 1)
+        rc.put("c", 1, "z" * 100)
+        self.assertEqual(rc.get("a", 1), (True, "x" * 100))
+        self.assertEqual(rc.get("b", 1), (False, None))
+        self.assertEqual(rc.stats()["evictions"], 1)
+
+    def test_stale_version_invalidates(self):
+        rc = ResultCache()
+        rc.put("a", (1, 0), [1, 2])
+        self.assertEqual(rc.get("a", (1, 1)), (False, None))
+        stats = rc.stats()
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["entries"], 0)
+
+
+class TestCachedReads(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+        db.initialize_db()
+        cache.result_cache.clear()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_repeated_reads_are_served_from_cache(self):
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        before = cache.cache_stats()["hits"]
+        first = db.load_orders()
+        second = db.load_orders()
+        self.assertEqual(first, second)
+        self.assertEqual(cache.cache_stats()["hits"], before + 1)
+
+    def test_result_copy_is_isolated(self):
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        orders = db.load_orders()
+        orders.pop()
+        self.assertEqual(len(db.load_orders()), 1)
+
+    def test_write_through_db_invalidates(self):
+        self.assertEqual(db.load_orders(), [])
+        db.save_order(Order("Bob", [Product("Квас", 5.0)]))
+        self.assertEqual(len(db.load_orders()), 1)
+
+    def test_external_write_invalidates(self):
+        self.assertEqual(db.load_clients(), [])
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO clients (name, email, phone, address) VALUES ('Eve', '', '', '')")
+        conn.commit()
+        conn.close()
+        self.assertEqual([c.name for c in db.load_clients()], ["Eve"])
+
+    def test_snapshot_reads_are_keyed_on_snapshot(self):
+        import analysis
+        import backup
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        scheduler = backup.SnapshotScheduler(60, path=os.path.join(self.tmp.name, "snap.db"))
+        with patch("backup._scheduler", scheduler):
+            scheduler.refresh()
+            self.assertEqual(analysis.client_stats_from_db()["Общая сумма"].sum(), 10.0)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("INSERT INTO orders (client_id, products, date, total) "
+                         "SELECT client_id, products, date, 5.0 FROM orders")
+            conn.commit()
+            conn.close()
+            # Снимок не изменился: результат берётся из кэша
+            hits = cache.cache_stats()["hits"]
+            self.assertEqual(analysis.client_stats_from_db()["Общая сумма"].sum(), 10.0)
+            self.assertEqual(cache.cache_stats()["hits"], hits + 1)
+            scheduler.refresh()
+            self.assertEqual(analysis.client_stats_from_db()["Общая сумма"].sum(), 15.0)
+
+
+class TestPythonBackendCache(unittest.TestCase):
+    def test_no_database_file_is_created(self):
+        import analysis
+        cache.result_cache.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ecom.db")
+            with patch("db.DB_NAME", path), storage.using(storage.PythonBackend()):
+                db.initialize_db()
+                db.add_client("Alice", "", "", "")
+                db.save_order(Order(1, [Product("Чай", 10.0)], date="2025-01-01"))
+                self.assertEqual(analysis.client_stats_from_db()["Общая сумма"].sum(), 10.0)
+                hits = cache.cache_stats()["hits"]
+                self.assertEqual(analysis.client_stats_from_db()["Общая сумма"].sum(), 10.0)
+                self.assertEqual(cache.cache_stats()["hits"], hits + 1)
+                self.assertEqual(cache.purge_stale(), 0)
+                db.save_order(Order(1, [Product("Квас", 5.0)], date="2025-01-02"))
+                self.assertEqual(analysis.client_stats_from_db()["Общая сумма"].sum(), 15.0)
+            self.assertFalse(os.path.exists(path))
+    def test_switching_backend_invalidates(self):
+        import analysis
+        with storage.using(storage.PythonBackend()):
+            db.add_client("A", "", "", "")
+            db.save_order(Order(1, [Product("Чай", 1.0)], date="2025-01-01"))
+            self.assertEqual(len(analysis.client_stats_from_db()), 1)
+        with storage.using(storage.PythonBackend()):
+            self.assertTrue(analysis.client_stats_from_db().empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit-тесты журнала изменений и инкрементального экспорта.
+"""
+
+import csv
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cache
+import changelog
+import db
+from models import Client, Order, Product
+
+
+class TestChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+        db.initialize_db()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def read_csv(self, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    def test_triggers_record_all_operations(self):
+        db.save_client(Client("Alice", "a@b.ru", "+79990000000", "ул. Мира"))
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE orders SET total = 20 WHERE id = 1")
+        conn.commit()
+        db.delete_client_by_name("Alice")
+        changes, watermark = changelog.changes_since(conn)
+        self.assertEqual(
+            [(c["table"], c["op"]) for c in changes],
+            [("clients", "insert"), ("orders", "insert"), ("orders", "update"), ("clients", "delete")]
+        )
+        later, same = changelog.changes_since(conn, watermark)
+        self.assertEqual((later, same), ([], watermark))
+        orders_only, _ = changelog.changes_since(conn, table="orders")
+        self.assertEqual(len(orders_only), 2)
+        conn.close()
+
+    def test_incremental_export_appends_only_changes(self):
+        path = os.path.join(self.tmp.name, "changes.csv")
+        for i in range(3):
+            db.save_order(Order(f"Клиент {i}", [Product("Чай", 10.0 + i)]))
+        self.assertEqual(db.export_orders_to_csv(path, incremental=True), 3)
+        self.assertEqual(db.export_orders_to_csv(path, incremental=True), 0)
+
+        db.save_order(Order("Клиент 9", [Product("Квас", 5.0)]))
+        db.delete_order_by_index(0)
+        self.assertEqual(db.export_orders_to_csv(path, incremental=True), 2)
+
+        rows = self.read_csv(path)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual([(r["id"], r["op"]) for r in rows[3:]], [("1", "delete"), ("4", "insert")])
+        self.assertEqual(rows[4]["client"], "Клиент 9")
+
+    def test_full_export_unchanged(self):
+        path = os.path.join(self.tmp.name, "full.csv")
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        db.export_orders_to_csv(path)
+        rows = self.read_csv(path)
+        self.assertEqual(list(rows[0].keys()), ["client", "products", "date", "total"])
+
+    def test_purge_up_to_min_watermark(self):
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        db.export_orders_to_csv(os.path.join(self.tmp.name, "a.csv"), incremental=True)
+        db.save_order(Order("Bob", [Product("Чай", 10.0)]))
+        conn = sqlite3.connect(self.db_path)
+        changelog.purge_changes(conn)
+        conn.commit()
+        changes, _ = changelog.changes_since(conn, table="orders")
+        self.assertEqual([c["row_id"] for c in changes], [2])
+        conn.close()
+
+    def test_export_purges_processed_changes(self):
+        path = os.path.join(self.tmp.name, "changes.csv")
+        db.save_order(Order("Alice", [Product("Чай", 10.0)]))
+        db.export_orders_to_csv(path, incremental=True)
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0], 0)
+        db.save_order(Order("Bob", [Product("Чай", 10.0)]))
+        self.assertEqual(db.export_orders_to_csv(path, incremental=True), 1)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0], 0)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Unit-тесты колоночного снимка заказов.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from analysis import client_stats
+from columnar import (
+    MISSING_CLIENT, client_stats_columnar, daily_order_counts_columnar, monthly_sales_columnar,
+    open_columnar_snapshot, write_columnar_snapshot
+)
+
+
+class TestColumnarSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, client_id TEXT, products TEXT, date TEXT, total REAL)")
+        self.rows = [
+            ("Alice", "2025-08-01", 100.0), ("Bob", "2025-08-01", 50.5), ("Alice", "2025-08-15", 20.0),
+            ("Carol", "2025-07-31", 10.0), ("Bob", "2024-08-03", 5.0), ("Alice", "не дата", 1.0),
+        ]
+        self.conn.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (?, '', ?, ?)", self.rows)
+        self.directory = os.path.join(self.tmp.name, "snapshot")
+        write_columnar_snapshot(self.directory, self.conn, chunksize=2)
+        self.snapshot = open_columnar_snapshot(self.directory)
+
+    def tearDown(self):
+        del self.snapshot
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_files_are_memory_mapped(self):
+        self.assertEqual(len(self.snapshot), 6)
+        self.assertIsInstance(self.snapshot.totals, np.memmap)
+        self.assertEqual(self.snapshot.dictionary, ["Alice", "Bob", "Carol"])
+
+    def test_client_stats_match_pandas_path(self):
+        orders = [{"client": c, "total": t} for c, _, t in self.rows]
+        expected = client_stats(orders).sort_values("Клиент").reset_index(drop=True)
+        actual = client_stats_columnar(self.snapshot).sort_values("Клиент").reset_index(drop=True)
+        self.assertEqual(list(actual["Количество заказов"]), list(expected["Количество заказов"]))
+        np.testing.assert_allclose(actual["Общая сумма"], expected["Общая сумма"])
+
+    def test_daily_and_monthly(self):
+        daily = daily_order_counts_columnar(self.snapshot, 2025, 8)
+        self.assertEqual(daily[1], 2)
+        self.assertEqual(daily[15], 1)
+        self.assertEqual(daily.sum(), 3)
+        monthly = monthly_sales_columnar(self.snapshot)
+        self.assertAlmostEqual(monthly[8], 175.5)
+        self.assertAlmostEqual(monthly[7], 10.0)
+
+    def test_integer_client_keys_use_names(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE clients (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, client_id INTEGER, products TEXT, date TEXT, total REAL)")
+        conn.executemany("INSERT INTO clients (id, name) VALUES (?, ?)", [(1, "Alice"), (2, "Alice")])
+        conn.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (?, '', '2025-08-01', ?)",
+                         [(1, 10.0), (2, 20.0), (2, 5.0)])
+        directory = os.path.join(self.tmp.name, "by_id")
+        write_columnar_snapshot(directory, conn)
+        conn.close()
+        snapshot = open_columnar_snapshot(directory)
+        self.assertEqual(snapshot.dictionary, [1, 2])
+        stats = client_stats_columnar(snapshot)
+        # Однофамильцы остаются разными клиентами
+        self.assertEqual(list(stats["Клиент"]), ["Alice", "Alice"])
+        self.assertEqual(list(stats["Общая сумма"]), [10.0, 25.0])
+
+    def test_orders_without_client(self):
+        self.conn.execute("INSERT INTO orders (client_id, products, date, total) VALUES (NULL, '', '2025-08-02', 7.0)")
+        write_columnar_snapshot(self.directory, self.conn)
+        snapshot = open_columnar_snapshot(self.directory)
+        self.assertEqual(snapshot.dictionary, ["Alice", "Bob", "Carol"])
+        self.assertEqual(snapshot.clients[-1], MISSING_CLIENT)
+        # Как в pandas: заказ без клиента не попадает в статистику клиентов, но входит в продажи
+        stats = client_stats_columnar(snapshot).set_index("Клиент")
+        self.assertEqual(stats["Количество заказов"].sum(), 6)
+        self.assertAlmostEqual(monthly_sales_columnar(snapshot)[8], 182.5)
+
+    def test_failed_write_keeps_old_snapshot(self):
+        self.conn.execute("DROP TABLE orders")
+        with self.assertRaises(sqlite3.OperationalError):
+            write_columnar_snapshot(self.directory, self.conn)
+        self.assertFalse(os.path.exists(self.directory + ".tmp"))
+        self.assertEqual(len(open_columnar_snapshot(self.directory)), 6)
+
+    def test_rewrite_replaces_snapshot(self):
+        self.conn.execute("DELETE FROM orders WHERE client_id = 'Carol'")
+        self.assertEqual(write_columnar_snapshot(self.directory, self.conn), 5)
+        self.assertEqual(len(open_columnar_snapshot(self.directory)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Unit-тесты панели показателей.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import cache
+import dashboard
+import db
+import storage
+from datagen import generate_database
+from models import Order, Product
+
+TODAY = date(2025, 3, 12)  # среда
+
+
+class FakeLabel:
+    """Замена метки Tk: запоминает текст."""
+    text = None
+
+    def config(self, text):
+        self.text = text
+
+
+class TestDashboard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        generate_database(self.db_path, orders=3_000, clients=30, start=date(2025, 1, 1), days=90)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+        self.conn = sqlite3.connect(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def expected(self, since):
+        rows = [(o["client_id"], o["client"], round(o["total"] * 100))
+                for o in db.load_orders.uncached()
+                if since <= o["date"][:10] <= TODAY.isoformat()]
+        kopecks = sum(r[2] for r in rows)
+        return {"orders": len(rows), "revenue": kopecks / 100,
+                "average": round(kopecks / len(rows) / 100, 2) if rows else 0.0}, rows
+
+    def test_kpis_match_orders(self):
+        kpis = dashboard.load_kpis(self.conn, TODAY)
+        for period, since in (("today", "2025-03-12"), ("week", "2025-03-10"), ("month", "2025-03-01")):
+            self.assertEqual(kpis[period], self.expected(since)[0], period)
+
+        _, rows = self.expected("2025-03-01")
+        totals = {}
+        for client_id, name, kopecks in rows:
+            current = totals.setdefault(client_id, [name, 0, 0])
+            current[1] += 1
+            current[2] += kopecks
+        name, orders, kopecks = min(totals.values(), key=lambda t: (-t[1], -t[2]))
+        self.assertEqual(kpis["top_client"][:2], (name, orders))
+
+    def test_query_reads_only_recent_orders(self):
+        details = [row[3] for row in self.conn.execute(
+            "EXPLAIN QUERY PLAN " + dashboard.KPI_SQL, dashboard.period_bounds(TODAY))]
+        self.assertIn("SEARCH orders USING INDEX idx_orders_date_id (date>? AND date<?)", details)
+        self.assertFalse([d for d in details if d.startswith("SCAN orders")])
+
+    def test_empty_period(self):
+        kpis = dashboard.load_kpis(self.conn, date(2030, 1, 1))
+        self.assertEqual(kpis["month"], {"orders": 0, "revenue": 0.0, "average": 0.0})
+        self.assertIsNone(kpis["top_client"])
+
+    def test_source_refreshes_only_on_change(self):
+        source = dashboard.KpiSource(clock=lambda: TODAY)
+        first = source.poll()
+        self.assertIsNotNone(first)
+        self.assertIsNone(source.poll())
+        db.save_order(Order(1, [Product("Чай", 150.0)], date=f"{TODAY} 12:00:00"))
+        updated = source.poll()
+        self.assertEqual(updated["today"]["orders"], first["today"]["orders"] + 1)
+        self.assertIsNone(source.poll())
+
+    def test_refresh_without_sql_storage(self):
+        panel = dashboard.Dashboard.__new__(dashboard.Dashboard)
+        panel.source, panel._top_label = dashboard.KpiSource(clock=lambda: TODAY), FakeLabel()
+        with storage.using(storage.PythonBackend()):
+            self.assertFalse(panel.refresh(force=True))
+        self.assertTrue(panel._top_label.text.startswith("Нет данных"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+"""
+Unit-тесты постраничного просмотра заказов.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import cache
+import db
+import leaderboard
+from datagen import generate_database
+from models import Order, Product
+
+
+class TestOrdersPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        generate_database(self.db_path, orders=500, clients=20, start=date(2025, 1, 1), days=60)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+        conn = sqlite3.connect(self.db_path)
+        self.rows = conn.execute("""SELECT o.id, c.name, o.date, o.total, o.client_id
+            FROM orders o JOIN clients c ON c.id = o.client_id""").fetchall()
+        conn.close()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def walk(self, **kwargs):
+        ids, after = [], None
+        while True:
+            orders, after = db.load_orders_page(after=after, limit=37, **kwargs)
+            ids.extend(o["id"] for o in orders)
+            if after is None:
+                return ids
+
+    def test_pages_cover_sorted_table_without_gaps(self):
+        for sort, position in (("date", 2), ("total", 3)):
+            for descending in (False, True):
+                expected = [r[0] for r in sorted(self.rows, key=lambda r: (r[position], r[0]), reverse=descending)]
+                self.assertEqual(self.walk(sort=sort, descending=descending), expected)
+
+    def test_filters(self):
+        client = self.rows[0][1]
+        expected = sorted(r[0] for r in self.rows
+                          if r[1] == client and "2025-01-10" <= r[2] <= "2025-01-31" and 100 <= r[3] <= 600)
+        ids = self.walk(client=client, date_from="2025-01-10", date_to="2025-01-31", min_total=100, max_total=600)
+        self.assertEqual(sorted(ids), expected)
+        self.assertEqual(self.walk(client="Нет такого"), [])
+        by_id = sorted(r[0] for r in self.rows if r[4] == self.rows[0][4])
+        self.assertEqual(sorted(self.walk(client_id=self.rows[0][4])), by_id)
+
+    def test_client_filter_matches_prefix(self):
+        prefix = self.rows[0][1].split()[0]
+        expected = sorted(r[0] for r in self.rows if r[1].startswith(prefix))
+        self.assertEqual(sorted(self.walk(client=prefix)), expected)
+
+    def test_sort_uses_index(self):
+        conn = sqlite3.connect(self.db_path)
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM orders WHERE (total, id) > (?, ?) ORDER BY total, id LIMIT 10",
+            (100, 1)))
+        conn.close()
+        self.assertIn("idx_orders_total_id", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_delete_order_by_id(self):
+        order_id = self.rows[0][0]
+        self.assertTrue(db.delete_order_by_id(order_id))
+        self.assertFalse(db.delete_order_by_id(order_id))
+        self.assertNotIn(order_id, self.walk())
+
+    def test_unknown_sort_column(self):
+        with self.assertRaises(ValueError):
+            db.load_orders_page(sort="client_id; DROP TABLE orders")
+
+
+class TestClientKeyMigration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        # База старого формата: в orders.client_id хранится имя клиента
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT, address TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id TEXT, products TEXT, date TEXT, total REAL)")
+        conn.executemany("INSERT INTO clients (name) VALUES (?)", [("Alice",), ("Bob",), ("Alice",)])
+        conn.executemany("INSERT INTO orders (client_id, products, date, total) VALUES (?, 'Чай', '2025-01-01', ?)",
+                         [("Alice", 10.0), ("Bob", 20.0), ("Carol", 30.0), ("Alice", 40.0), (None, 1.0), ("Bob", 5.0)])
+        conn.execute("DELETE FROM orders WHERE id = 6")
+        conn.commit()
+        conn.close()
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_names_resolved_to_ids(self):
+        db.initialize_db()
+        conn = sqlite3.connect(self.db_path)
+        column_type = [row[2] for row in conn.execute("PRAGMA table_info(orders)") if row[1] == "client_id"][0]
+        self.assertEqual(column_type, "INTEGER")
+        rows = conn.execute("SELECT id, client_id FROM orders ORDER BY id").fetchall()
+        carol = conn.execute("SELECT id FROM clients WHERE name = 'Carol'").fetchone()[0]
+        conn.close()
+        # Однофамильцы — клиенту с наименьшим ID; отсутствующий клиент создан
+        self.assertEqual(rows, [(1, 1), (2, 2), (3, carol), (4, 1), (5, None)])
+        self.assertEqual([o["client"] for o in db.load_orders.uncached()], ["Alice", "Bob", "Carol", "Alice", None])
+
+    def test_migration_keeps_sequence_and_triggers(self):
+        db.initialize_db()
+        db.initialize_db()  # повторный запуск ничего не меняет
+        db.save_order(Order("Bob", [Product("Квас", 5.0)]))
+        conn = sqlite3.connect(self.db_path)
+        last = conn.execute("SELECT id, client_id FROM orders ORDER BY id DESC LIMIT 1").fetchone()
+        logged = conn.execute("SELECT row_id FROM change_log WHERE table_name = 'orders'").fetchall()
+        conn.close()
+        self.assertEqual(last, (7, 2))
+        self.assertEqual(logged, [(7,)])
+
+
+class TestTransaction(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+        db.initialize_db()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_batch_keeps_leaderboards_consistent(self):
+        with db.transaction() as tx:
+            ids = [tx.add_client(f"Клиент {i}", "", "", "") for i in range(3)]
+            tx.save_orders([Order(ids[i % 3], [Product("Чай", 150.0), Product("Сыр", 480.0)], date=f"2025-01-{i + 1:02d}")
+                            for i in range(10)])
+            tx.save_orders([Order("Новый", [Product("Квас", 90.0)])])
+            tx.delete_order_by_index(0)
+        conn = db.connect()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 10)
+        self.assertEqual(leaderboard.check_leaderboards(conn), {"clients": [], "products": []})
+        conn.close()
+
+    def test_single_commit(self):
+        statements = []
+        real_connect = sqlite3.connect
+
+        def tracing_connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        with patch("sqlite3.connect", tracing_connect):
+            with db.transaction() as tx:
+                client_id = tx.add_client("Иван", "", "", "")
+                tx.save_orders([Order(client_id, [Product("Чай", 150.0)]) for _ in range(50)])
+        self.assertEqual(statements.count("BEGIN IMMEDIATE"), 1)
+        self.assertEqual(statements.count("COMMIT"), 1)
+        self.assertEqual(len(db.load_orders()), 50)
+
+    def test_rollback_on_error(self):
+        version = cache.data_version()
+        with self.assertRaises(ValueError):
+            with db.transaction() as tx:
+                tx.add_client("Иван", "", "", "")
+                raise ValueError
+        self.assertEqual(db.load_clients.uncached(), [])
+        self.assertEqual(cache.data_version(), version)
+
+    def test_import_message_shown_after_commit(self):
+        path = os.path.join(self.tmp.name, "clients.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Имя,Email,Телефон,Адрес\nИван,i@x.ru,1,Москва\n,,,\nОльга,o@x.ru,2,Казань\n")
+
+        def showinfo(title, message):
+            # Пока открыто окно, другой процесс может писать: транзакция импорта уже зафиксирована
+            conn = sqlite3.connect(self.db_path, timeout=0)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.rollback()
+            conn.close()
+            shown.append(message)
+
+        shown = []
+        with patch("db.filedialog.askopenfilename", return_value=path), \
+                patch("db.messagebox.showinfo", showinfo), patch("builtins.print"):
+            db.import_clients_from_csv()
+        self.assertEqual(shown, ["Импортировано клиентов: 2"])
+        self.assertEqual([c.name for c in db.load_clients()], ["Иван", "Ольга"])
+
+
+class TestBusyRetry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        self.patchers = [patch("db.DB_NAME", self.db_path), patch("db.BUSY_TIMEOUT", 0.01),
+                         patch("db.RETRY_BACKOFF", 0.01), patch("db.RETRY_BACKOFF_MAX", 0.05),
+                         patch.dict("db.write_stats", {"retries": 0, "backoff": 0.0, "failures": 0})]
+        for p in self.patchers:
+            p.start()
+        db.initialize_db()
+        # Другой процесс удерживает блокировку записи
+        self.locker = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.locker.execute("BEGIN EXCLUSIVE")
+
+    def tearDown(self):
+        self.locker.close()
+        cache.close_monitors()
+        for p in reversed(self.patchers):
+            p.stop()
+        self.tmp.cleanup()
+
+    def count_products(self):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_write_retried_until_lock_released(self):
+        timer = threading.Timer(0.1, self.locker.rollback)
+        timer.start()
+        with patch("db.WRITE_RETRIES", 50):
+            db.save_product(Product("Чай", 150.0, "Напитки"))
+        timer.join()
+        self.assertGreater(db.write_stats["retries"], 0)
+        self.assertEqual(db.write_stats["failures"], 0)
+        self.assertEqual(self.count_products(), 1)
+
+    def test_gives_up_after_retries(self):
+        with patch("db.WRITE_RETRIES", 2):
+            with self.assertRaises(sqlite3.OperationalError) as ctx:
+                db.save_order(Order(1, [Product("Чай", 150.0)]))
+        self.assertTrue(db.is_busy_error(ctx.exception))
+        self.assertEqual(db.write_stats["retries"], 2)
+        self.assertEqual(db.write_stats["failures"], 1)
+        self.locker.rollback()
+        # Неудачные попытки ничего не оставили в базе
+        self.assertEqual(db.load_orders.uncached(), [])
+
+    def test_other_errors_not_retried(self):
+        self.assertFalse(db.is_busy_error(sqlite3.OperationalError("no such table: orders")))
+        self.assertFalse(db.is_busy_error(ValueError("database is locked")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Unit-тесты инкрементальных счётчиков по клиентам и товарам.
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import archive
+import async_db
+import cache
+import db
+import leaderboard
+from analysis import top_clients_frame
+from datagen import generate_database
+from models import Order, Product
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        generate_database(self.db_path, orders=400, clients=15, start=date(2025, 1, 1), days=90)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def assertConsistent(self):
+        conn = sqlite3.connect(self.db_path)
+        report = leaderboard.check_leaderboards(conn)
+        conn.close()
+        self.assertEqual(report, {"clients": [], "products": []})
+
+    def test_top_clients_match_full_aggregation(self):
+        self.assertConsistent()
+        conn = sqlite3.connect(self.db_path)
+        expected = conn.execute("""SELECT client_id, COUNT(*), MAX(date) FROM orders
+            GROUP BY client_id ORDER BY COUNT(*) DESC, client_id LIMIT 5""").fetchall()
+        top = leaderboard.top_clients(conn, 5)
+        conn.close()
+        self.assertEqual([(r[0], r[2], r[4]) for r in top], expected)
+        self.assertEqual(list(top_clients_frame(5)["Количество заказов"]), [r[1] for r in expected])
+
+    def test_writes_keep_counters_consistent(self):
+        db.save_order(Order(1, [Product("Чай", 150.0), Product("Новинка", 0.1)], date=date(2026, 1, 1)))
+        conn = sqlite3.connect(self.db_path)
+        newest = conn.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+        self.assertEqual(conn.execute("SELECT last_order_date FROM client_totals WHERE client_id = 1").fetchone(),
+                         ("2026-01-01",))
+        conn.close()
+        self.assertConsistent()
+
+        # Удаление последнего заказа возвращает прежнюю дату, товар без заказов исчезает
+        self.assertTrue(db.delete_order_by_id(newest))
+        db.delete_order_by_index(0)
+        self.assertConsistent()
+        conn = sqlite3.connect(self.db_path)
+        self.assertIsNone(conn.execute("SELECT * FROM product_totals WHERE product = 'Новинка'").fetchone())
+        conn.close()
+
+    def test_async_and_archive_writes(self):
+        async def run():
+            async with async_db.AsyncDatabase(self.db_path) as adb:
+                await adb.save_order(Order(2, [Product("Квас", 90.0)]))
+                await adb.delete_order(1)
+                await adb.delete_order_by_index(0)
+        asyncio.run(run())
+        self.assertConsistent()
+        archive.archive_orders("2025-02-15", "month", os.path.join(self.tmp.name, "archive"))
+        self.assertConsistent()
+
+    def test_check_detects_drift_and_rebuild_repairs(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE orders SET client_id = 4 WHERE client_id = 3")
+        conn.execute("UPDATE product_totals SET quantity = quantity + 1 WHERE product = 'Чай'")
+        report = leaderboard.check_leaderboards(conn)
+        self.assertEqual(report, {"clients": [3, 4], "products": ["Чай"]})
+        leaderboard.rebuild_leaderboards(conn.cursor())
+        conn.commit()
+        conn.close()
+        self.assertConsistent()
+
+    def test_top_queries_use_index(self):
+        conn = sqlite3.connect(self.db_path)
+        for by, index in (("orders", "idx_client_totals_orders"), ("revenue", "idx_client_totals_revenue")):
+            plan = " ".join(row[3] for row in conn.execute(
+                f"""EXPLAIN QUERY PLAN SELECT t.client_id FROM client_totals t
+                    LEFT JOIN clients c ON c.id = t.client_id
+                    ORDER BY {leaderboard.CLIENT_ORDERINGS[by]} LIMIT 5"""))
+            self.assertIn(index, plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+        conn.close()
+
+    def test_existing_database_is_backfilled(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DROP TABLE client_totals")
+        conn.execute("DROP TABLE product_totals")
+        conn.commit()
+        conn.close()
+        db.initialize_db()
+        self.assertConsistent()
+
+
+if __name__ == "__main__":
+    unittest.main()
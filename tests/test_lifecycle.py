@@ -0,0 +1,184 @@
+"""
+Тесты освобождения ресурсов окон и нагрузочный тест интерфейса: окна
+многократно открываются и закрываются, рост памяти должен быть ограничен.
+
+Нагрузочный тест пропускается, если нет дисплея для Tkinter.
+"""
+
+import gc
+import os
+import tempfile
+import tkinter as tk
+import tracemalloc
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import matplotlib.pyplot as plt
+
+import cache
+import db
+import lifecycle
+import tasks
+from datagen import generate_database
+from models import Product
+
+# Сколько раз открывается каждое окно после прогрева
+SOAK_ROUNDS = 20
+WARMUP_ROUNDS = 3
+# Допустимый рост памяти Python за все циклы, байт
+MAX_GROWTH = 1024 * 1024
+
+
+def run_now(key, title, work, on_done):
+    """Синхронная замена `gui.run_with_progress`: окна с графиками открываются сразу."""
+    on_done(work(tasks.CancelToken()))
+
+
+class FakeWindow:
+    """Минимальная замена окна Tk для проверки обработчиков закрытия."""
+    def __init__(self, name=".fake"):
+        self.name = name
+        self.pending = {}
+        self.handlers = []
+
+    def __str__(self):
+        return self.name
+
+    def protocol(self, name, func):
+        pass
+
+    def bind(self, sequence, func, add=None):
+        self.handlers.append(func)
+
+    def after(self, ms, func):
+        after_id = f"after#{len(self.pending)}"
+        self.pending[after_id] = func
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def destroy(self):
+        event = type("Event", (), {"widget": self})()
+        for handler in self.handlers:
+            handler(event)
+
+
+class TestLifecycle(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        generate_database(self.db_path, orders=50, clients=5)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_close_releases_figure_and_pending_calls(self):
+        window = FakeWindow()
+        lifecycle.manage_window(window)
+        figure = plt.figure()
+        lifecycle.attach_figure(window, figure)
+        closed = []
+        lifecycle.on_close(window, lambda: closed.append(True))
+        lifecycle.after(window, 1000, lambda: None)
+        self.assertEqual(lifecycle.managed_windows(), 1)
+
+        window.destroy()
+        self.assertEqual(closed, [True])
+        self.assertNotIn(figure.number, plt.get_fignums())
+        self.assertEqual(window.pending, {})
+        self.assertEqual(lifecycle.managed_windows(), 0)
+
+    def test_purge_stale_cache_entries(self):
+        db.load_orders()
+        db.load_clients()
+        self.assertEqual(cache.purge_stale(), 0)
+        db.save_product(Product("Пирог", 200.0))
+        self.assertGreaterEqual(cache.purge_stale(), 2)
+        self.assertEqual(cache.purge_stale(), 0)
+
+    def test_memory_report(self):
+        lifecycle.start_tracking()
+        try:
+            report = lifecycle.memory_report(limit=3)
+        finally:
+            tracemalloc.stop()
+        self.assertIn("Память:", report)
+        self.assertIn("Окон: 0", report)
+
+
+class TestWindowSoak(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.root = tk.Tk()
+        except tk.TclError as e:
+            raise unittest.SkipTest(f"Нет дисплея для Tkinter: {e}")
+        cls.root.withdraw()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, "ecom.db")
+        generate_database(cls.db_path, orders=2_000, clients=50, start=date(2025, 1, 1), days=365)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.root.destroy()
+        cache.close_monitors()
+        cls.tmp.cleanup()
+
+    def windows(self):
+        import analysis
+        import gui
+        real_run_with_progress = gui.run_with_progress
+        return [
+            gui.create_client_form, gui.create_order_form, gui.view_orders, gui.show_analysis_menu,
+            gui.show_product_menu, gui.show_clients_menu, gui.show_client_list, gui.create_product_form,
+            gui.manage_products, gui.archive_orders_form,
+            analysis.show_client_stats, analysis.top_clients_from_db, analysis.order_trend_from_db,
+            analysis.sales_trend_monthly_change, analysis.show_cohort_retention, analysis.show_rfm_segments,
+            analysis.show_top_products, analysis.show_regional_sales,
+            # Само окно прогресса: фоновая операция отменяется его закрытием
+            lambda: real_run_with_progress("soak_progress", "Проверка", lambda token: None, lambda result: None),
+        ]
+
+    def cycle(self, openers):
+        import gui
+        for open_window in openers:
+            open_window()
+            self.root.update()
+            # Закрытие крестиком: обработчик WM_DELETE_WINDOW
+            for window in list(gui.opened_windows.values()):
+                window.tk.call(window.protocol("WM_DELETE_WINDOW"))
+            self.root.update()
+
+    def test_open_close_every_window(self):
+        import gui
+        openers = self.windows()
+        with patch("db.DB_NAME", self.db_path), patch("gui.run_with_progress", run_now), \
+                patch("tkinter.messagebox.showinfo"), patch("tkinter.messagebox.showerror"):
+            for _ in range(WARMUP_ROUNDS):
+                self.cycle(openers)
+            tracemalloc.start()
+            try:
+                gc.collect()
+                before = tracemalloc.get_traced_memory()[0]
+                for _ in range(SOAK_ROUNDS):
+                    self.cycle(openers)
+                gc.collect()
+                growth = tracemalloc.get_traced_memory()[0] - before
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(gui.opened_windows, {})
+        self.assertEqual(lifecycle.managed_windows(), 0)
+        self.assertEqual(self.root.children, {})
+        self.assertEqual(plt.get_fignums(), [])
+        self.assertLess(growth, MAX_GROWTH, f"Рост памяти за {SOAK_ROUNDS} циклов: {growth} байт")
+
+
+if __name__ == "__main__":
+    unittest.main()
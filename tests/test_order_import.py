@@ -0,0 +1,96 @@
+"""
+Unit-тесты массового импорта заказов из CSV.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import cache
+import db
+import leaderboard
+from datagen import client_name, generate_database
+from order_import import ImportFormatError, import_orders_from_csv
+
+
+class TestOrderImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+        generate_database(self.db_path, orders=0, clients=10)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def write_csv(self, text):
+        path = os.path.join(self.tmp.name, "import.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def orders(self):
+        return [(o["client"], o["products"], o["date"], o["total"]) for o in db.load_orders.uncached()]
+
+    def assertLeaderboardsConsistent(self):
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(leaderboard.check_leaderboards(conn), {"clients": [], "products": []})
+        conn.close()
+
+    def test_export_round_trip(self):
+        source = os.path.join(self.tmp.name, "source.db")
+        generate_database(source, orders=250, clients=10, start=date(2025, 1, 1), days=30)
+        with patch("db.DB_NAME", source):
+            exported = self.orders()
+            db.export_orders_to_csv(os.path.join(self.tmp.name, "export.csv"))
+
+        report = import_orders_from_csv(os.path.join(self.tmp.name, "export.csv"), batch_size=40)
+        self.assertEqual((report["imported"], report["rejected"], report["rows"]), (250, 0, 250))
+        self.assertEqual(self.orders(), exported)
+        self.assertLeaderboardsConsistent()
+
+    def test_unresolved_references_reported(self):
+        path = self.write_csv(
+            "client,products,date,total\n"
+            f"{client_name(0)},\"Чай,Квас\",2025-01-01,\n"
+            "Нет такого,Чай,2025-01-02,150\n"
+            f"{client_name(1)},\"Чай,Пирог\",2025-01-03,10\n"
+            f"{client_name(2)},Чай,01.01.2025,150\n")
+        report = import_orders_from_csv(path)
+        self.assertEqual((report["imported"], report["rejected"]), (1, 3))
+        self.assertEqual(report["unresolved_clients"], {"Нет такого": 1})
+        self.assertEqual(report["unresolved_products"], {"Пирог": 1})
+        self.assertEqual([line for line, _ in report["errors"]], [3, 4, 5])
+        # Пустая сумма считается по ценам справочника
+        self.assertEqual(self.orders(), [(client_name(0), "Чай,Квас", "2025-01-01", 240.0)])
+
+    def test_line_items(self):
+        path = self.write_csv(
+            "order,client,product,quantity,price,date\n"
+            f"A1,{client_name(3)},Чай,2,,2025-02-01\n"
+            f"A1,{client_name(3)},Сыр,1,400,2025-02-01\n"
+            f"A2,{client_name(4)},Квас,,,2025-02-02\n"
+            f"A3,{client_name(4)},Квас,1,,2025-02-03\n"
+            f"A3,{client_name(4)},Пирог,1,,2025-02-03\n")
+        report = import_orders_from_csv(path)
+        self.assertEqual((report["imported"], report["rejected"], report["rows"]), (2, 1, 5))
+        self.assertEqual(report["unresolved_products"], {"Пирог": 1})
+        self.assertEqual(self.orders(), [
+            (client_name(3), "Чай,Чай,Сыр", "2025-02-01", 700.0),
+            (client_name(4), "Квас", "2025-02-02", 90.0),
+        ])
+        self.assertLeaderboardsConsistent()
+
+    def test_unknown_format(self):
+        with self.assertRaises(ImportFormatError):
+            import_orders_from_csv(self.write_csv("name,email\nИван,ivan@example.com\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+Регрессионные тесты планов запросов слоя данных.
+
+Тест создаёт большую сгенерированную базу, выполняет сценарий из
+функций `db`, `analysis`, `addresses`, `leaderboard`, `sketches` и
+`dashboard` (их же вызывает интерфейс) и перехватывает через
+`set_trace_callback` все выполненные SQL-запросы. Для каждого запроса
+проверяется `EXPLAIN QUERY PLAN`: полный просмотр таблицы (`SCAN` без
+индекса) допустим только для запросов из `ALLOWED_SCANS`, где он ожидаем
+по смыслу (выгрузка всей таблицы, агрегаты по всем заказам).
+
+Время выполнения запросов чтения сравнивается с эталоном из
+`query_baselines.json`. Обновить эталон после намеренного изменения:
+ECOM_UPDATE_QUERY_BASELINES=1 python -m pytest tests/test_query_plans.py
+"""
+
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import addresses
+import analysis
+import cache
+import dashboard
+import db
+import leaderboard
+import sketches
+from datagen import client_name, generate_database
+from models import Client, Order, Product
+
+ORDERS = 100_000
+CLIENTS = 2_000
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_baselines.json")
+UPDATE_ENV = "ECOM_UPDATE_QUERY_BASELINES"
+# Допустимое замедление относительно эталона: во столько раз плюс абсолютный запас
+SLOWDOWN_FACTOR = 5.0
+SLOWDOWN_SLACK = 0.02
+
+# Запросы, которым полный просмотр таблицы нужен по смыслу
+ALLOWED_SCANS = {
+    "SELECT name, email, phone, address, id FROM clients": "список всех клиентов",
+    "SELECT name, price, category, id FROM products": "список всех товаров",
+    "SELECT id, name FROM clients": "имена всех клиентов для подписей",
+    "SELECT o.id, c.name, o.client_id, o.products, o.date, o.total FROM main.orders o "
+    "LEFT JOIN main.clients c ON c.id = o.client_id ORDER BY o.id": "загрузка и выгрузка всех заказов",
+    "SELECT client_id, total FROM orders": "статистика по всем клиентам",
+    "SELECT client_id, date FROM orders": "когорты по всем заказам",
+    "SELECT client_id, date, total FROM orders": "RFM по всем заказам",
+    "SELECT date, total FROM orders": "продажи по всем месяцам",
+    "SELECT client_id, products, date, CAST(ROUND(COALESCE(total, ?) * ?) AS INTEGER) FROM main.orders":
+        "проверка счётчиков пересчётом по всем заказам",
+    "SELECT client_id, order_count, revenue_kopecks, last_order_date FROM main.client_totals":
+        "проверка счётчиков",
+    "SELECT product, quantity, order_count FROM main.product_totals": "проверка счётчиков",
+    "SELECT id FROM orders ORDER BY id LIMIT ? OFFSET ?": "удаление заказа по позиции в списке (OFFSET)",
+    "SELECT DISTINCT c.address FROM clients c LEFT JOIN address_lookup l ON l.address = c.address "
+    "WHERE c.address IS NOT NULL AND (l.address IS NULL OR l.version <> ?)": "поиск ещё не разобранных адресов",
+    "SELECT c.id, c.address, l.version, l.region, l.city, l.street, l.house FROM clients c "
+    "LEFT JOIN address_lookup l ON l.address = c.address": "адреса всех клиентов для отчёта по регионам",
+}
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_FULL_SCAN = re.compile(r"^SCAN (\S+)(?!\S| USING)")
+_SUBQUERY = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\S+)")
+
+
+def normalize(sql):
+    """Заменяет литералы на ? и схлопывает пробелы: один ключ на запрос."""
+    return " ".join(_LITERAL.sub("?", sql).split())
+
+
+def full_scans(conn, sql):
+    """Возвращает таблицы, которые план запроса просматривает целиком."""
+    details = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    subqueries = {m.group(1) for m in map(_SUBQUERY.match, details) if m}
+    scans = [m.group(1) for m in map(_FULL_SCAN.match, details) if m]
+    return [name for name in scans if name not in subqueries and name != "CONSTANT"]
+
+
+def scenario():
+    """Обращения к слою данных, которые выполняет приложение."""
+    client = client_name(7)
+    db.load_clients()
+    db.load_products()
+    db.load_orders()
+    db.load_orders(date_from="2024-03-01", date_to="2024-03-31")
+    for sort in db.ORDER_SORT_COLUMNS:
+        for descending in (False, True):
+            orders, after = db.load_orders_page(sort=sort, descending=descending, limit=50)
+            db.load_orders_page(sort=sort, descending=descending, after=after, limit=50)
+    db.load_orders_page(client=client[:5], limit=50)
+    db.load_orders_page(client=client, date_from="2024-01-01", date_to="2024-06-30", limit=50)
+    db.load_orders_page(client_id=8, sort="total", descending=True, limit=50)
+    db.load_orders_page(date_from="2024-02-01", date_to="2024-02-29", min_total=100, max_total=500, limit=50)
+    db.save_client(Client("Новый Клиент", "new@example.com", "+79120000000", "г. Казань"))
+    db.save_order(Order(client, [Product("Чай", 150.0)]))
+    db.save_order(Order(3, [Product("Квас", 90.0), Product("Сыр", 480.0)]))
+    db.delete_order_by_id(10)
+    db.delete_order_by_index(5)
+    db.save_product(Product("Пирог", 200.0, "Выпечка"))
+    db.delete_product_by_id(db.load_products()[-1].id)
+    db.delete_client_by_name("Новый Клиент")
+    analysis.client_stats_from_db()
+    analysis.daily_order_counts(2024, 8)
+    analysis.monthly_sales()
+    analysis.cohort_retention()
+    analysis.rfm_scores()
+    analysis.regional_sales()
+    analysis.top_clients_frame(5)
+    analysis.top_clients_frame(5, by="revenue")
+    conn = db.connect()
+    addresses.sync_address_lookup(conn)
+    leaderboard.top_products(conn, 20)
+    leaderboard.check_leaderboards(conn)
+    dashboard.load_kpis(conn, date(2024, 12, 20))
+    sketches.range_sketch(conn, "2024-03-01", "2024-03-31")
+    sketches.distinct_clients(conn, "2024-01-01", "2024-06-30", by="month")
+    conn.close()
+
+
+class TestQueryPlans(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, "ecom.db")
+        generate_database(cls.db_path, orders=ORDERS, clients=CLIENTS, start=date(2023, 1, 1), days=730)
+
+        cls.queries = {}
+        real_connect = sqlite3.connect
+
+        def trace(sql):
+            statement = sql.lstrip()
+            # Команды триггеров приходят с префиксом "-- TRIGGER"
+            if statement.split(None, 1)[0].upper() in ("SELECT", "WITH", "UPDATE", "DELETE"):
+                cls.queries.setdefault(normalize(statement), statement)
+
+        def tracing_connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(trace)
+            return conn
+
+        with patch("db.DB_NAME", cls.db_path), patch("sqlite3.connect", tracing_connect):
+            scenario()
+        cache.close_monitors()
+        cls.conn = sqlite3.connect(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.tmp.cleanup()
+
+    def test_scenario_collected_queries(self):
+        self.assertGreater(len(self.queries), 20)
+
+    def test_indexed_queries_do_not_scan(self):
+        violations = []
+        for key, sql in sorted(self.queries.items()):
+            scans = full_scans(self.conn, sql)
+            if scans and key not in ALLOWED_SCANS:
+                violations.append(f"{', '.join(scans)}: {key}")
+        self.assertEqual(violations, [], "Запросы с полным просмотром таблиц:\n" + "\n".join(violations))
+
+    def test_allowed_scans_are_still_used(self):
+        # Устаревшие исключения скрывали бы новые запросы с тем же текстом
+        self.assertEqual(sorted(set(ALLOWED_SCANS) - set(self.queries)), [])
+
+    def test_timing_baselines(self):
+        timings = {}
+        for key, sql in sorted(self.queries.items()):
+            if not sql.upper().startswith(("SELECT", "WITH")):
+                continue
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                self.conn.execute(sql).fetchall()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[key] = best
+
+        if os.environ.get(UPDATE_ENV) or not os.path.exists(BASELINES_PATH):
+            with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+                json.dump({key: round(value, 6) for key, value in sorted(timings.items())},
+                          f, ensure_ascii=False, indent=1)
+                f.write("\n")
+            return
+
+        with open(BASELINES_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+        # Запрос без эталона не проверялся бы вовсе, а устаревший эталон ничего не проверяет
+        self.assertEqual(sorted(set(timings) - set(baselines)), [],
+                         f"Нет эталона времени; обновите с {UPDATE_ENV}=1")
+        self.assertEqual(sorted(set(baselines) - set(timings)), [],
+                         f"Устаревшие эталоны времени; обновите с {UPDATE_ENV}=1")
+        slower = [
+            f"{timings[key] * 1000:.1f} мс (эталон {baselines[key] * 1000:.1f} мс): {key}"
+            for key in sorted(timings)
+            if timings[key] > baselines[key] * SLOWDOWN_FACTOR + SLOWDOWN_SLACK
+        ]
+        self.assertEqual(slower, [], "Запросы замедлились:\n" + "\n".join(slower))
+
+
+if __name__ == "__main__":
+    unittest.main()
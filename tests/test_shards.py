@@ -0,0 +1,119 @@
+"""
+Unit-тесты отчётов по нескольким магазинам: результат координатора должен
+совпадать с расчётом по одной базе, в которую сложены заказы всех магазинов.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import pandas as pd
+
+import analysis
+import cache
+import db
+import leaderboard
+from datagen import generate_database
+from shards import EXECUTOR_PROCESS, EXECUTOR_THREAD, ShardCoordinator, load_shards, use_store
+
+STORES = ("Север", "Юг", "Центр")
+# Сдвиг ID клиентов магазина в общей базе
+ID_OFFSET = 1_000_000
+
+
+class TestShards(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.shards = {}
+        for i, store in enumerate(STORES):
+            path = os.path.join(cls.tmp.name, f"store_{i}.db")
+            generate_database(path, orders=1_500 + 500 * i, clients=40, start=date(2024, 6, 1), days=120, seed=i)
+            cls.shards[store] = path
+
+        cls.combined = os.path.join(cls.tmp.name, "combined.db")
+        generate_database(cls.combined, orders=0, clients=0)
+        conn = sqlite3.connect(cls.combined)
+        for i, path in enumerate(cls.shards.values()):
+            offset = (i + 1) * ID_OFFSET
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            conn.execute("INSERT INTO clients (id, name, email, phone, address) "
+                         "SELECT id + ?, name, email, phone, address FROM shard.clients", (offset,))
+            conn.execute("INSERT INTO orders (client_id, products, date, total) "
+                         "SELECT client_id + ?, products, date, total FROM shard.orders ORDER BY id", (offset,))
+            conn.commit()
+            conn.execute("DETACH DATABASE shard")
+        leaderboard.rebuild_leaderboards(conn.cursor())
+        conn.commit()
+        cls.conn = conn
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cache.close_monitors()
+        cls.tmp.cleanup()
+
+    def coordinators(self):
+        for executor in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+            with self.subTest(executor=executor), ShardCoordinator(self.shards, 2, executor) as coordinator:
+                yield coordinator
+
+    def test_aggregates_match_combined_database(self):
+        expected_daily = analysis.daily_order_counts(2024, 8, conn=self.conn)
+        expected_monthly = analysis.monthly_sales(conn=self.conn)
+        for coordinator in self.coordinators():
+            pd.testing.assert_series_equal(coordinator.daily_order_counts(2024, 8), expected_daily)
+            pd.testing.assert_series_equal(coordinator.monthly_sales(), expected_monthly)
+
+    def test_top_lists_match_combined_database(self):
+        for coordinator in self.coordinators():
+            for by in leaderboard.PRODUCT_ORDERINGS:
+                self.assertEqual(coordinator.top_products(5, by), leaderboard.top_products(self.conn, 5, by))
+            for by in leaderboard.CLIENT_ORDERINGS:
+                expected = [row[1:] for row in leaderboard.top_clients(self.conn, 7, by)]
+                self.assertEqual([row[2:] for row in coordinator.top_clients(7, by)], expected)
+
+    def test_client_stats_and_summary(self):
+        with ShardCoordinator(self.shards, executor=EXECUTOR_THREAD) as coordinator:
+            stats = coordinator.client_stats()
+            summary = coordinator.summary()
+        self.assertEqual(list(stats["Магазин"].unique()), list(STORES))
+        total = self.conn.execute("SELECT COUNT(*), SUM(CAST(ROUND(total * 100) AS INTEGER)) FROM orders").fetchone()
+        self.assertEqual(stats["Количество заказов"].sum(), total[0])
+        self.assertEqual(summary["Магазин"].tolist(), list(STORES) + ["Итого"])
+        self.assertEqual(summary.iloc[-1]["Заказов"], total[0])
+        self.assertAlmostEqual(summary.iloc[-1]["Выручка"], total[1] / 100)
+        self.assertAlmostEqual(summary.iloc[-1]["Средний чек"], round(total[1] / 100 / total[0], 2))
+
+    def test_orders_pages_cover_all_shards(self):
+        for coordinator in self.coordinators():
+            seen, values, after = [], [], None
+            while True:
+                page, after = coordinator.load_orders_page("total", descending=True, after=after, limit=250)
+                seen += [(order["store"], order["id"]) for order in page]
+                values += [order["total"] for order in page]
+                if after is None:
+                    break
+            self.assertEqual(len(seen), len(set(seen)))
+            self.assertEqual(len(seen), self.conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0])
+            self.assertEqual(values, sorted(values, reverse=True))
+
+    def test_load_shards_and_use_store(self):
+        path = os.path.join(self.tmp.name, "shards.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"Север": "store_0.db"}, f, ensure_ascii=False)
+        shards = load_shards(path)
+        self.assertEqual(shards, {"Север": self.shards["Север"]})
+        with patch("db.DB_NAME", db.DB_NAME):
+            self.assertEqual(use_store("Север", shards), self.shards["Север"])
+            self.assertEqual(db.DB_NAME, self.shards["Север"])
+            with self.assertRaises(KeyError):
+                use_store("Запад", shards)
+
+
+if __name__ == "__main__":
+    unittest.main()
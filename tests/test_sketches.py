@@ -0,0 +1,200 @@
+"""
+Unit-тесты скетчей заказов по дням.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from datetime import date
+from unittest.mock import patch
+
+import numpy as np
+
+import archive
+import cache
+import db
+import sketches
+import storage
+from datagen import generate_database
+from models import Order, Product
+
+
+def rank_error(ordered, value, q):
+    """Расстояние от q до интервала рангов значения (у повторяющихся значений он широкий)."""
+    low = np.searchsorted(ordered, value, side="left") / len(ordered)
+    high = np.searchsorted(ordered, value, side="right") / len(ordered)
+    return max(low - q, q - high, 0)
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_error_within_bounds(self):
+        for count in (100, 10_000, 200_000):
+            hll = sketches.HyperLogLog()
+            for i in range(count):
+                hll.add(i)
+                hll.add(i)  # повторы не увеличивают оценку
+            # Три стандартные ошибки: практически гарантированная граница
+            self.assertLess(abs(hll.count() - count) / count, 3 * hll.relative_error)
+
+    def test_merge_and_serialization(self):
+        a, b, both = sketches.HyperLogLog(), sketches.HyperLogLog(), sketches.HyperLogLog()
+        for i in range(30_000):
+            (a if i % 3 else b).add(i)
+            both.add(i)
+        a.merge(sketches.HyperLogLog.from_bytes(b.to_bytes()))
+        self.assertEqual(a.count(), both.count())
+        with self.assertRaises(ValueError):
+            a.merge(sketches.HyperLogLog(precision=10))
+
+
+class TestKllSketch(unittest.TestCase):
+    def test_rank_error(self):
+        rng = random.Random(1)
+        values = [rng.lognormvariate(6, 1) for _ in range(100_000)]
+        kll = sketches.KllSketch(seed=2)
+        for value in values:
+            kll.update(value)
+        ordered = np.sort(values)
+        for q, estimate in zip(sketches.QUANTILES, kll.quantiles(sketches.QUANTILES)):
+            self.assertLess(rank_error(ordered, estimate, q), 0.0165)
+
+    def test_exact_below_k(self):
+        kll = sketches.KllSketch()
+        for value in range(1, 101):
+            kll.update(value)
+        self.assertEqual(kll.quantile(0.5), 50)
+        self.assertEqual(kll.quantile(1), 100)
+
+    def test_merge_and_serialization(self):
+        parts = [sketches.KllSketch(seed=i) for i in range(4)]
+        for i in range(40_000):
+            parts[i % 4].update(i)
+        merged = sketches.KllSketch()
+        for part in parts:
+            merged.merge(sketches.KllSketch.from_json(part.to_json()))
+        self.assertEqual(merged.count, 40_000)
+        self.assertLess(abs(merged.quantile(0.9) / 40_000 - 0.9), 0.0165)
+
+
+class TestOrderSketches(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.db_path = os.path.join(self.tmp.name, f"{self.id()}.db")
+        generate_database(self.db_path, orders=6_000, clients=300, start=date(2024, 1, 1), days=120)
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+
+    def exact(self, conn, date_from, date_to):
+        query = "SELECT COUNT(*), COUNT(DISTINCT client_id) FROM orders WHERE date >= ? AND date <= ?"
+        return conn.execute(query, (date_from, date_to + "~")).fetchone()
+
+    def stale_days(self, conn):
+        return [row[0] for row in conn.execute("SELECT day FROM order_sketches WHERE stale > 0 ORDER BY day")]
+
+    def test_range_summary_matches_exact(self):
+        with closing(db.connect()) as conn:
+            self.assertTrue(self.stale_days(conn))
+            summary = sketches.range_sketch(conn, "2024-02-01", "2024-03-15").summary()
+            orders, clients = self.exact(conn, "2024-02-01", "2024-03-15")
+            self.assertEqual(summary["orders"], orders)
+            # Клиентов меньше числа регистров: линейный подсчёт почти точен
+            self.assertLess(abs(summary["clients"] - clients), clients * 0.02)
+            totals = np.sort([row[0] for row in conn.execute(
+                "SELECT total FROM orders WHERE date >= '2024-02-01' AND date <= '2024-03-15~'")])
+            for q, value in summary["totals"].items():
+                self.assertLess(rank_error(totals, value, q), 0.0165)
+            monthly = sketches.distinct_clients(conn, "2024-01-01", "2024-03-31", by="month")
+            self.assertEqual(list(monthly), ["2024-01", "2024-02", "2024-03"])
+            with self.assertRaises(ValueError):
+                sketches.distinct_clients(conn, by="week")
+
+    def test_writes_update_sketches(self):
+        with closing(db.connect()) as conn:
+            sketches.refresh_stale(conn)
+            self.assertEqual(self.stale_days(conn), [])
+            before = sketches.range_sketch(conn, "2024-02-10", "2024-02-10").orders
+        db.save_order(Order(1, [Product("Чай", 150.0)], date="2024-02-10"))
+        with db.transaction() as tx:
+            tx.save_orders([Order(2, [Product("Квас", 90.0)], date="2024-02-10"),
+                            Order(3, [Product("Сыр", 480.0)], date="2030-01-01")])
+        with closing(db.connect()) as conn:
+            # Новые заказы добавляются в скетч без пересборки
+            self.assertEqual(self.stale_days(conn), [])
+            self.assertEqual(sketches.range_sketch(conn, "2024-02-10", "2024-02-10").orders, before + 2)
+            self.assertEqual(sketches.range_sketch(conn, "2030-01-01").summary()["totals"][0.5], 480.0)
+
+    def test_delete_marks_day_stale(self):
+        with closing(db.connect()) as conn:
+            sketches.refresh_stale(conn)
+            order_id, day = conn.execute("SELECT id, substr(date, 1, 10) FROM orders ORDER BY id LIMIT 1").fetchone()
+        db.delete_order_by_id(order_id)
+        with closing(db.connect()) as conn:
+            self.assertEqual(self.stale_days(conn), [day])
+            self.assertEqual(sketches.range_sketch(conn, day, day).orders, self.exact(conn, day, day)[0])
+            self.assertEqual(self.stale_days(conn), [])
+
+    def test_write_during_rebuild_keeps_day_stale(self):
+        with closing(db.connect()) as conn:
+            day = self.stale_days(conn)[0]
+        real = archive.iter_order_schemas
+
+        def racing(conn, *bounds):
+            yield from real(conn, *bounds)
+            # Заказ записан после чтения дня, но до фиксации пересборки
+            db.save_order(Order(1, [Product("Чай", 150.0)], date=day))
+
+        with closing(db.connect()) as conn:
+            with patch("archive.iter_order_schemas", racing):
+                sketches.refresh_stale(conn, day, day)
+            self.assertIn(day, self.stale_days(conn))
+            self.assertEqual(sketches.range_sketch(conn, day, day).orders, self.exact(conn, day, day)[0])
+
+    def test_archived_orders_still_counted(self):
+        with closing(db.connect()) as conn:
+            sketches.refresh_stale(conn)
+            expected = sketches.range_sketch(conn, "2024-01-01", "2024-04-30").summary()
+            totals = np.sort([row[0] for row in conn.execute("SELECT total FROM orders")])
+        archive.archive_orders("2024-03-01", "month", os.path.join(self.tmp.name, self.id()))
+        with closing(db.connect()) as conn:
+            self.assertTrue(self.stale_days(conn))
+            summary = sketches.range_sketch(conn, "2024-01-01", "2024-04-30").summary()
+        self.assertEqual((summary["orders"], summary["clients"]), (expected["orders"], expected["clients"]))
+        # Сжатие KLL случайно: после пересборки квантили другие, но в пределах погрешности по рангу
+        for q, value in summary["totals"].items():
+            self.assertLess(rank_error(totals, value, q), 0.0165)
+
+    def test_existing_database_is_backfilled(self):
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute("DROP TABLE order_sketches")
+            conn.commit()
+        db.initialize_db()
+        with closing(db.connect()) as conn:
+            orders, _ = self.exact(conn, "2024-01-01", "2024-12-31")
+            self.assertEqual(sketches.range_sketch(conn).orders, orders)
+
+
+class TestPythonBackend(unittest.TestCase):
+    def test_writes_without_sqlite(self):
+        with storage.using(storage.PythonBackend()):
+            db.initialize_db()
+            db.add_client("Клиент", "", "", "")
+            db.save_order(Order(1, [Product("Чай", 150.0)], date="2025-01-01"))
+            self.assertEqual(len(db.load_orders()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
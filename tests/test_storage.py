@@ -0,0 +1,192 @@
+"""
+Общие тесты слоя данных `db` для каждого хранилища: файл SQLite, общая
+база SQLite в памяти и хранилище на словарях Python.
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+import analysis
+import cache
+import db
+import storage
+from models import Client, Order, Product
+
+
+class StorageContract:
+    """Тесты, которые должно проходить любое хранилище."""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.make_backend()
+        self.context = storage.using(self.backend)
+        self.context.__enter__()
+        db.initialize_db()
+
+    def tearDown(self):
+        self.context.__exit__(None, None, None)
+        self.backend.close()
+        cache.close_monitors()
+
+    def fill(self, count=300, seed=0):
+        rng = random.Random(seed)
+        for i in range(5):
+            db.add_client(f"Клиент {i}", f"client{i}@example.com", "+79000000000", "г. Москва")
+        prices = {"Чай": 150.0, "Кофе": 320.0, "Сыр": 480.0, "Квас": 90.0}
+        for _ in range(count):
+            products = [Product(name, prices[name]) for name in rng.sample(sorted(prices), rng.randint(1, 3))]
+            day = f"2025-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}"
+            db.save_order(Order(rng.randint(1, 5), products, date=day))
+
+    def test_clients(self):
+        db.save_client(Client("Иван", "ivan@example.com", "+79000000001", "г. Казань"))
+        db.add_client("Пётр", "petr@example.com", "+79000000002", "г. Омск")
+        clients = db.load_clients()
+        self.assertEqual([(c.id, c.name, c.email) for c in clients],
+                         [(1, "Иван", "ivan@example.com"), (2, "Пётр", "petr@example.com")])
+        db.delete_client_by_name("Иван")
+        self.assertEqual([c.name for c in db.load_clients()], ["Пётр"])
+
+    def test_delete_client_by_id_keeps_namesakes(self):
+        with db.transaction() as tx:
+            first, second = tx.add_client("Иван", "", "", ""), tx.add_client("Иван", "", "", "")
+        db.save_order(Order(first, [Product("Чай", 150.0)], date="2025-01-01"))
+        db.save_order(Order(second, [Product("Квас", 90.0)], date="2025-01-02"))
+        self.assertTrue(db.delete_client_by_id(first, with_orders=True))
+        self.assertFalse(db.delete_client_by_id(first))
+        self.assertEqual([c.id for c in db.load_clients()], [second])
+        self.assertEqual([o["client_id"] for o in db.load_orders()], [second])
+        stats = analysis.client_stats_from_db()
+        self.assertEqual(list(stats["Количество заказов"]), [1])
+
+    def test_products(self):
+        db.save_product(Product("Чай", 150.0, "Напитки"))
+        db.save_product(Product("Пирог", 200.0))
+        products = db.load_products()
+        self.assertEqual([(p.id, p.name, p.price, p.category) for p in products],
+                         [(1, "Чай", 150.0, "Напитки"), (2, "Пирог", 200.0, "Общие")])
+        db.delete_product_by_id(1)
+        self.assertEqual([p.name for p in db.load_products()], ["Пирог"])
+
+    def test_orders(self):
+        db.add_client("Иван", "", "", "")
+        db.save_order(Order(1, [Product("Чай", 150.0), Product("Сыр", 480.0)], date="2025-01-05"))
+        # Заказ по имени нового клиента создаёт клиента
+        db.save_order(Order("Анна", [Product("Квас", 90.0)], date="2025-02-10 12:30:00"))
+        db.save_order(Order("Иван", [Product("Квас", 90.0)], date="2025-03-01"))
+        orders = db.load_orders()
+        self.assertEqual([(o["id"], o["client"], o["client_id"], o["products"], o["date"], o["total"])
+                          for o in orders], [
+            (1, "Иван", 1, "Чай,Сыр", "2025-01-05", 630.0),
+            (2, "Анна", 2, "Квас", "2025-02-10 12:30:00", 90.0),
+            (3, "Иван", 1, "Квас", "2025-03-01", 90.0),
+        ])
+        self.assertEqual([o["id"] for o in db.load_orders(date_from="2025-02-01", date_to="2025-02-11")], [2])
+        self.assertEqual([o["id"] for o in db.load_orders(date_from="2025-01-05", date_to="2025-01-05")], [1])
+
+        self.assertTrue(db.delete_order_by_id(2))
+        self.assertFalse(db.delete_order_by_id(2))
+        db.delete_order_by_index(0)
+        self.assertEqual([o["id"] for o in db.load_orders()], [3])
+        # ID удалённых заказов не используются повторно
+        db.save_order(Order(1, [Product("Чай", 150.0)], date="2025-03-02"))
+        self.assertEqual([o["id"] for o in db.load_orders()], [3, 4])
+
+    def test_orders_pages(self):
+        self.fill()
+        orders = db.load_orders()
+        filters = {"date_from": "2025-02-01", "min_total": 200}
+        for sort in db.ORDER_SORT_COLUMNS:
+            for descending in (False, True):
+                pages, after = [], None
+                while True:
+                    page, after = db.load_orders_page(sort, descending, after, limit=23, **filters)
+                    pages += [o["id"] for o in page]
+                    if after is None:
+                        break
+                expected = sorted((o for o in orders if o["date"] >= "2025-02-01" and o["total"] >= 200),
+                                  key=lambda o: (o[sort], o["id"]), reverse=descending)
+                self.assertEqual(pages, [o["id"] for o in expected], (sort, descending))
+        page, _ = db.load_orders_page(client="Клиент 3", limit=1000)
+        self.assertEqual({o["client"] for o in page}, {"Клиент 3"})
+
+    def test_analysis(self):
+        self.fill()
+        orders = db.load_orders()
+        stats = analysis.client_stats_from_db(chunksize=50)
+        self.assertEqual(dict(zip(stats["Клиент"], stats["Количество заказов"])),
+                         {f"Клиент {i}": sum(o["client_id"] == i + 1 for o in orders) for i in range(5)})
+        monthly = analysis.monthly_sales(chunksize=50)
+        for month in (1, 2, 3):
+            total = sum(round(o["total"] * 100) for o in orders if o["date"][5:7] == f"{month:02d}")
+            self.assertEqual(round(monthly[month] * 100), total)
+
+    def test_transaction(self):
+        with db.transaction() as tx:
+            client_id = tx.add_client("Иван", "ivan@example.com", "", "")
+            order_ids = tx.save_orders([Order(client_id, [Product("Чай", 150.0)], date="2025-01-0%d" % day)
+                                        for day in (1, 2, 3)])
+        self.assertEqual([o["id"] for o in db.load_orders()], order_ids)
+
+        # Ошибка внутри блока отменяет все его записи
+        with self.assertRaises(RuntimeError):
+            with db.transaction() as tx:
+                tx.add_client("Пётр", "", "", "")
+                tx.save_order(Order("Пётр", [Product("Квас", 90.0)]))
+                tx.delete_order_by_id(order_ids[0])
+                raise RuntimeError("сбой")
+        self.assertEqual([c.name for c in db.load_clients()], ["Иван"])
+        self.assertEqual([o["id"] for o in db.load_orders()], order_ids)
+
+        db.delete_client_by_name("Иван", with_orders=True)
+        self.assertEqual(db.load_clients(), [])
+        self.assertEqual(db.load_orders(), [])
+
+    def test_reads_see_new_writes(self):
+        self.assertEqual(db.load_orders(), [])
+        db.save_order(Order("Иван", [Product("Чай", 150.0)], date="2025-01-01"))
+        self.assertEqual(len(db.load_orders()), 1)
+
+
+class TestSQLiteBackend(StorageContract, unittest.TestCase):
+    def make_backend(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        return storage.SQLiteBackend(os.path.join(self.tmp.name, "ecom.db"))
+
+
+class TestSharedMemoryBackend(StorageContract, unittest.TestCase):
+    def make_backend(self):
+        return storage.SharedMemoryBackend(f"test_{id(self)}")
+
+    def test_no_file_created(self):
+        db.save_order(Order("Иван", [Product("Чай", 150.0)]))
+        self.assertFalse(os.path.exists(db.DB_NAME))
+
+
+class TestPythonBackend(StorageContract, unittest.TestCase):
+    def make_backend(self):
+        return storage.PythonBackend()
+
+    def test_sql_not_supported(self):
+        with self.assertRaises(storage.UnsupportedOperation):
+            db.connect()
+
+
+class TestBackendSelection(unittest.TestCase):
+    def test_create_backend(self):
+        self.assertIsInstance(storage.create_backend("python"), storage.PythonBackend)
+        self.assertEqual(storage.create_backend("sqlite:shop.db").location, "shop.db")
+        backend = storage.create_backend("sqlite-memory:shop")
+        self.assertEqual(backend.location, storage.memory_uri("shop"))
+        backend.close()
+        with self.assertRaises(ValueError):
+            storage.create_backend("redis")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Unit-тесты отмены долгих операций и отчёта о прогрессе.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import analysis
+import cache
+import db
+import storage
+import tasks
+from datagen import generate_database
+from models import Order, Product
+
+# Запрос, который без прерывания выполнялся бы очень долго
+ENDLESS_SQL = """
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000)
+SELECT SUM(i) FROM n
+"""
+
+
+class TestCancelToken(unittest.TestCase):
+    def test_report_and_cancel(self):
+        calls = []
+        token = tasks.CancelToken(on_progress=lambda percent, status: calls.append((percent, status)))
+        token.report(1, 4, "Чтение")
+        token.report(4, 4)
+        self.assertEqual(calls, [(25.0, "Чтение"), (100.0, "Чтение")])
+        token.cancel()
+        with self.assertRaises(tasks.Cancelled):
+            token.report(4, 4)
+
+    def test_interrupt_running_query(self):
+        conn = sqlite3.connect(":memory:")
+        token = tasks.CancelToken()
+        threading.Timer(0.1, token.cancel).start()
+        started = time.perf_counter()
+        with self.assertRaises(tasks.Cancelled):
+            with tasks.interruptible(conn, token):
+                conn.execute(ENDLESS_SQL).fetchone()
+        self.assertLess(time.perf_counter() - started, 5)
+        # Обработчик снят: подключение снова пригодно для запросов
+        self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+        conn.close()
+
+    def test_errors_without_cancel_pass_through(self):
+        conn = sqlite3.connect(":memory:")
+        with self.assertRaises(sqlite3.OperationalError):
+            with tasks.interruptible(conn, tasks.CancelToken()):
+                conn.execute("SELECT * FROM missing")
+        conn.close()
+
+    def test_run_in_thread(self):
+        done = threading.Event()
+        outcome = {}
+
+        def on_done(result, error):
+            outcome.update(result=result, error=error)
+            done.set()
+
+        token = tasks.CancelToken()
+        tasks.run_in_thread(lambda t: 42, token, on_done)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(outcome, {"result": 42, "error": None})
+
+
+class TestCancellableOperations(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, "ecom.db")
+        generate_database(cls.db_path, orders=5_000, clients=40, start=date(2025, 1, 1), days=180)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.patcher = patch("db.DB_NAME", self.db_path)
+        self.patcher.start()
+
+    def tearDown(self):
+        cache.close_monitors()
+        self.patcher.stop()
+
+    def test_progress_reaches_100(self):
+        percents = []
+        token = tasks.CancelToken(on_progress=lambda percent, status: percents.append(percent))
+        stats = analysis.client_stats_from_db.uncached(chunksize=700, token=token)
+        self.assertEqual(percents, sorted(percents))
+        self.assertEqual(len(percents), 8)
+        self.assertEqual(percents[-1], 100.0)
+        expected = analysis.client_stats_from_db.uncached(chunksize=700)
+        self.assertTrue(stats.equals(expected))
+
+    def test_cancel_between_chunks(self):
+        token = tasks.CancelToken()
+        seen = []
+
+        def partial(chunk):
+            seen.append(len(chunk))
+            token.cancel()
+            return analysis._client_partial(chunk)
+
+        with self.assertRaises(tasks.Cancelled):
+            analysis.aggregate_orders(partial, "client_id, total", chunksize=500, token=token)
+        self.assertEqual(seen, [500])
+
+    def test_cancelled_result_not_cached(self):
+        cache.result_cache.clear()
+        token = tasks.CancelToken()
+        token.cancel()
+        with self.assertRaises(tasks.Cancelled):
+            analysis.client_stats_from_db(token=token)
+        self.assertEqual(cache.cache_stats()["entries"], 0)
+        # Токен не входит в ключ кэша: повторный вызов с другим токеном берёт результат из кэша
+        stats = analysis.client_stats_from_db()
+        hits = cache.cache_stats()["hits"]
+        self.assertTrue(stats.equals(analysis.client_stats_from_db(token=tasks.CancelToken())))
+        self.assertEqual(cache.cache_stats()["hits"], hits + 1)
+
+    def test_date_range_with_archive_schemas(self):
+        percents = []
+        token = tasks.CancelToken(on_progress=lambda percent, status: percents.append(percent))
+        counts = analysis.daily_order_counts(2025, 3, chunksize=100, token=token)
+        self.assertEqual(counts.tolist(), analysis.daily_order_counts(2025, 3).tolist())
+        self.assertEqual(percents[-1], 100.0)
+
+    def test_export_progress(self):
+        path = os.path.join(self.tmp.name, "export.csv")
+        token = tasks.CancelToken()
+        with patch("db.EXPORT_BATCH", 1000):
+            self.assertEqual(db.export_orders_to_csv(path, token=token), 5_000)
+        self.assertEqual(token.percent, 100.0)
+        plain = os.path.join(self.tmp.name, "plain.csv")
+        db.export_orders_to_csv(plain)
+        with open(path, encoding="utf-8") as a, open(plain, encoding="utf-8") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_cancelled_export_removes_file(self):
+        path = os.path.join(self.tmp.name, "cancelled.csv")
+        token = tasks.CancelToken(on_progress=lambda percent, status: token.cancel())
+        with patch("db.EXPORT_BATCH", 1000), self.assertRaises(tasks.Cancelled):
+            db.export_orders_to_csv(path, token=token)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestPythonBackendCancel(unittest.TestCase):
+    def test_cancel_between_chunks(self):
+        with storage.using(storage.PythonBackend()):
+            db.initialize_db()
+            for i in range(30):
+                db.add_client(f"Клиент {i}", "", "", "")
+            for i in range(30):
+                db.save_order(Order(i + 1, [Product("Чай", 150.0)], date="2025-01-01"))
+            token = tasks.CancelToken()
+            chunks = analysis.iter_order_chunks(chunksize=10, token=token)
+            next(chunks)
+            token.cancel()
+            with self.assertRaises(tasks.Cancelled):
+                next(chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit-тесты сторожевого таймера главного цикла Tk.
+"""
+
+import time
+import tkinter
+import unittest
+from unittest.mock import patch
+
+import tkwatchdog
+
+
+class FakeRoot:
+    """Минимальная замена tkinter.Tk: очередь `after` без окна."""
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, ms, func):
+        self.next_id += 1
+        # Обработчики вызываются через tkinter, как в настоящем цикле событий
+        self.pending[self.next_id] = (time.monotonic() + ms / 1000, tkinter.CallWrapper(func, None, self))
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_for(self, seconds):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            now = time.monotonic()
+            for after_id, (due, func) in sorted(self.pending.items()):
+                if due <= now:
+                    del self.pending[after_id]
+                    func()
+            time.sleep(0.005)
+
+
+def slow_handler():
+    time.sleep(0.4)
+
+
+class TestTkWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.watchdog = tkwatchdog.TkWatchdog(
+            self.root, interval=0.02, threshold=0.1, modules=("test_tkwatchdog",))
+
+    def tearDown(self):
+        self.watchdog.stop()
+
+    def test_no_stalls_when_loop_is_responsive(self):
+        self.watchdog.start()
+        self.root.run_for(0.3)
+        self.assertEqual(self.watchdog.summary(), [])
+
+    def test_stall_records_callback_and_duration(self):
+        self.watchdog.start()
+        self.root.after(0, slow_handler)
+        with patch("sys.stderr"):
+            self.root.run_for(0.6)
+        stalls = self.watchdog.summary()
+        self.assertEqual(len(stalls), 1)
+        self.assertEqual(stalls[0]["callback"], "test_tkwatchdog.slow_handler")
+        self.assertIn("slow_handler", stalls[0]["location"])
+        self.assertGreater(stalls[0]["duration"], 0.25)
+        self.assertIn("slow_handler", self.watchdog.format_summary())
+
+    def test_stop_cancels_heartbeat(self):
+        self.watchdog.start()
+        self.watchdog.stop()
+        self.assertFalse(self.watchdog.is_running())
+        self.assertEqual(self.root.pending, {})
+
+    def test_disabled_without_environment_variable(self):
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertIsNone(tkwatchdog.start_watchdog(self.root))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Unit-тесты очереди групповой фиксации заказов.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from models import Order, Product
+from writer import GroupCommitWriter
+
+
+class TestGroupCommitWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "ecom.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def count_orders(self):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_orders_are_durable_when_future_resolves(self):
+        products = [Product("Чай", 100.0), Product("Квас", 50.0)]
+        with GroupCommitWriter(self.db_path, max_batch=50, max_delay=0.05) as writer:
+            futures = [writer.submit(Order(f"Клиент {i}", products)) for i in range(120)]
+            ids = [f.result(timeout=10) for f in futures]
+            self.assertEqual(self.count_orders(), 120)
+        self.assertEqual(len(set(ids)), 120)
+        self.assertLess(writer.batches, 120)
+
+    def test_callback_receives_future(self):
+        done = []
+        with GroupCommitWriter(self.db_path) as writer:
+            writer.submit(Order("Alice", [Product("Чай", 10.0)]), callback=done.append)
+        self.assertEqual(len(done), 1)
+        self.assertIsInstance(done[0].result(), int)
+
+    def test_failed_order_does_not_abort_batch(self):
+        with GroupCommitWriter(self.db_path, max_delay=0.05) as writer:
+            good = writer.submit(Order("Alice", [Product("Чай", 10.0)]))
+            bad = writer.submit(object())
+            other = writer.submit(Order("Bob", [Product("Квас", 5.0)]))
+        self.assertIsInstance(good.result(), int)
+        self.assertIsInstance(other.result(), int)
+        self.assertIsNotNone(bad.exception())
+        self.assertEqual(self.count_orders(), 2)
+
+    def test_invalid_synchronous_mode(self):
+        with self.assertRaises(ValueError):
+            GroupCommitWriter(self.db_path, synchronous="SOMETIMES")
+
+    def test_submit_after_close(self):
+        writer = GroupCommitWriter(self.db_path)
+        writer.close()
+        with self.assertRaises(RuntimeError):
+            writer.submit(Order("Alice", [Product("Чай", 10.0)]))
+
+    def test_cancelled_order_is_skipped(self):
+        with GroupCommitWriter(self.db_path, max_delay=0.3) as writer:
+            # Пока писатель ждёт пополнения пакета, заказ ещё можно отменить
+            cancelled = writer.submit(Order("Alice", [Product("Чай", 10.0)]))
+            self.assertTrue(cancelled.cancel())
+            kept = writer.submit(Order("Bob", [Product("Квас", 5.0)]))
+            self.assertIsInstance(kept.result(timeout=10), int)
+            # Поток-писатель жив и принимает следующие пакеты
+            self.assertIsInstance(writer.submit(Order("Carol", [Product("Сыр", 1.0)])).result(timeout=10), int)
+        self.assertEqual(self.count_orders(), 2)
+
+    def test_submit_racing_close_is_resolved_or_rejected(self):
+        writer = GroupCommitWriter(self.db_path, max_delay=0)
+        futures, rejected = [], []
+
+        def produce():
+            for i in range(300):
+                try:
+                    futures.append(writer.submit(Order(f"Клиент {i}", [Product("Чай", 1.0)])))
+                except RuntimeError:
+                    rejected.append(i)
+
+        thread = threading.Thread(target=produce)
+        thread.start()
+        writer.close()
+        thread.join()
+        # Каждый принятый заказ записан: ни один не остался в очереди после остановки
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(len(futures) + len(rejected), 300)
+        self.assertEqual(self.count_orders(), len(futures))
+
+
+if __name__ == '__main__':
+    unittest.main()
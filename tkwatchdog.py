@@ -0,0 +1,236 @@
+"""
+Сторожевой таймер главного цикла Tkinter.
+
+Главный поток регулярно отмечает «пульс» через `root.after`. Фоновый поток
+следит за временем последнего пульса: если цикл событий не отвечает дольше
+порога, он снимает стек главного потока и определяет обработчик (функцию из
+`gui.py`, `analysis.py`), который в этот момент выполняется. Когда пульс
+возобновляется, зависание записывается вместе с его длительностью; сводка
+самых долгих зависаний печатается при выходе.
+
+Включается переменной окружения `ECOM_WATCHDOG` — порог в миллисекундах,
+например `ECOM_WATCHDOG=300 python main.py`.
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+import tkinter
+import traceback
+
+WATCHDOG_ENV = "ECOM_WATCHDOG"
+
+# Период пульса и порог зависания по умолчанию (сек.)
+HEARTBEAT_INTERVAL = 0.1
+STALL_THRESHOLD = 0.5
+
+# Модули приложения, в которых ищется выполняющийся обработчик
+CALLBACK_MODULES = ("gui", "analysis", "db", "main")
+
+_TKINTER_DIR = os.path.dirname(tkinter.__file__)
+
+_watchdog = None
+
+
+def _module_name(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def find_callback(stack, modules=CALLBACK_MODULES):
+    """
+    Определяет обработчик Tk, выполнявшийся в момент снятия стека.
+
+    Обработчиком считается первый кадр модуля приложения, вызванный из
+    `tkinter` (команда кнопки, `after`, привязка события). Если в стеке нет
+    кадров `tkinter`, берётся самый внешний кадр модулей приложения.
+
+    Parameters
+    ----------
+    stack : traceback.StackSummary
+        Стек от внешнего кадра к внутреннему.
+    modules : tuple of str, optional
+        Имена модулей приложения.
+
+    Returns
+    -------
+    str or None
+        Имя обработчика в виде "модуль.функция".
+    """
+    candidates = range(len(stack))
+    for i in reversed(candidates):
+        if os.path.dirname(stack[i].filename) == _TKINTER_DIR:
+            candidates = range(i + 1, len(stack))
+            break
+    for i in candidates:
+        module = _module_name(stack[i].filename)
+        if module in modules:
+            return f"{module}.{stack[i].name}"
+    return None
+
+
+class TkWatchdog:
+    """Измеряет отзывчивость главного цикла Tk и записывает зависания.
+
+    Parameters
+    ----------
+    root : tkinter.Tk
+        Главное окно приложения.
+    interval : float, optional
+        Период пульса в секундах.
+    threshold : float, optional
+        Задержка пульса, начиная с которой цикл считается зависшим (сек.).
+    modules : tuple of str, optional
+        Имена модулей приложения для определения обработчика.
+    max_records : int, optional
+        Сколько самых долгих зависаний хранить.
+
+    Attributes
+    ----------
+    stalls : list of dict
+        Зависания с ключами callback, location, duration, started_at, stack.
+    """
+    def __init__(self, root, interval=HEARTBEAT_INTERVAL, threshold=STALL_THRESHOLD,
+                 modules=CALLBACK_MODULES, max_records=20):
+        self.root = root
+        self.interval = interval
+        self.threshold = threshold
+        self.modules = modules
+        self.max_records = max_records
+        self.stalls = []
+        self.stall_count = 0
+        self._current = None
+        self._last_beat = None
+        self._after_id = None
+        self._main_thread_id = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запускает пульс и фоновый поток. Вызывается из главного потока Tk."""
+        self._main_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._after_id = self.root.after(int(self.interval * 1000), self._beat)
+        self._thread = threading.Thread(target=self._watch, name="ecom-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tkinter.TclError:
+                # Окно уже уничтожено
+                pass
+            self._after_id = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._current is not None:
+                self._current["duration"] = now - self._last_beat - self.interval
+                self._record(self._current)
+                self._current = None
+            self._last_beat = now
+        if not self._stop.is_set():
+            self._after_id = self.root.after(int(self.interval * 1000), self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                delay = time.monotonic() - self._last_beat - self.interval
+                if delay >= self.threshold and self._current is None:
+                    self._current = self._capture()
+
+    def _capture(self):
+        frame = sys._current_frames().get(self._main_thread_id)
+        stack = traceback.extract_stack(frame) if frame is not None else traceback.StackSummary()
+        inner = next((f for f in reversed(stack) if _module_name(f.filename) in self.modules), None)
+        return {
+            "callback": find_callback(stack, self.modules),
+            "location": f"{os.path.basename(inner.filename)}:{inner.lineno} {inner.name}" if inner else None,
+            "duration": None,
+            "started_at": time.time() - self.threshold,
+            "stack": "".join(stack.format()),
+        }
+
+    def _record(self, stall):
+        self.stall_count += 1
+        print(f"Зависание интерфейса {stall['duration']:.2f} с: "
+              f"{stall['callback'] or 'неизвестный обработчик'} ({stall['location'] or '—'})",
+              file=sys.stderr)
+        self.stalls.append(stall)
+        self.stalls.sort(key=lambda s: s["duration"], reverse=True)
+        del self.stalls[self.max_records:]
+
+    def summary(self, limit=10):
+        """
+        Возвращает самые долгие зависания.
+
+        Returns
+        -------
+        list of dict
+            Не более `limit` зависаний в порядке убывания длительности.
+        """
+        with self._lock:
+            return [dict(s) for s in self.stalls[:limit]]
+
+    def format_summary(self, limit=10):
+        """Возвращает сводку зависаний в виде текста."""
+        stalls = self.summary(limit)
+        if not stalls:
+            return "Зависаний интерфейса не зафиксировано"
+        lines = [f"Зависаний интерфейса: {self.stall_count}, самые долгие:"]
+        for stall in stalls:
+            lines.append(f"  {stall['duration']:7.2f} с  {stall['callback'] or '?'}  ({stall['location'] or '—'})")
+        return "\n".join(lines)
+
+    def print_summary(self):
+        print(self.format_summary(), file=sys.stderr)
+
+
+def start_watchdog(root, threshold=None):
+    """
+    Запускает сторожевой таймер, если он включён.
+
+    Parameters
+    ----------
+    root : tkinter.Tk
+        Главное окно приложения.
+    threshold : float, optional
+        Порог зависания в секундах. По умолчанию берётся из переменной
+        окружения `ECOM_WATCHDOG` (миллисекунды); если она не задана,
+        сторожевой таймер не запускается.
+
+    Returns
+    -------
+    TkWatchdog or None
+    """
+    global _watchdog
+    if threshold is None:
+        value = os.environ.get(WATCHDOG_ENV)
+        if not value:
+            return None
+        threshold = float(value) / 1000
+    stop_watchdog()
+    _watchdog = TkWatchdog(root, threshold=threshold)
+    _watchdog.start()
+    atexit.register(_watchdog.print_summary)
+    return _watchdog
+
+
+def stop_watchdog():
+    """Останавливает запущенный сторожевой таймер."""
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
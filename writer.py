@@ -0,0 +1,185 @@
+"""
+Групповая фиксация заказов (group commit).
+
+Заказы ставятся в очередь, а единственный поток-писатель сохраняет их пакетами
+в одной транзакции: один fsync приходится на целый пакет, а не на каждый заказ.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import db
+
+# Допустимые режимы PRAGMA synchronous
+SYNCHRONOUS_MODES = ("FULL", "NORMAL", "OFF")
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Очередь записи заказов с пакетной фиксацией в отдельном потоке.
+
+    Пакет фиксируется, когда в нём набралось `max_batch` заказов либо когда с
+    момента поступления первого заказа пакета прошло `max_delay` секунд.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Путь к базе данных. По умолчанию `db.DB_NAME`.
+    max_batch : int, optional
+        Максимальное количество заказов в одной транзакции.
+    max_delay : float, optional
+        Максимальное время ожидания пополнения пакета, сек.
+    synchronous : str, optional
+        Режим долговечности SQLite: "FULL" — как при обычном `save_order`,
+        "NORMAL" — без fsync журнала (в режиме WAL заказ переживает падение
+        приложения, но не отключение питания), "OFF" — без fsync вовсе.
+    wal : bool, optional
+        Перевести базу в режим журнала WAL.
+    """
+    def __init__(self, db_path=None, max_batch=500, max_delay=0.01, synchronous="FULL", wal=False):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Неизвестный режим synchronous: {synchronous}")
+        self.db_path = db_path or db.DB_NAME
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self.wal = wal
+        self.batches = 0
+        self.committed = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        # Проверка закрытия и постановка в очередь — под одной блокировкой:
+        # заказ не может попасть в очередь после маркера остановки
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._init_error = None
+        self._thread = threading.Thread(target=self._run, name="ecom-group-commit", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._init_error is not None:
+            raise self._init_error
+
+    def submit(self, order, callback=None):
+        """
+        Ставит заказ в очередь на запись.
+
+        Parameters
+        ----------
+        order : Order
+            Сохраняемый заказ.
+        callback : callable, optional
+            Функция `callback(future)`, вызываемая после фиксации пакета
+            или ошибки записи (в потоке-писателе).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Результат — ID заказа; становится доступен, когда заказ
+            зафиксирован в базе. Заказ, отменённый через `Future.cancel()`
+            до начала записи его пакета, не сохраняется.
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Очередь записи закрыта")
+            self._queue.put((order, future))
+        return future
+
+    def close(self):
+        """Дописывает все заказы из очереди и останавливает поток-писатель."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        try:
+            conn = sqlite3.connect(self.db_path, uri=True)
+            if self.wal:
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            # Транзакции — на этом подключении: у него свои настройки долговечности
+            with db.transaction_on(conn) as tx:
+                db.create_schema(tx.cursor)
+        except Exception as e:
+            self._init_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            # Отменённые заказы не пишутся; остальные после этого отменить уже нельзя
+            batch = [(order, future) for order, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._commit(conn, batch)
+            except Exception as e:
+                # Поток-писатель не должен завершаться: иначе остальные заказы не дождутся ответа
+                for _, future in batch:
+                    _resolve(future, error=e)
+        conn.close()
+
+    def _commit(self, conn, batch):
+        try:
+            with db.transaction_on(conn) as tx:
+                ids = [db.insert_order(tx.cursor, order) for order, _ in batch]
+        except Exception:
+            # Повторяем по одному, чтобы ошибка одного заказа не отменяла весь пакет
+            for order, future in batch:
+                try:
+                    with db.transaction_on(conn) as tx:
+                        order_id = db.insert_order(tx.cursor, order)
+                except Exception as e:
+                    _resolve(future, error=e)
+                else:
+                    self.committed += 1
+                    _resolve(future, order_id)
+            self.batches += 1
+            return
+        self.batches += 1
+        self.committed += len(batch)
+        for (_, future), order_id in zip(batch, ids):
+            _resolve(future, order_id)
+
+
+def _resolve(future, result=None, error=None):
+    """Сообщает результат записи; повторное или запоздалое разрешение игнорируется."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass